@@ -0,0 +1,114 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+import money
+import storage
+
+# Métodos de pagamento tratados como "à vista" nas duas versões do app
+CASH_METHODS = ('À Vista', 'Dinheiro')
+CREDIT_CARD = 'Cartão de Crédito'
+
+
+@dataclass(frozen=True)
+class FinancialSummary:
+    """Totais do usuário calculados em uma única passada, em centavos exatos.
+
+    As propriedades sem o sufixo `_cents` devolvem os mesmos totais em reais.
+    """
+    income_cents: int = 0
+    expenses_cents: int = 0
+    cash_expenses_cents: int = 0
+    credit_card_expenses_cents: int = 0
+    non_essential_expenses_cents: int = 0
+    transactions: int = 0
+
+    @property
+    def balance_cents(self):
+        return self.income_cents - self.expenses_cents
+
+    @property
+    def income(self):
+        return money.to_reais(self.income_cents)
+
+    @property
+    def expenses(self):
+        return money.to_reais(self.expenses_cents)
+
+    @property
+    def cash_expenses(self):
+        return money.to_reais(self.cash_expenses_cents)
+
+    @property
+    def credit_card_expenses(self):
+        return money.to_reais(self.credit_card_expenses_cents)
+
+    @property
+    def non_essential_expenses(self):
+        return money.to_reais(self.non_essential_expenses_cents)
+
+    @property
+    def balance(self):
+        return money.to_reais(self.balance_cents)
+
+
+SUMMARY_SQL = f'''
+    SELECT
+        COUNT(*),
+        COALESCE(SUM(CASE WHEN type = 'Receita' THEN amount_cents END), 0),
+        COALESCE(SUM(CASE WHEN type = 'Despesa' THEN amount_cents END), 0),
+        COALESCE(SUM(CASE WHEN type = 'Despesa' AND payment_method IN ({', '.join('?' * len(CASH_METHODS))}) THEN amount_cents END), 0),
+        COALESCE(SUM(CASE WHEN type = 'Despesa' AND payment_method = ? THEN amount_cents END), 0),
+        COALESCE(SUM(CASE WHEN type = 'Despesa' AND necessity = 'Não essencial' THEN amount_cents END), 0)
+    FROM financial_data
+    WHERE username = ?
+'''
+
+
+def summarize(username):
+    """Calcula o resumo direto no SQLite com SUM(CASE ...), sem trazer as linhas."""
+    with storage.connection() as conn:
+        count, income, expenses, cash, credit, non_essential = conn.execute(
+            SUMMARY_SQL, (*CASH_METHODS, CREDIT_CARD, username)).fetchone()
+    return FinancialSummary(income, expenses, cash, credit, non_essential, count)
+
+
+def _labels(values):
+    # pd.Categorical (ledger.Ledger) compara pelos códigos, sem materializar os textos
+    return values if hasattr(values, 'categories') else np.asarray(values, dtype=object)
+
+
+def _isin(values, options):
+    return np.asarray(values.isin(options)) if hasattr(values, 'categories') else np.isin(values, options)
+
+
+def summarize_cents(cents, types, payment_methods, necessities=None):
+    """Calcula o resumo de forma vetorizada sobre colunas já carregadas (quantias em centavos)."""
+    cents = np.asarray(cents, dtype=np.int64)
+    types = _labels(types)
+    payment_methods = _labels(payment_methods)
+
+    expense_cents = np.where(types == 'Despesa', cents, 0)
+    non_essential = 0
+    if necessities is not None:
+        necessities = _labels(necessities)
+        non_essential = int(expense_cents[necessities == 'Não essencial'].sum())
+
+    return FinancialSummary(
+        income_cents=int(cents[types == 'Receita'].sum()),
+        expenses_cents=int(expense_cents.sum()),
+        cash_expenses_cents=int(expense_cents[_isin(payment_methods, CASH_METHODS)].sum()),
+        credit_card_expenses_cents=int(expense_cents[payment_methods == CREDIT_CARD].sum()),
+        non_essential_expenses_cents=non_essential,
+        transactions=len(cents),
+    )
+
+
+def summarize_columns(amounts, types, payment_methods, necessities=None):
+    """Como summarize_cents, com as quantias em reais."""
+    return summarize_cents(money.cents_array(amounts), types, payment_methods, necessities)
+
+
+def summarize_ledger(ledger):
+    """Resumo de um ledger.Ledger já carregado."""
+    return summarize_cents(ledger.cents, ledger.type, ledger.payment_method, ledger.necessity)
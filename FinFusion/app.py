@@ -1,138 +1,312 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
+import os
 import sqlite3
-import hashlib
-from datetime import datetime, timedelta
-import time
-import yfinance as yf
-import matplotlib.pyplot as plt
+from datetime import datetime
+
+import lazy_import
+import money
+import passwords
+import queries
+import repository
+import request_cache
+import schema
+import shared_cache
+import watchlist
+import worker
+
+# Bibliotecas pesadas e módulos que dependem delas só carregam na primeira
+# página que os usa; a tela de login não importa pandas, numpy, matplotlib nem yfinance.
+pd = lazy_import.module('pandas')
+np = lazy_import.module('numpy')
+aggregation = lazy_import.module('aggregation')
+chart_render = lazy_import.module('chart_render')
+dashboard = lazy_import.module('dashboard')
+exporter = lazy_import.module('exporter')
+importer = lazy_import.module('importer')
+indicators = lazy_import.module('indicators')
+installments = lazy_import.module('installments')
+ledger = lazy_import.module('ledger')
+market_data = lazy_import.module('market_data')
+portfolio = lazy_import.module('portfolio')
+statements = lazy_import.module('statements')
+
+# Período das cotações da página de análises (atualizadas em segundo plano)
+MARKET_DAYS = 180
+
+# Histórico de cada usuário compartilhado entre sessões e reruns; a revisão dos dados
+# (statements.revision) invalida a entrada a cada escrita, o TTL só limita a memória ociosa
+FINANCIAL_DATA_TTL = 10 * 60
+FINANCIAL_DATA_ENTRIES = 512
+MARKET_HISTORY_ENTRIES = 256
+
+# Quantos proxies confiáveis (balanceador, nginx) ficam na frente do app. Cada um
+# acrescenta à direita de X-Forwarded-For o endereço de quem o chamou; o que vem à
+# esquerda disso foi escrito pelo próprio cliente e não serve para limitar tentativas
+TRUSTED_PROXIES = int(os.environ.get('FINFUSION_TRUSTED_PROXIES', 0))
 
 # Funções de utilidade
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def format_currency(value):
-    return f"R${value:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
 
 # Funções de banco de dados
 def create_database():
-    conn = sqlite3.connect('finfusion.db')
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS financial_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL,
-            date DATE NOT NULL,
-            description TEXT,
-            amount REAL NOT NULL,
-            type TEXT NOT NULL,
-            payment_method TEXT,
-            installments INTEGER,
-            necessity TEXT
-        )
-    ''')
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            username TEXT PRIMARY KEY,
-            password TEXT NOT NULL
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-def upload_excel(file):
+    # Uma vez por processo; nos reruns seguintes não faz nada
+    schema.ensure_migrated()
+
+def upload_excel(username, file):
+    """Importa a planilha (Excel ou CSV) para o usuário, exibindo o progresso."""
+    progress_bar = st.progress(0.0, text="Importando...")
+
+    def update(processed, total):
+        if total:
+            progress_bar.progress(min(processed / total, 1.0), text=f"{processed} de {total} linhas")
+        else:
+            progress_bar.progress(0.5, text=f"{processed} linhas processadas")
+
     try:
-        df = pd.read_excel(file)
-        return df
+        report = importer.import_financial_data(username, file, filename=file.name, progress=update)
     except Exception as e:
         st.error(f"Erro ao carregar arquivo Excel: {e}")
         return None
+    finally:
+        request_cache.invalidate(username)
+    progress_bar.progress(1.0, text=f"{report.imported} linhas importadas")
+    return report
 
 def download_data(symbol, start_date, end_date):
-    try:
-        data = yf.download(symbol, start=start_date, end=end_date)
-        return data
-    except BrokenPipeError:
-        time.sleep(5)  # Espera de 5 segundos
-        data = yf.download(symbol, start=start_date, end=end_date)
-        return data
+    # Novas tentativas com backoff e limite de requisições ficam no fetcher do cache;
+    # o DataFrame pronto fica no cache de processo até o TTL das cotações
+    history = shared_cache.cache('market_history', MARKET_HISTORY_ENTRIES, market_data.DEFAULT_TTL.total_seconds())
+    return history.get((symbol, str(start_date), str(end_date)),
+                       lambda: market_data.history(symbol, start_date, end_date))
 
 def register_user(username, password):
-    with sqlite3.connect('finfusion.db') as conn:
-        c = conn.cursor()
-        c.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, hash_password(password)))
-        conn.commit()
+    passwords.register(username, password)
+
+def client_ip():
+    """IP do cliente para os limites de login, ou None se indisponível.
+
+    Sem proxy confiável é o endereço da conexão; com TRUSTED_PROXIES = N, é o
+    N-ésimo endereço a partir da direita de X-Forwarded-For, o que o proxy mais
+    externo anotou.
+    """
+    try:
+        context = st.context
+        forwarded = context.headers.get('X-Forwarded-For') if TRUSTED_PROXIES else None
+        address = context.ip_address
+    except Exception:
+        return None
+    if forwarded:
+        hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+        if len(hops) >= TRUSTED_PROXIES:
+            return hops[-TRUSTED_PROXIES]
+    return address
 
 def verify_password(username, password):
-    with sqlite3.connect('finfusion.db') as conn:
-        c = conn.cursor()
-        c.execute("SELECT password FROM users WHERE username=?", (username,))
-        stored_password = c.fetchone()
-        return stored_password and stored_password[0] == hash_password(password)
+    # O KDF roda no pool de passwords; tentativas demais levantam LoginThrottled
+    return passwords.authenticate(username, password, ip=client_ip())
+
+def _fetch_financial_data(username):
+    return ledger.load(username)
+
+def _shared_financial(username, key, build):
+    """Valor do usuário no cache de processo, válido enquanto a revisão dos dados dele não muda."""
+    cache = shared_cache.cache('financial_data', FINANCIAL_DATA_ENTRIES, FINANCIAL_DATA_TTL)
+    # A revisão é lida antes de montar o valor: uma escrita no meio do caminho invalida a entrada
+    return cache.get(key, build, user=username, tag=statements.revision(username))
 
 def get_financial_data(username):
-    try:
-        with sqlite3.connect('finfusion.db') as conn:
-            c = conn.cursor()
-            c.execute("SELECT id, date, description, amount, type, payment_method, installments, necessity FROM financial_data WHERE username=?", (username,))
-            data = c.fetchall()
-        return data if data else []
-    except sqlite3.Error as e:
-        st.error(f"Erro ao conectar ao banco de dados: {e}")
-        return []
-
-def add_financial_data(username, date, description, amount, type, payment_method, installments, necessity):
-    with sqlite3.connect('finfusion.db') as conn:
-        c = conn.cursor()
-        c.execute("INSERT INTO financial_data (username, date, description, amount, type, payment_method, installments, necessity) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                (username, date, description, amount, type, payment_method, installments, necessity))
-        conn.commit()
-
-def remove_financial_data(ids):
-    with sqlite3.connect('finfusion.db') as conn:
-        c = conn.cursor()
-        if ids:  # Verifica se a lista de IDs não está vazia
-            c.executemany("DELETE FROM financial_data WHERE id=?", [(id,) for id in ids])
-            conn.commit()
-        else:
-            st.warning("Nenhum dado selecionado para remoção.")
+    """Ledger (colunas tipadas) do histórico do usuário; consultado no máximo uma vez por rerun
+    e reaproveitado até a próxima escrita."""
+    def load():
+        try:
+            return _shared_financial(username, 'ledger', lambda: _fetch_financial_data(username))
+        except sqlite3.Error as e:
+            st.error(f"Erro ao conectar ao banco de dados: {e}")
+            return ledger.empty()
+    return request_cache.memoize(('financial_data', username), load)
+
+def get_financial_summary(username):
+    """Resumo do usuário: usa o ledger se ele já foi carregado neste rerun, senão agrega no SQLite."""
+    def build():
+        entries = request_cache.peek(('financial_data', username))
+        if entries is None:
+            return aggregation.summarize(username)
+        return aggregation.summarize_ledger(entries)
+    return request_cache.memoize(('financial_summary', username), build)
+
+def add_financial_data(username, date, description, amount, type, payment_method, installments, necessity, card_id=None):
+    repository.financial_data.add(username, date, description, amount, type, payment_method, installments,
+                                  necessity, card_id)
+    request_cache.invalidate(username)
 
 # Funções adicionais
 def calculate_total_balance(username):
-    """Calcula o saldo total com base nas receitas e despesas do usuário."""
-    data = get_financial_data(username)
-    total_income = sum(item[3] for item in data if item[4] == "Receita")
-    total_expense = sum(item[3] for item in data if item[4] == "Despesa")
-    return total_income - total_expense
+    """Calcula o saldo total com base nas receitas e despesas do usuário.
+
+    Compras parceladas só descontam as parcelas já vencidas; as futuras ficam de fora.
+    """
+    pending = request_cache.memoize(('installments_outstanding', username),
+                                    lambda: installments.outstanding(username, datetime.today()))
+    return get_financial_summary(username).balance + pending
+
+def display_upcoming_installments(username, months=12):
+    """Exibe o total de parcelas a vencer em cada um dos próximos meses."""
+    start = installments.month_index(datetime.today())
+    upcoming = installments.monthly_obligations(username, start, start + months - 1)
+    if not upcoming.any():
+        return
+    st.subheader('Parcelas a Vencer')
+    st.table(pd.DataFrame({'Mês': upcoming.index.strftime('%m/%Y'), 'Total': money.format_column(upcoming)}))
 
 def display_major_expenses(username):
     """Exibe uma tabela com os maiores gastos e os gastos não essenciais."""
-    data = get_financial_data(username)
-    if not data:
+    entries = get_financial_data(username)
+    if len(entries) == 0:
         st.warning('Nenhum dado financeiro disponível.')
         return
 
+    # Ordena só os centavos das despesas; as linhas exibidas viram DataFrame depois
+    expenses = np.flatnonzero(entries.type == 'Despesa')
+    by_amount = expenses[np.argsort(-entries.cents[expenses], kind='stable')]
+    st.subheader('Maiores Gastos')
+    st.table(entries.take(by_amount[:5]).to_frame(
+        ('date', 'description', 'amount', 'payment_method', 'necessity'), dates_as_text=True))
+
+    non_essential = by_amount[entries.necessity[by_amount] == 'Não essencial']
+    st.subheader('Gastos Supérfluos')
+    st.table(entries.take(non_essential).to_frame(
+        ('date', 'description', 'amount', 'payment_method'), dates_as_text=True))
+
 def alert_overdraft_and_credit(username):
     """Exibe alertas para cheque especial e gastos excessivos no cartão de crédito."""
     balance = calculate_total_balance(username)
     if balance < 0:
-        st.error(f"Alerta: Você está no cheque especial! Juros de 8% ao mês serão aplicados. Saldo: {format_currency(balance)}")
-
-    data = get_financial_data(username)
-    if not data:
-        return
-
-    df = pd.DataFrame(data, columns=['id', 'Data', 'Descrição', 'Quantia', 'Tipo', 'Método de Pagamento', 'Parcelas', 'Necessidade'])
-
-    credit_card_expenses = df[(df['Tipo'] == 'Despesa') & (df['Método de Pagamento'] == 'Cartão de Crédito')]['Quantia'].sum()
-    credit_limit = 1000  # Defina o limite conforme necessário
-    if credit_card_expenses > credit_limit:
-        st.warning(f"Atenção: Seus gastos no cartão de crédito estão altos ({format_currency(credit_card_expenses)}). Limite sugerido: {format_currency(credit_limit)}.")
+        st.error(f"Alerta: Você está no cheque especial! Juros de 8% ao mês serão aplicados. Saldo: {money.format_currency(balance)}")
+
+    # Faturas por cartão: aberta contra o limite, e limite comprometido com as parcelas futuras
+    for outlook in statements.outlooks(username):
+        card = outlook.card
+        if outlook.open_total > card.credit_limit:
+            st.error(f"Alerta: A fatura aberta do cartão {card.name} ({money.format_currency(outlook.open_total)}) ultrapassa o limite de {money.format_currency(card.credit_limit)}.")
+        elif outlook.committed > card.credit_limit:
+            st.warning(f"Atenção: O cartão {card.name} tem {money.format_currency(outlook.committed)} comprometidos entre a fatura aberta e as parcelas futuras. Limite: {money.format_currency(card.credit_limit)}.")
+
+def credit_cards_section(username):
+    """Cartões do usuário com as faturas aberta, próxima e projetada, e cadastro de novos cartões."""
+    st.subheader('Cartões de Crédito')
+    outlooks = statements.outlooks(username)
+    for outlook in outlooks:
+        card = outlook.card
+        st.markdown(f"**{card.name}** (fecha dia {card.closing_day}, vence dia {card.due_day})")
+        col_open, col_next, col_available = st.columns(3)
+        col_open.metric('Fatura aberta', money.format_currency(outlook.open_total),
+                        help=f"Vence em {card.due_date(outlook.open_cycle).strftime('%d/%m/%Y')}")
+        col_next.metric('Próxima fatura', money.format_currency(outlook.next_total))
+        col_available.metric('Limite disponível', money.format_currency(outlook.available))
+        with st.expander(f'Projeção de 12 meses - {card.name}'):
+            st.table(pd.DataFrame({'Fatura': outlook.statements.index.strftime('%m/%Y'),
+                                   'Total': money.format_column(outlook.statements)}))
+            if card.id is None:
+                st.caption('Cartão padrão, usado até você cadastrar o seu.')
+            elif st.button('Remover cartão', key=f'remove_card_{card.id}'):
+                statements.remove_card(username, card.id)
+                st.success(f'Cartão {card.name} removido.')
+
+    with st.form('credit_card_form'):
+        registered = any(outlook.card.id is not None for outlook in outlooks)
+        st.write('Novo cartão' if registered else 'Cadastre seu cartão para acompanhar as faturas e o limite.')
+        name = st.text_input('Nome do cartão')
+        credit_limit = st.number_input('Limite', min_value=0.0, format="%.2f")
+        col_closing, col_due = st.columns(2)
+        closing_day = col_closing.number_input('Dia de fechamento', min_value=1, max_value=31, value=1)
+        due_day = col_due.number_input('Dia de vencimento', min_value=1, max_value=31, value=10)
+        if st.form_submit_button('Adicionar cartão') and name:
+            statements.add_card(username, name, credit_limit, int(closing_day), int(due_day))
+            st.success(f'Cartão {name} adicionado.')
+
+def export_data_section(username):
+    """Exporta os dados do usuário (com filtros) para download em Excel ou CSV."""
+    st.subheader('Exportar Dados')
+    col_start, col_end = st.columns(2)
+    start = col_start.date_input('De', value=None, key='export_start')
+    end = col_end.date_input('Até', value=None, key='export_end')
+    type = st.selectbox('Tipo', ['Todos', 'Receita', 'Despesa'], key='export_type')
+    fmt = st.radio('Formato', ['xlsx', 'csv'], horizontal=True, key='export_format')
+
+    if st.button('Gerar arquivo'):
+        data, filename, mime = exporter.export(username, fmt, start=start, end=end,
+                                               type=None if type == 'Todos' else type)
+        st.download_button('Baixar arquivo', data, file_name=filename, mime=mime)
+
+PAGE_SIZES = [25, 50, 100, 200]
+SORT_OPTIONS = {'Data': 'date', 'Quantia': 'amount'}
+
+def transaction_filters(key):
+    """Filtros do navegador de transações; devolve o dicionário aceito por queries.
+
+    A busca casa cada palavra como prefixo, sem diferenciar acentos nem maiúsculas.
+    """
+    text = st.text_input('Buscar na descrição', key=f'{key}_text', placeholder='ex.: mercado, salário, dízimo')
+    with st.expander('Filtros', expanded=False):
+        col_start, col_end = st.columns(2)
+        start = col_start.date_input('De', value=None, key=f'{key}_start')
+        end = col_end.date_input('Até', value=None, key=f'{key}_end')
+        col_type, col_method, col_necessity = st.columns(3)
+        type = col_type.selectbox('Tipo', ['Todos', 'Receita', 'Despesa'], key=f'{key}_type')
+        payment_method = col_method.selectbox('Método de Pagamento',
+                                              ['Todos', 'Dinheiro', 'Cartão de Crédito', 'Cartão de Débito',
+                                               'Transferência', 'Parcelado', 'À Vista'], key=f'{key}_method')
+        necessity = col_necessity.selectbox('Necessidade', ['Todas', 'Essencial', 'Não essencial'],
+                                            key=f'{key}_necessity')
+    filters = {'start': start, 'end': end, 'type': type, 'payment_method': payment_method, 'necessity': necessity,
+               'text': text.strip()}
+    return {name: value for name, value in filters.items() if value not in (None, '', 'Todos', 'Todas')}
+
+def count_transactions(username, filters):
+    return request_cache.memoize(('transaction_count', username, repr(sorted(filters.items()))),
+                                 lambda: queries.count_matching(username, filters))
+
+def transaction_browser(username, key, filters):
+    """Grade paginada das transações: só a página visível é consultada e formatada.
+
+    As páginas seguem por chave (data ou quantia, id); a pilha de chaves das
+    páginas já vistas fica na sessão para o botão "Anterior" e recomeça quando
+    filtros ou ordenação mudam. Devolve o ledger da página exibida.
+    """
+    col_sort, col_order, col_size = st.columns(3)
+    sort = SORT_OPTIONS[col_sort.selectbox('Ordenar por', list(SORT_OPTIONS), key=f'{key}_sort')]
+    descending = col_order.selectbox('Ordem', ['Decrescente', 'Crescente'], key=f'{key}_order') == 'Decrescente'
+    size = col_size.selectbox('Linhas por página', PAGE_SIZES, index=1, key=f'{key}_size')
+
+    state = st.session_state.setdefault(f'{key}_pages', {'query': None, 'keys': [None]})
+    query = (repr(sorted(filters.items())), sort, descending, size)
+    if state['query'] != query:
+        state['query'], state['keys'] = query, [None]
+
+    page = queries.fetch_page(username, filters, sort, descending, after=state['keys'][-1], size=size)
+    total = count_transactions(username, filters)
+    number = len(state['keys'])
+
+    if len(page.ledger):
+        df = page.ledger.to_frame(dates_as_text=True).set_index('id')
+        df['Quantia'] = money.format_cents_column(page.ledger.cents)
+        st.dataframe(df)
+    else:
+        st.info('Nenhuma transação encontrada com esses filtros.')
+
+    pages = max(1, -(-total // size))
+    col_prev, col_info, col_next = st.columns([1, 2, 1])
+    col_info.caption(f'Página {number} de {pages} · {total} transações')
+    if col_prev.button('Anterior', key=f'{key}_prev', disabled=number == 1):
+        state['keys'].pop()
+        st.rerun()
+    if col_next.button('Próxima', key=f'{key}_next', disabled=page.next_key is None):
+        state['keys'].append(page.next_key)
+        st.rerun()
+    return page.ledger
 
 # Função para adicionar o footer
-#def add_footer():
-    #st.markdown(
+def add_footer():
+    st.markdown(
         """
         <style>
          .footer {
@@ -156,14 +330,13 @@ def alert_overdraft_and_credit(username):
 
 # Funções das páginas
 def home():
-    create_database()  # Garantir que o banco de dados existe
     st.title('FinFusion - Controle Financeiro')
 
     if 'logged_in' in st.session_state and st.session_state['logged_in']:
         username = st.session_state['username']
         # Exibir saldo líquido
         balance = calculate_total_balance(username)
-        st.subheader(f'Saldo Líquido: {format_currency(balance)}')
+        st.subheader(f'Saldo Líquido: {money.format_currency(balance)}')
 
         # Exibir alerta de cheque especial
         if balance < 0:
@@ -171,7 +344,7 @@ def home():
             overdraft_interest = 0.08
             interest_amount = overdraft_amount * overdraft_interest
             st.error(f"Alerta: Você está no cheque especial! Juros de 8% ao mês serão aplicados. "
-                     f"Saldo: {format_currency(balance)}. Juros futuros: {format_currency(interest_amount)} por mês.")
+                     f"Saldo: {money.format_currency(balance)}. Juros futuros: {money.format_currency(interest_amount)} por mês.")
 
         # Exibir navegação lateral
         sidebar_navigation()
@@ -181,11 +354,14 @@ def home():
         username = st.text_input('Usuário')
         password = st.text_input('Senha', type='password')
         if st.button('Entrar'):
-            if verify_password(username, password):
-                st.session_state['username'] = username
-                st.session_state['logged_in'] = True
-            else:
-                st.error('Nome de usuário ou senha incorretos.')
+            try:
+                if verify_password(username, password):
+                    st.session_state['username'] = username
+                    st.session_state['logged_in'] = True
+                else:
+                    st.error('Nome de usuário ou senha incorretos.')
+            except passwords.LoginThrottled as e:
+                st.error(str(e))
 
         # Formulário de registro
         st.subheader('Registrar')
@@ -210,18 +386,23 @@ def insert_data_page():
         payment_method = st.selectbox("Método de Pagamento", ["Dinheiro", "Cartão de Crédito", "Cartão de Débito", "Transferência"])
         installments = st.number_input("Parcelas", min_value=1, max_value=12, value=1)
         necessity = st.selectbox("Necessidade", ["Essencial", "Não essencial"])
+        cards = statements.list_cards(username)
+        card = st.selectbox("Cartão (compras no crédito)", cards, format_func=lambda c: c.name) if len(cards) > 1 else None
         submit_button = st.form_submit_button("Adicionar")
 
     if submit_button:
-        add_financial_data(username, date, description, amount, type, payment_method, installments, necessity)
+        card_id = card.id if card is not None and payment_method == "Cartão de Crédito" else None
+        add_financial_data(username, date, description, amount, type, payment_method, installments, necessity, card_id)
         st.success("Dados adicionados com sucesso!")
 
     # Adiciona o campo de upload de Excel
-    uploaded_file = st.file_uploader("Escolha uma planilha Excel", type=["xlsx"])
-    if uploaded_file is not None:
-        df = upload_excel(uploaded_file)
-        if df is not None:
-            st.dataframe(df)  # Exibe os dados carregados
+    uploaded_file = st.file_uploader("Escolha uma planilha Excel ou CSV", type=["xlsx", "csv"])
+    if uploaded_file is not None and st.button("Importar planilha"):
+        report = upload_excel(username, uploaded_file)
+        if report is not None:
+            st.success(f"{report.imported} linhas importadas, {report.skipped} ignoradas.")
+            for error in report.errors:
+                st.warning(error)
 
     #add_footer()
 
@@ -230,17 +411,18 @@ def financial_data_page():
 
     username = st.session_state['username']
 
-    financial_data = get_financial_data(username)
-    if len(financial_data) == 0:
+    if get_financial_summary(username).transactions == 0:
         st.warning('Nenhum dado financeiro disponível.')
         return
 
     st.subheader('Dados Financeiros')
-    df = pd.DataFrame(financial_data, columns=['id', 'Data', 'Descrição', 'Quantia', 'Tipo', 'Método de Pagamento', 'Parcelas', 'Necessidade'])
-    st.table(df.drop(columns=['id']))
+    transaction_browser(username, 'browse', transaction_filters('browse'))
 
     display_major_expenses(username)
+    display_upcoming_installments(username)
     alert_overdraft_and_credit(username)
+    credit_cards_section(username)
+    export_data_section(username)
 
     add_footer()
 
@@ -249,25 +431,42 @@ def remove_data_page():
 
     username = st.session_state['username']
 
-    financial_data = get_financial_data(username)
-    if len(financial_data) == 0:
+    if get_financial_summary(username).transactions == 0:
         st.warning('Nenhum dado financeiro disponível para remoção.')
         return
 
     st.subheader('Selecione os dados para remover')
-    df = pd.DataFrame(financial_data, columns=['id', 'Data', 'Descrição', 'Quantia', 'Tipo', 'Método de Pagamento', 'Parcelas', 'Necessidade'])
-    df = df.drop(columns=['id'])  # Remove a coluna 'id' para exibição
-    selected_rows = st.multiselect('Escolha os dados a serem removidos', df.index, format_func=lambda x: f"{df.loc[x, 'Descrição']} - {format_currency(df.loc[x, 'Quantia'])}")
+    filters = transaction_filters('remove')
+    rows = transaction_browser(username, 'remove', filters)
+
+    # A seleção individual oferece só as linhas da página exibida
+    labels = {int(id): f"{day} - {description} - {amount}" for id, day, description, amount
+              in zip(rows.id, np.datetime_as_string(rows.date, unit='D'), rows.description,
+                     money.format_cents_column(rows.cents))}
+    selected_ids = st.multiselect('Escolha os dados a serem removidos', list(labels), format_func=labels.get)
 
     if st.button('Remover selecionados'):
-        if selected_rows:
-            ids_to_remove = [financial_data[i][0] for i in selected_rows]
-            remove_financial_data(ids_to_remove)
-            st.success(f'Dados removidos com sucesso!')
-            #st.experimental_rerun()
+        if selected_ids:
+            removed = queries.delete_ids(username, selected_ids)
+            request_cache.invalidate(username)
+            st.success(f'{removed} registros removidos com sucesso!')
         else:
             st.warning("Selecione ao menos um dado para remover.")
 
+    # Remoção em massa pelo filtro, sem listar as linhas
+    if filters:
+        st.subheader('Remover pelo filtro')
+        total = count_transactions(username, filters)
+        # A confirmação vale para este filtro e esta contagem: outro filtro, ou a mesma
+        # seleção depois de uma remoção, gera outra chave e pede nova confirmação
+        fingerprint = repr((sorted(filters.items()), total))
+        confirm = st.checkbox(f'Confirmo a remoção das {total} transações que atendem aos filtros',
+                              key=f'remove_confirm_{fingerprint}')
+        if st.button('Remover todas as filtradas', disabled=not confirm or total == 0):
+            removed = queries.delete_matching(username, filters)
+            request_cache.invalidate(username)
+            st.success(f'{removed} registros removidos com sucesso!')
+
     add_footer()
 
 def analysis_page():
@@ -280,61 +479,138 @@ def analysis_page():
         'Valor': np.random.randn(100).cumsum()
     }).set_index('Data')
     
-    fig, ax = plt.subplots()
-    ax.plot(df_example.index, df_example['Valor'])
-    ax.set_title("Gastos")
-    ax.set_xlabel("Data")
-    ax.set_ylabel("Valor")
-    ax.grid(color='gray', linestyle='--', linewidth=0.5)
-    ax.set_facecolor('black')
-    fig.patch.set_facecolor('black')
-    ax.tick_params(axis='both', colors='white')
-    ax.xaxis.label.set_color('white')
-    ax.yaxis.label.set_color('white')
-    ax.title.set_color('white')
-    
-    st.pyplot(fig)
+    st.image(chart_render.render_line(df_example['Valor'], "Gastos", "Data", "Valor"))
 
-    st.subheader('Evolução do Bitcoin, Ethereum, IBOVESPA e NASDAQ')
-    
-    end_date = datetime.today()
-    start_date = end_date - timedelta(days=180)
-    
-    symbols = {'Bitcoin': 'BTC-USD', 'Ethereum': 'ETH-USD', 'IBOVESPA': '^BVSP', 'NASDAQ': '^IXIC'}
-    data = {}
-    
-    for name, symbol in symbols.items():
-        data[name] = yf.download(symbol, start=start_date, end=end_date)
-    
-    for name, df in data.items():
-        fig, ax = plt.subplots()
-        ax.plot(df.index, df['Close'])
-        ax.set_title(f'Evolução do {name}')
-        ax.set_xlabel('Data')
-        ax.set_ylabel('Preço de Fechamento')
-        ax.grid(color='gray', linestyle='--', linewidth=0.5)
-        ax.set_facecolor('black')
-        fig.patch.set_facecolor('black')
-        ax.tick_params(axis='both', colors='white')
-        ax.xaxis.label.set_color('white')
-        ax.yaxis.label.set_color('white')
-        ax.title.set_color('white')
-        
-        st.pyplot(fig)
+    username = st.session_state['username']
+    watchlist_editor(username)
+    entries = watchlist.get_watchlist(username)
+    labels = dict(entries)
+    if not labels:
+        st.info('Sua lista de acompanhamento está vazia. Adicione símbolos acima.')
+        return
+
+    st.subheader('Evolução de ' + ', '.join(labels.values()))
+
+    # Cotações buscadas pelo worker; a página usa o último resultado pronto sem esperar o provedor
+    market = dashboard.request_market(list(labels), MARKET_DAYS, owner=username)
+    if market is None:
+        st.info('Carregando cotações em segundo plano...')
+        st.button('Atualizar')
+        return
+    st.caption(dashboard.freshness(market))
+
+    for symbol, df in market.value.items():
+        if not df.empty:
+            st.image(chart_render.render_line(df['Close'], f'Evolução do {labels[symbol]}', 'Data', 'Preço de Fechamento'))
+
+    # Indicadores de todos os símbolos em uma única passada sobre a matriz de preços
+    table = indicators.compute(indicators.price_matrix(market.value))
+    table = table.dropna(subset=['last'])
+    if table.empty:
+        return
+
+    st.subheader('Indicadores')
+    st.dataframe(pd.DataFrame({
+        'Ativo': [labels[symbol] for symbol in table.index],
+        'Preço': money.format_column(table['last']),
+        'Média 20': money.format_column(table['sma']),
+        'MME 20': money.format_column(table['ema']),
+        'Volatilidade': table['volatility'].map('{:.1%}'.format).values,
+        'Queda do pico': table['drawdown'].map('{:.1%}'.format).values,
+        'Maior queda': table['max_drawdown'].map('{:.1%}'.format).values,
+        'Z-score': table['zscore'].round(2).values,
+    }), hide_index=True)
 
     st.subheader('Sugestões de Compra')
-    for name, df in data.items():
-        current_price = df['Close'].iloc[-1]
-        st.write(f'Preço atual do {name}: {format_currency(current_price)}')
-        if current_price < df['Close'].mean():
+    buy = indicators.buy_signals(table)
+    for symbol, row in table.iterrows():
+        name = labels[symbol]
+        st.write(f'Preço atual do {name}: {money.format_currency(row["last"])}')
+        if buy[symbol]:
             st.write(f'Sugestão: Pode ser uma boa hora para comprar {name}.')
         else:
             st.write(f'Sugestão: Espere uma possível queda no preço de {name} antes de comprar.')
 
+def portfolio_page():
+    st.title("Carteira de Investimentos")
+
+    username = st.session_state['username']
+
+    with st.form("trade_form"):
+        col_symbol, col_side = st.columns(2)
+        symbol = col_symbol.text_input("Símbolo (ex.: PETR4.SA, AAPL, BTC-USD)")
+        side = col_side.selectbox("Operação", ["Compra", "Venda"])
+        day = st.date_input("Data")
+        col_quantity, col_price, col_fees = st.columns(3)
+        quantity = col_quantity.number_input("Quantidade", min_value=0.0, format="%.6f")
+        price = col_price.number_input("Preço", min_value=0.0, format="%.2f")
+        fees = col_fees.number_input("Taxas", min_value=0.0, format="%.2f")
+        if st.form_submit_button("Registrar operação") and symbol and quantity > 0:
+            portfolio.add_trade(username, symbol, day, quantity if side == "Compra" else -quantity, price, fees)
+            st.success("Operação registrada com sucesso!")
+
+    trades = portfolio.trades_frame(username)
+    if trades.empty:
+        st.info('Nenhuma operação registrada.')
+        return
+
+    # As cotações desde a primeira operação são buscadas pelo worker; a valoração usa o cache
+    days = (datetime.today() - trades['date'].min()).days + 1
+    market = dashboard.request_market(sorted(trades['symbol'].unique()), days, owner=username)
+    if market is None:
+        st.info('Carregando cotações em segundo plano...')
+        st.button('Atualizar')
+        return
+    st.caption(dashboard.freshness(market))
+
+    positions = portfolio.holdings(username)
+    positions = positions[positions['quantity'] != 0]
+    st.subheader('Posições')
+    st.dataframe(pd.DataFrame({
+        'Ativo': positions.index,
+        'Quantidade': positions['quantity'].values,
+        'Preço': money.format_column(positions['price']),
+        'Valor': money.format_column(positions['value']),
+        'Aplicado': money.format_column(positions['invested']),
+        'Resultado': money.format_column(positions['pnl']),
+        'Peso': positions['weight'].map('{:.1%}'.format).values,
+    }), hide_index=True)
+
+    series = portfolio.portfolio_series(username)
+    if not series.empty:
+        last = series.iloc[-1]
+        col_value, col_pnl = st.columns(2)
+        col_value.metric('Valor da carteira', money.format_currency(last['value']))
+        col_pnl.metric('Resultado', money.format_currency(last['pnl']))
+        st.image(chart_render.render_line(series[['value', 'invested']], 'Valor x Aplicado', 'Data', 'Valor'))
+        st.image(chart_render.render_line(series['pnl'], 'Resultado da Carteira', 'Data', 'Resultado'))
+
+    allocation = portfolio.allocation_series(username)
+    if not allocation.empty:
+        st.subheader('Alocação ao Longo do Tempo')
+        st.area_chart(allocation.fillna(0))
+
+def watchlist_editor(username):
+    """Adiciona e remove símbolos da lista de acompanhamento do usuário."""
+    with st.expander('Lista de acompanhamento'):
+        entries = watchlist.get_watchlist(username)
+        col_symbol, col_label = st.columns(2)
+        symbol = col_symbol.text_input('Símbolo (ex.: PETR4.SA, AAPL, BTC-USD)')
+        label = col_label.text_input('Nome')
+        if st.button('Adicionar à lista') and symbol:
+            watchlist.add_symbol(username, symbol, label or None)
+            st.success(f'{watchlist.normalize_symbol(symbol)} adicionado.')
+        removed = st.multiselect('Remover', [s for s, _ in entries],
+                                 format_func=lambda s: f"{dict(entries)[s]} ({s})")
+        if st.button('Remover da lista') and removed:
+            for symbol in removed:
+                watchlist.remove_symbol(username, symbol)
+            st.success('Lista atualizada.')
+
 # Função para navegação do sidebar
 def sidebar_navigation():
     st.sidebar.title("Navegação")
-    page = st.sidebar.selectbox("Escolha uma página", ["Inserir Dados", "Dados Financeiros", "Remover Dados", "Análises e Gráficos"])
+    page = st.sidebar.selectbox("Escolha uma página", ["Inserir Dados", "Dados Financeiros", "Remover Dados", "Análises e Gráficos", "Carteira"])
 
     if page == "Inserir Dados":
         insert_data_page()
@@ -344,6 +620,36 @@ def sidebar_navigation():
         remove_data_page()
     elif page == "Análises e Gráficos":
         analysis_page()
+    elif page == "Carteira":
+        portfolio_page()
+
+    background_jobs_panel()
+
+    if st.sidebar.button('Sair'):
+        logout()
+
+def logout():
+    username = st.session_state['username']
+    dashboard.forget_user(username)
+    request_cache.invalidate(username)
+    st.session_state['username'] = None
+    st.session_state['logged_in'] = False
+    st.rerun()
+
+def background_jobs_panel():
+    """Estado das tarefas em segundo plano, na barra lateral."""
+    # Só as tarefas pedidas por este usuário: as chaves trazem nomes, símbolos e erros
+    jobs = worker.get_worker().jobs(owner=st.session_state['username'])
+    if not jobs:
+        return
+    with st.sidebar.expander('Tarefas em segundo plano'):
+        st.dataframe(pd.DataFrame([{
+            'Tarefa': ' / '.join(str(part) for part in job.key),
+            'Estado': job.status,
+            'Início': job.started_at.strftime('%H:%M:%S') if job.started_at else '',
+            'Fim': job.finished_at.strftime('%H:%M:%S') if job.finished_at else '',
+            'Erro': job.error or '',
+        } for job in jobs]), hide_index=True)
 
 # Inicializar a aplicação
 if __name__ == '__main__':
@@ -352,5 +658,9 @@ if __name__ == '__main__':
     if 'logged_in' not in st.session_state:
         st.session_state['logged_in'] = False
 
+    request_cache.begin_request()
     create_database()
+    if st.session_state['logged_in']:
+        username = st.session_state['username']
+        dashboard.prefetch_market(watchlist.symbols(username), MARKET_DAYS, owner=username)
     home()
@@ -0,0 +1,127 @@
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import money
+import storage
+
+# Saldo corrente por usuário com checkpoints. A cada CHECKPOINT_INTERVAL
+# lançamentos, na ordem (date, id), guardamos o saldo acumulado; o saldo em uma
+# data é o último checkpoint anterior mais a soma de no máximo
+# CHECKPOINT_INTERVAL lançamentos. Inserções fora de ordem só descartam os
+# checkpoints a partir da data alterada (trigger), que são refeitos sob demanda.
+
+CHECKPOINT_INTERVAL = 256
+
+# Em centavos: o saldo é somado em inteiros e só vira reais na saída
+SIGNED_AMOUNT = "CASE type WHEN 'Receita' THEN amount_cents WHEN 'Despesa' THEN -amount_cents ELSE 0 END"
+
+TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS trg_balance_checkpoints_insert AFTER INSERT ON financial_data BEGIN "
+    "DELETE FROM balance_checkpoints WHERE username = NEW.username AND date >= NEW.date; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_balance_checkpoints_delete AFTER DELETE ON financial_data BEGIN "
+    "DELETE FROM balance_checkpoints WHERE username = OLD.username AND date >= OLD.date; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_balance_checkpoints_update AFTER UPDATE ON financial_data BEGIN "
+    "DELETE FROM balance_checkpoints WHERE username = OLD.username AND date >= OLD.date; "
+    "DELETE FROM balance_checkpoints WHERE username = NEW.username AND date >= NEW.date; END",
+]
+
+# Lançamentos posteriores a um checkpoint (date, id), em ordem
+_AFTER = "username = ? AND date >= ? AND (date > ? OR id > ?)"
+
+
+def _as_iso(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)[:10]
+
+
+def _last_checkpoint(conn, username, day=None):
+    """(seq, date, id, saldo em centavos) do último checkpoint (até `day`, se informado)."""
+    if day is None:
+        row = conn.execute("SELECT seq, date, id, balance_cents FROM balance_checkpoints "
+                           "WHERE username = ? ORDER BY seq DESC LIMIT 1", (username,)).fetchone()
+    else:
+        row = conn.execute("SELECT seq, date, id, balance_cents FROM balance_checkpoints "
+                           "WHERE username = ? AND date <= ? ORDER BY seq DESC LIMIT 1", (username, day)).fetchone()
+    return row or (0, '', 0, 0)
+
+
+def _extend(conn, username):
+    """Cria os checkpoints que faltam depois do último válido."""
+    seq, cp_date, cp_id, balance = _last_checkpoint(conn, username)
+    rows = conn.execute(f"SELECT date, id, {SIGNED_AMOUNT} FROM financial_data WHERE {_AFTER} ORDER BY date, id",
+                        (username, cp_date, cp_date, cp_id))
+    checkpoints = []
+    for position, (row_date, row_id, amount) in enumerate(rows, start=1):
+        balance += amount
+        if position % CHECKPOINT_INTERVAL == 0:
+            seq += 1
+            checkpoints.append((username, seq, row_date, row_id, balance))
+    conn.executemany("INSERT INTO balance_checkpoints (username, seq, date, id, balance_cents) VALUES (?, ?, ?, ?, ?)",
+                     checkpoints)
+    return len(checkpoints)
+
+
+def ensure_checkpoints(username):
+    """Refaz os checkpoints do usuário apenas se a cauda passou de CHECKPOINT_INTERVAL lançamentos."""
+    with storage.connection() as conn:
+        _, cp_date, cp_id, _ = _last_checkpoint(conn, username)
+        tail = conn.execute(f"SELECT COUNT(*) FROM (SELECT 1 FROM financial_data WHERE {_AFTER} LIMIT ?)",
+                            (username, cp_date, cp_date, cp_id, CHECKPOINT_INTERVAL)).fetchone()[0]
+    if tail >= CHECKPOINT_INTERVAL:
+        with storage.transaction() as conn:
+            _extend(conn, username)
+
+
+def rebuild(username=None, conn=None):
+    """Descarta e recria os checkpoints (de um usuário ou de todos)."""
+    if conn is None:
+        with storage.transaction() as conn:
+            return rebuild(username, conn)
+    if username is not None:
+        usernames = [username]
+    else:
+        usernames = [row[0] for row in conn.execute("SELECT DISTINCT username FROM financial_data")]
+    conn.execute("DELETE FROM balance_checkpoints" + (" WHERE username = ?" if username is not None else ""),
+                 (username,) if username is not None else ())
+    return sum(_extend(conn, name) for name in usernames)
+
+
+def _balance_cents_at(username, day):
+    ensure_checkpoints(username)
+    day = _as_iso(day)
+    with storage.connection() as conn:
+        _, cp_date, cp_id, balance = _last_checkpoint(conn, username, day)
+        delta = conn.execute(f"SELECT COALESCE(SUM({SIGNED_AMOUNT}), 0) FROM financial_data "
+                             f"WHERE {_AFTER} AND date <= ?", (username, cp_date, cp_date, cp_id, day)).fetchone()[0]
+    return balance + delta
+
+
+def balance_at(username, day):
+    """Saldo (receitas - despesas) do usuário ao final do dia `day`."""
+    return money.to_reais(_balance_cents_at(username, day))
+
+
+def balance_series(username, start=None, end=None):
+    """Saldo ao final de cada dia com lançamentos entre `start` e `end` (Series indexada por data)."""
+    ensure_checkpoints(username)
+    conditions, params = ["username = ?"], [username]
+    opening = 0
+    if start is not None:
+        start = _as_iso(start)
+        opening = _balance_cents_at(username, date.fromisoformat(start) - timedelta(days=1))
+        conditions.append("date >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("date <= ?")
+        params.append(_as_iso(end))
+    with storage.connection() as conn:
+        rows = conn.execute(f"SELECT date, SUM({SIGNED_AMOUNT}) FROM financial_data "
+                            f"WHERE {' AND '.join(conditions)} GROUP BY date ORDER BY date", params).fetchall()
+    series = pd.Series([amount for _, amount in rows], index=pd.to_datetime([day for day, _ in rows]),
+                       name='net_balance', dtype='int64')
+    # Acumulado em centavos inteiros; a divisão final não acumula erro
+    return (series.cumsum() + opening) / 100
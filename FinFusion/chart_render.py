@@ -0,0 +1,102 @@
+import hashlib
+import io
+
+import pandas as pd
+
+import shared_cache
+
+# Renderização dos gráficos no servidor com cache. A chave é o hash dos dados
+# mais o estilo, então um rerun (ou outra sessão) com os mesmos dados devolve a
+# imagem pronta sem passar pelo matplotlib.
+
+# Tema escuro compartilhado (substitui os set_facecolor/set_color por eixo)
+DARK_THEME = {
+    'figure.facecolor': 'black',
+    'savefig.facecolor': 'black',
+    'axes.facecolor': 'black',
+    'axes.edgecolor': 'white',
+    'axes.labelcolor': 'white',
+    'axes.titlecolor': 'white',
+    'xtick.color': 'white',
+    'ytick.color': 'white',
+    'text.color': 'white',
+    'axes.grid': True,
+    'grid.color': 'gray',
+    'grid.linestyle': '--',
+    'grid.linewidth': 0.5,
+    'legend.facecolor': 'black',
+    'legend.edgecolor': 'gray',
+}
+
+THEMES = {
+    'dark': DARK_THEME,
+    'default': {},
+}
+
+
+def fingerprint(data, **style):
+    """Hash estável dos dados (valores e índice) e das opções de estilo."""
+    digest = hashlib.sha1()
+    if isinstance(data, (pd.Series, pd.DataFrame)):
+        digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+        columns = data.columns if isinstance(data, pd.DataFrame) else [data.name]
+        digest.update(repr(list(columns)).encode())
+    else:
+        digest.update(repr(data).encode())
+    digest.update(repr(sorted(style.items())).encode())
+    return digest.hexdigest()
+
+
+# Imagens prontas, compartilhadas pelas sessões (mesmos dados e estilo, mesma imagem)
+_cache = shared_cache.cache('charts', max_entries=128)
+
+
+def _render(draw, theme, fmt, figsize):
+    import matplotlib
+    from matplotlib.figure import Figure
+
+    # Figure sem pyplot: não entra no gerenciador global e é liberada ao sair daqui
+    with matplotlib.rc_context(THEMES[theme]):
+        fig = Figure(figsize=figsize)
+        ax = fig.subplots()
+        draw(ax)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, bbox_inches='tight')
+    fig.clear()
+    return buffer.getvalue()
+
+
+def _labels(ax, title, xlabel, ylabel):
+    ax.set_title(title)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+
+
+def render_line(data, title='', xlabel='', ylabel='', theme='dark', fmt='png', figsize=(6.4, 4.8)):
+    """Gráfico de linha de uma Series (ou das colunas de um DataFrame) pelo índice."""
+    key = fingerprint(data, kind='line', title=title, xlabel=xlabel, ylabel=ylabel,
+                      theme=theme, fmt=fmt, figsize=figsize)
+
+    def draw(ax):
+        ax.plot(data.index, data.values)
+        if isinstance(data.index, pd.DatetimeIndex):
+            ax.figure.autofmt_xdate()
+        _labels(ax, title, xlabel, ylabel)
+
+    return _cache.get(key, lambda: _render(draw, theme, fmt, figsize))
+
+
+def render_bar(frame, title='', xlabel='', ylabel='', theme='dark', fmt='png', figsize=(6.4, 4.8)):
+    """Gráfico de barras agrupadas das colunas de um DataFrame."""
+    key = fingerprint(frame, kind='bar', title=title, xlabel=xlabel, ylabel=ylabel,
+                      theme=theme, fmt=fmt, figsize=figsize)
+
+    def draw(ax):
+        frame.plot(kind='bar', ax=ax)
+        _labels(ax, title, xlabel, ylabel)
+
+    return _cache.get(key, lambda: _render(draw, theme, fmt, figsize))
+
+
+def cache_stats():
+    return _cache.stats()
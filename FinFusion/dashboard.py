@@ -0,0 +1,142 @@
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import aggregation
+import balance_ledger
+import chart_render
+import market_data
+import rollups
+import statements
+import worker
+
+# Painéis pré-calculados no worker. As páginas pedem o painel (request_*) e
+# recebem na hora o último resultado pronto, ou None na primeira vez; o cálculo
+# novo roda em segundo plano quando os dados do usuário mudam (revisão) ou
+# quando as cotações passam do TTL do cache de mercado.
+
+MARKET_DAYS = 365
+
+# Um dono (a sessão de um usuário) que passa esse tempo sem pedir a atualização
+# periódica deixa de segurá-la; sem nenhum dono, ela para
+PREFETCH_IDLE = timedelta(minutes=30)
+
+# Dono -> (chave da atualização periódica, último pedido); as sessões rodam em
+# threads próprias, então todo acesso passa por _prefetch_lock
+_prefetch_owners = {}
+_prefetch_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Dashboard:
+    summary: aggregation.FinancialSummary
+    monthly_totals: pd.DataFrame
+    net_balance: pd.Series
+    monthly_chart: bytes
+    balance_chart: bytes
+
+
+def build_dashboard(username, theme='default'):
+    """Resumo, totais mensais, saldo ao longo do tempo e os dois gráficos do usuário."""
+    summary = aggregation.summarize(username)
+    net_balance = balance_ledger.balance_series(username)
+    if net_balance.empty:
+        return Dashboard(summary, pd.DataFrame(), net_balance, None, None)
+    monthly = rollups.monthly_totals(username, spread_installments=True)
+    return Dashboard(
+        summary, monthly, net_balance,
+        chart_render.render_bar(monthly, 'Renda e Despesas por Mês', 'Mês', 'Quantia', theme=theme),
+        chart_render.render_line(net_balance, 'Saldo Líquido ao Longo do Tempo', 'Data', 'Saldo Líquido', theme=theme),
+    )
+
+
+def request_dashboard(username, theme='default'):
+    """Último painel pronto do usuário; agenda o recálculo se os dados mudaram."""
+    return worker.get_worker().ensure(('dashboard', username, theme), build_dashboard, username, theme,
+                                      tag=statements.revision(username), owner=username)
+
+
+def build_market(symbols, days=MARKET_DAYS):
+    """Histórico dos últimos `days` dias de cada símbolo: {símbolo: DataFrame}.
+
+    Um símbolo inválido ou indisponível vira um DataFrame vazio, sem derrubar os demais.
+    """
+    start = date.today() - timedelta(days=days)
+    futures = {symbol: market_data.get_scheduler().submit(symbol, start) for symbol in symbols}
+    history = {}
+    for symbol, future in futures.items():
+        try:
+            history[symbol] = future.result()
+        except Exception:
+            history[symbol] = pd.DataFrame(columns=market_data.BAR_COLUMNS)
+    return history
+
+
+def request_market(symbols, days=MARKET_DAYS, owner=None):
+    """Últimas cotações prontas dos símbolos; agenda a atualização passado o TTL."""
+    symbols = tuple(symbols)
+    return worker.get_worker().ensure(('market', symbols, days), build_market, symbols, days,
+                                      max_age=market_data.DEFAULT_TTL, owner=owner)
+
+
+def prefetch_market(symbols, days=MARKET_DAYS, owner=None):
+    """Mantém as cotações dos símbolos atualizadas em segundo plano, a cada TTL.
+
+    Com `owner`, uma nova lista substitui a anterior do mesmo dono em vez de se somar a
+    ela; a atualização para PREFETCH_IDLE depois do último pedido de qualquer dono.
+    """
+    symbols = tuple(symbols)
+    if not symbols:
+        if owner is not None:
+            release(owner)
+        return
+    key = ('market', symbols, days)
+    background = worker.get_worker()
+    now = datetime.now()
+    with _prefetch_lock:
+        previous = _prefetch_owners.get(owner, (None, None))[0] if owner is not None else None
+        if owner is not None:
+            _prefetch_owners[owner] = (key, now)
+        idle = [name for name, (_, seen) in _prefetch_owners.items() if now - seen >= PREFETCH_IDLE]
+        released = [_prefetch_owners.pop(name)[0] for name in idle]
+        if previous is not None and previous != key:
+            released.append(previous)
+        _cancel_unused(background, released)
+        background.every(key, market_data.DEFAULT_TTL, build_market, symbols, days, idle=PREFETCH_IDLE,
+                         owner=owner)
+
+
+def _cancel_unused(background, keys):
+    # Sob _prefetch_lock: para as atualizações que nenhum dono restante usa
+    in_use = {key for key, _ in _prefetch_owners.values()}
+    for key in set(keys) - in_use:
+        background.cancel(key)
+
+
+def release(owner):
+    """Libera a atualização periódica do dono (ao sair da conta)."""
+    with _prefetch_lock:
+        entry = _prefetch_owners.pop(owner, None)
+        if entry is not None:
+            _cancel_unused(worker.get_worker(), [entry[0]])
+
+
+def forget_user(username):
+    """Ao sair: libera as cotações periódicas do usuário e descarta os painéis calculados para ele."""
+    release(username)
+    background = worker.get_worker()
+    background.discard(lambda key: key[0] == 'dashboard' and key[1] == username)
+    background.disown(username)
+
+
+def freshness(result):
+    """Texto "atualizado em ..." do resultado, indicando quando há um recálculo em andamento."""
+    text = f"Atualizado em {result.completed_at.strftime('%d/%m/%Y %H:%M')}"
+    job = worker.get_worker().job(result.key)
+    if job is not None and job.status in (worker.QUEUED, worker.RUNNING):
+        text += " (desatualizado, recalculando em segundo plano)"
+    elif job is not None and job.status == worker.FAILED:
+        text += f" (falha na última atualização: {job.error})"
+    return text
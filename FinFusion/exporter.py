@@ -0,0 +1,69 @@
+import csv
+import io
+import re
+from datetime import date
+
+import queries
+import storage
+
+# Exportação dos dados financeiros direto do cursor do SQLite para um buffer em
+# memória (CSV ou Excel em modo write_only). As linhas são lidas em blocos com
+# fetchmany, sem montar lista ou DataFrame, e nenhum arquivo é gravado no servidor.
+
+EXPORT_HEADER = ['Data', 'Descrição', 'Quantia', 'Tipo', 'Método de Pagamento', 'Parcelas', 'Necessidade']
+EXPORT_COLUMNS = "date, description, amount, type, payment_method, installments, necessity"
+FETCH_SIZE = 2000
+
+FORMATS = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+}
+
+
+def iter_export_rows(username, start=None, end=None, type=None, payment_method=None, necessity=None):
+    """Gera as linhas do usuário que atendem aos filtros, em blocos de FETCH_SIZE."""
+    sql, params = queries.build_query(username, start, end, type, payment_method, necessity, columns=EXPORT_COLUMNS)
+    with storage.connection() as conn:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            yield from rows
+
+
+def export_csv(username, **filters):
+    """CSV (UTF-8 com BOM, separado por ';' para abrir direto no Excel) em bytes."""
+    buffer = io.BytesIO()
+    text = io.TextIOWrapper(buffer, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text, delimiter=';')
+    writer.writerow(EXPORT_HEADER)
+    writer.writerows(iter_export_rows(username, **filters))
+    text.flush()
+    data = buffer.getvalue()
+    text.close()
+    return data
+
+
+def export_excel(username, **filters):
+    """Planilha .xlsx gerada com openpyxl em modo write_only, em bytes."""
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Dados Financeiros')
+    ws.append(EXPORT_HEADER)
+    for row in iter_export_rows(username, **filters):
+        ws.append(row)
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def export(username, fmt='xlsx', **filters):
+    """Exporta no formato pedido; devolve (bytes, nome do arquivo, mime type)."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato de exportação não suportado: {fmt}")
+    data = export_excel(username, **filters) if fmt == 'xlsx' else export_csv(username, **filters)
+    safe_username = re.sub(r'[^\w.-]', '_', username)
+    filename = f"finfusion_{safe_username}_{date.today().isoformat()}.{fmt}"
+    return data, filename, FORMATS[fmt]
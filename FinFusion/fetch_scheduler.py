@@ -0,0 +1,118 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Busca concorrente de cotações. As requisições de vários símbolos rodam em um
+# pool limitado de threads, pedidos idênticos em andamento são compartilhados
+# entre sessões e cada provedor tem seu próprio limite de requisições.
+
+
+
+class EmptyResponse(Exception):
+    """O provedor respondeu sem dados para um intervalo que deveria ter (falha silenciosa)."""
+
+
+RETRYABLE_ERRORS = (OSError, EmptyResponse)  # OSError inclui BrokenPipeError, ConnectionError e TimeoutError
+
+
+class RateLimiter:
+    """Token bucket: até `burst` requisições imediatas e `rate` por segundo em média."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self.sleep(wait)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider, rate=2.0, burst=4):
+    """Limitador compartilhado por todas as sessões para um provedor."""
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            limiter = _limiters[provider] = RateLimiter(rate, burst)
+        return limiter
+
+
+def backoff_delays(retries, base_delay=0.5, max_delay=8.0, rng=random):
+    """Esperas exponenciais com jitter completo: uniforme em [0, min(max, base * 2^n)]."""
+    for attempt in range(retries):
+        yield rng.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def with_retry(fetch, provider, retries=3, base_delay=0.5, max_delay=8.0,
+               retryable=RETRYABLE_ERRORS, limiter=None, sleep=time.sleep):
+    """Envolve `fetch` com limite de requisições do provedor e novas tentativas com backoff."""
+    limiter = limiter or get_rate_limiter(provider)
+
+    def fetch_with_retry(*args, **kwargs):
+        delays = backoff_delays(retries, base_delay, max_delay)
+        while True:
+            limiter.acquire()
+            try:
+                return fetch(*args, **kwargs)
+            except retryable:
+                delay = next(delays, None)
+                if delay is None:
+                    raise
+                sleep(delay)
+
+    return fetch_with_retry
+
+
+class FetchScheduler:
+    """Executa `fetch(symbol, start, end)` para vários símbolos em paralelo."""
+
+    def __init__(self, fetch, max_workers=4):
+        self.fetch = fetch
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='finfusion-fetch')
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, symbol, start, end=None):
+        """Agenda a busca; se a mesma já estiver em andamento, reaproveita o Future existente."""
+        key = (symbol, str(start)[:10], str(end)[:10] if end is not None else None)
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self._executor.submit(self.fetch, symbol, start, end)
+                self._in_flight[key] = future
+                future.add_done_callback(lambda done, key=key: self._forget(key, done))
+            return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def fetch_many(self, symbols, start, end=None):
+        """Busca todos os símbolos; a espera é limitada pelo mais lento, não pela soma."""
+        futures = {symbol: self.submit(symbol, start, end) for symbol in symbols}
+        return {symbol: future.result() for symbol, future in futures.items()}
+
+    def in_flight(self):
+        with self._lock:
+            return list(self._in_flight)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
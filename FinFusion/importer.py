@@ -0,0 +1,202 @@
+import csv
+import io
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+import money
+import storage
+
+# Importação de extratos (Excel ou CSV) para financial_data. As linhas são lidas
+# uma a uma (openpyxl em modo read_only ou csv.reader), normalizadas e gravadas
+# em lotes com executemany, cada lote em sua própria transação.
+
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 20
+
+# Nomes de coluna aceitos (sem acento, minúsculos) -> campo de financial_data
+HEADER_ALIASES = {
+    'date': 'date', 'data': 'date',
+    'description': 'description', 'descricao': 'description', 'historico': 'description',
+    'amount': 'amount', 'quantia': 'amount', 'valor': 'amount',
+    'type': 'type', 'tipo': 'type',
+    'payment_method': 'payment_method', 'metodo de pagamento': 'payment_method', 'forma de pagamento': 'payment_method',
+    'installments': 'installments', 'parcelas': 'installments',
+    'necessity': 'necessity', 'necessidade': 'necessity',
+}
+
+TYPE_ALIASES = {
+    'receita': 'Receita', 'renda': 'Receita', 'income': 'Receita', 'credito': 'Receita',
+    'despesa': 'Despesa', 'gasto': 'Despesa', 'expense': 'Despesa', 'debito': 'Despesa',
+}
+
+# Extratos antigos usam o meio de pagamento no lugar do tipo ("cartão de crédito")
+METHOD_TYPE_ALIASES = {'cartao de credito': 'Cartão de Crédito', 'cartao de debito': 'Cartão de Débito'}
+
+NECESSITY_ALIASES = {'essencial': 'Essencial', 'nao essencial': 'Não essencial'}
+
+
+@dataclass
+class ImportReport:
+    imported: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)
+
+
+def _plain(text):
+    """Texto minúsculo e sem acentos, para comparar cabeçalhos e categorias."""
+    text = unicodedata.normalize('NFKD', str(text).strip().lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def parse_date(value):
+    """Data em AAAA-MM-DD (o formato gravado) de um date, datetime ou texto AAAA-MM-DD / DD/MM/AAAA."""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    text = str(value).strip()
+    for fmt in ('%Y-%m-%d', '%d/%m/%Y', '%d/%m/%y', '%Y/%m/%d'):
+        try:
+            return datetime.strptime(text[:10], fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"data inválida: {value!r}")
+
+
+def _parse_amount(value):
+    """Quantia em centavos; o texto da planilha é convertido sem passar por float."""
+    if isinstance(value, (int, float)):
+        return money.to_cents(float(value))
+    text = str(value).strip().replace('R$', '').replace(' ', '')
+    if ',' in text and '.' in text and text.rfind('.') > text.rfind(','):
+        # Formato americano: 1,234.56
+        text = text.replace(',', '')
+    elif ',' in text:
+        # Formato brasileiro: 1.234,56
+        text = text.replace('.', '').replace(',', '.')
+    try:
+        return money.to_cents(text)
+    except ValueError:
+        raise ValueError(f"valor inválido: {value!r}") from None
+
+
+def normalize_record(record):
+    """Converte um registro {campo: valor} na tupla de colunas de financial_data (sem username)."""
+    if record.get('date') in (None, ''):
+        raise ValueError("data ausente")
+    if record.get('amount') in (None, ''):
+        raise ValueError("valor ausente")
+    amount = _parse_amount(record['amount'])
+
+    raw_type = record.get('type')
+    payment_method = record.get('payment_method') or None
+    if raw_type in (None, ''):
+        type = 'Despesa' if amount < 0 else 'Receita'
+    elif _plain(raw_type) in METHOD_TYPE_ALIASES:
+        type = 'Despesa'
+        payment_method = payment_method or METHOD_TYPE_ALIASES[_plain(raw_type)]
+    else:
+        type = TYPE_ALIASES.get(_plain(raw_type))
+        if type is None:
+            raise ValueError(f"tipo inválido: {raw_type!r}")
+
+    installments = record.get('installments')
+    installments = int(float(installments)) if installments not in (None, '') else 1
+    necessity = record.get('necessity')
+    necessity = NECESSITY_ALIASES.get(_plain(necessity), necessity) if necessity not in (None, '') else None
+    description = record.get('description')
+
+    return (
+        parse_date(record['date']),
+        str(description).strip() if description is not None else None,
+        abs(amount),  # o sinal já está representado em `type`
+        type,
+        payment_method,
+        installments,
+        necessity,
+    )
+
+
+def _map_header(header):
+    return [HEADER_ALIASES.get(_plain(name)) if name is not None else None for name in header]
+
+
+def iter_excel_rows(file):
+    """Lê a planilha em modo streaming; devolve (total estimado, gerador de registros)."""
+    import openpyxl
+
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    ws = wb.active
+    rows = ws.iter_rows(values_only=True)
+
+    def records():
+        try:
+            fields = _map_header(next(rows, ()))
+            for values in rows:
+                if values is None or all(v is None for v in values):
+                    continue
+                yield {f: v for f, v in zip(fields, values) if f is not None}
+        finally:
+            wb.close()
+
+    total = ws.max_row - 1 if ws.max_row else None
+    return total, records()
+
+
+def iter_csv_rows(file, encoding='utf-8-sig'):
+    """Lê o CSV linha a linha; devolve (total desconhecido, gerador de registros)."""
+    text = io.TextIOWrapper(file, encoding=encoding, newline='') if not isinstance(file, io.TextIOBase) else file
+    sample = text.read(4096)
+    text.seek(0)
+    dialect = csv.Sniffer().sniff(sample, delimiters=',;\t') if sample else csv.excel
+    reader = csv.reader(text, dialect)
+
+    def records():
+        fields = _map_header(next(reader, []))
+        for values in reader:
+            if not any(values):
+                continue
+            yield {f: v for f, v in zip(fields, values) if f is not None}
+
+    return None, records()
+
+
+def iter_rows(file, filename=None):
+    name = (filename or getattr(file, 'name', '') or '').lower()
+    if name.endswith('.csv'):
+        return iter_csv_rows(file)
+    return iter_excel_rows(file)
+
+
+def import_financial_data(username, file, filename=None, batch_size=BATCH_SIZE, progress=None):
+    """Importa o arquivo para o usuário; `progress(processadas, total)` é chamado a cada lote."""
+    total, records = iter_rows(file, filename)
+    report = ImportReport()
+    batch = []
+    processed = 0
+
+    def flush():
+        with storage.transaction() as conn:
+            conn.executemany(storage.INSERT_FINANCIAL_DATA, batch)
+        report.imported += len(batch)
+        batch.clear()
+        if progress is not None:
+            progress(processed, total)
+
+    for line, record in enumerate(records, start=2):
+        processed += 1
+        try:
+            batch.append((username, *normalize_record(record)))
+        except (ValueError, TypeError) as e:
+            report.skipped += 1
+            if len(report.errors) < MAX_REPORTED_ERRORS:
+                report.errors.append(f"linha {line}: {e}")
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    elif progress is not None:
+        progress(processed, total)
+    return report
@@ -0,0 +1,65 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Indicadores da lista de acompanhamento. As cotações de todos os símbolos são
+# alinhadas em uma única matriz (datas x símbolos) e cada indicador é uma
+# operação vetorizada sobre as colunas, sem laço por símbolo.
+
+WINDOW = 20
+TRADING_DAYS = 252
+INDICATOR_COLUMNS = ['last', 'mean', 'sma', 'ema', 'volatility', 'drawdown', 'max_drawdown', 'zscore']
+
+
+def price_matrix(histories, column='Close'):
+    """Matriz larga de preços a partir de {símbolo: DataFrame OHLCV}.
+
+    Calendários diferentes (cripto negocia todo dia, bolsa não) são alinhados
+    repetindo o último preço conhecido; antes da primeira cotação fica NaN.
+    """
+    series = {symbol: frame[column] for symbol, frame in histories.items() if not frame.empty}
+    if not series:
+        return pd.DataFrame(columns=list(histories), dtype='float64')
+    prices = pd.concat(series, axis=1).sort_index().ffill()
+    return prices.reindex(columns=list(histories))
+
+
+def compute(prices, window=WINDOW):
+    """Indicadores de cada coluna de `prices`, em um DataFrame indexado pelo símbolo.
+
+    last: último preço; mean: média do período; sma/ema: médias de `window`
+    pregões; volatility: desvio dos retornos logarítmicos dos últimos `window`
+    pregões, anualizado; drawdown/max_drawdown: queda atual e máxima a partir do
+    pico; zscore: distância do último preço à sma, em desvios padrão.
+    """
+    values = prices.to_numpy(dtype='float64')
+    if len(values) == 0:
+        return pd.DataFrame(index=prices.columns, columns=INDICATOR_COLUMNS, dtype='float64')
+    tail = values[-window:]
+
+    # Colunas sem cotação (ou com poucos pregões) resultam em NaN, sem aviso
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        last = values[-1]
+        mean = np.nanmean(values, axis=0)
+        sma = np.nanmean(tail, axis=0)
+        std = np.nanstd(tail, axis=0, ddof=1)
+        ema = prices.ewm(span=window, adjust=False).mean().to_numpy()[-1]
+        returns = np.diff(np.log(values[-(window + 1):]), axis=0)
+        volatility = np.nanstd(returns, axis=0, ddof=1) * np.sqrt(TRADING_DAYS)
+        peaks = np.fmax.accumulate(values, axis=0)
+        drawdowns = values / peaks - 1
+        drawdown = drawdowns[-1]
+        max_drawdown = np.nanmin(drawdowns, axis=0)
+        zscore = np.where(std > 0, (last - sma) / std, np.nan)
+
+    return pd.DataFrame({
+        'last': last, 'mean': mean, 'sma': sma, 'ema': ema, 'volatility': volatility,
+        'drawdown': drawdown, 'max_drawdown': max_drawdown, 'zscore': zscore,
+    }, index=prices.columns)
+
+
+def buy_signals(table):
+    """True onde o último preço está abaixo da média do período (critério da página de sugestões)."""
+    return table['last'] < table['mean']
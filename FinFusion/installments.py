@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+import storage
+
+# Parcelamentos. Cada despesa parcelada (Parcelado ou Cartão de Crédito com mais
+# de uma parcela) vira um plano em installment_plans, mantido por triggers em
+# financial_data. As parcelas de cada mês não são gravadas: são geradas sob
+# demanda, apenas para os meses da janela consultada. O valor do plano fica em
+# centavos (amount_cents, como em financial_data) e as somas são inteiras.
+
+INSTALLMENT_METHODS = ('Parcelado', 'Cartão de Crédito')
+
+# Mês como inteiro (ano * 12 + mês - 1), para comparar e somar meses no SQL
+_MONTH_INDEX = "(CAST(substr({row}.date, 1, 4) AS INTEGER) * 12 + CAST(substr({row}.date, 6, 2) AS INTEGER) - 1)"
+
+_ADD_PLAN = f'''
+    INSERT INTO installment_plans (id, username, payment_method, first_month, last_month, installments, amount_cents)
+    SELECT {{row}}.id, {{row}}.username, {{row}}.payment_method, {_MONTH_INDEX},
+           {_MONTH_INDEX} + {{row}}.installments - 1, {{row}}.installments, {{row}}.amount_cents
+    {{source}} WHERE {{row}}.type = 'Despesa' AND {{row}}.installments > 1
+      AND {{row}}.payment_method IN ({', '.join(repr(m) for m in INSTALLMENT_METHODS)});
+'''
+
+TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS trg_installment_plans_insert AFTER INSERT ON financial_data BEGIN "
+    f"{_ADD_PLAN.format(row='NEW', source='')} END",
+    "CREATE TRIGGER IF NOT EXISTS trg_installment_plans_delete AFTER DELETE ON financial_data BEGIN "
+    "DELETE FROM installment_plans WHERE id = OLD.id; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_installment_plans_update AFTER UPDATE ON financial_data BEGIN "
+    f"DELETE FROM installment_plans WHERE id = OLD.id; {_ADD_PLAN.format(row='NEW', source='')} END",
+]
+TRIGGER_NAMES = ('trg_installment_plans_insert', 'trg_installment_plans_delete', 'trg_installment_plans_update')
+
+
+def month_index(value):
+    """Converte data, 'YYYY-MM[-DD]' ou Period mensal no índice inteiro do mês (índices passam direto)."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if hasattr(value, 'year') and hasattr(value, 'month'):
+        return value.year * 12 + value.month - 1
+    text = str(value)
+    return int(text[:4]) * 12 + int(text[5:7]) - 1
+
+
+def month_label(index):
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def split_amount(cents, installments):
+    """Valor (em reais) de cada parcela de um total em centavos; o resto da divisão vai para a primeira."""
+    base, remainder = divmod(cents, installments)
+    return base / 100, (base + remainder) / 100
+
+
+def iter_schedule(first_month, installments, cents, start=None, end=None):
+    """Gera (mês, número da parcela, valor em reais) do plano, restrito aos meses [start, end]."""
+    base, first = split_amount(cents, installments)
+    lo = first_month if start is None else max(first_month, start)
+    hi = first_month + installments - 1 if end is None else min(first_month + installments - 1, end)
+    for month in range(lo, hi + 1):
+        number = month - first_month + 1
+        yield month, number, first if number == 1 else base
+
+
+def rebuild(username=None, conn=None):
+    """Recria installment_plans a partir de financial_data (de um usuário ou de todos)."""
+    if conn is None:
+        with storage.transaction() as conn:
+            return rebuild(username, conn)
+    where, params = (" AND financial_data.username = ?", (username,)) if username is not None else ("", ())
+    conn.execute("DELETE FROM installment_plans" + (" WHERE username = ?" if username is not None else ""), params)
+    cursor = conn.execute(_ADD_PLAN.format(row='financial_data', source='FROM financial_data').rstrip().rstrip(';')
+                          + where, params)
+    return cursor.rowcount
+
+
+def active_plans(username, start, end, payment_method=None):
+    """Planos do usuário com alguma parcela entre os meses `start` e `end` (índices)."""
+    sql = ("SELECT id, payment_method, first_month, last_month, installments, amount_cents FROM installment_plans "
+           "WHERE username = ? AND last_month >= ? AND first_month <= ?")
+    params = [username, start, end]
+    if payment_method is not None:
+        sql += " AND payment_method = ?"
+        params.append(payment_method)
+    with storage.connection() as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def iter_obligations(username, start, end, payment_method=None):
+    """Parcelas devidas entre `start` e `end`: (mês 'YYYY-MM', id da compra, parcela, total de parcelas, valor)."""
+    start, end = month_index(start), month_index(end)
+    for plan_id, _, first_month, _, installments, cents in active_plans(username, start, end, payment_method):
+        for month, number, value in iter_schedule(first_month, installments, cents, start, end):
+            yield month_label(month), plan_id, number, installments, value
+
+
+def schedule_totals(first_month, installments, cents, start, end):
+    """Soma, por mês de `start` a `end`, as parcelas de vários planos (arrays em centavos); devolve centavos.
+
+    Planos sem parcelas na janela são ignorados.
+    """
+    first_month = np.asarray(first_month, dtype=np.int64)
+    installments = np.asarray(installments, dtype=np.int64)
+    cents = np.asarray(cents, dtype=np.int64)
+    last_month = first_month + installments - 1
+    inside = (last_month >= start) & (first_month <= end)
+    first_month, last_month, installments, cents = (a[inside] for a in (first_month, last_month, installments, cents))
+    base = cents // installments
+    remainder = cents - base * installments
+
+    # Vetor de diferenças: cada plano soma `base` em [lo, hi] da janela
+    lo = np.maximum(first_month, start) - start
+    hi = np.minimum(last_month, end) - start
+    diff = np.zeros(end - start + 2, dtype=np.int64)
+    np.add.at(diff, lo, base)
+    np.add.at(diff, hi + 1, -base)
+    totals = np.cumsum(diff[:-1])
+    # Resto dos centavos na primeira parcela, quando ela cai dentro da janela
+    first_in_window = first_month >= start
+    np.add.at(totals, first_month[first_in_window] - start, remainder[first_in_window])
+    return totals
+
+
+def monthly_obligations(username, start, end, payment_method=None):
+    """Total de parcelas por mês entre `start` e `end`, somado de forma vetorizada (Series por Period)."""
+    start, end = month_index(start), month_index(end)
+    months = pd.period_range(month_label(start), month_label(end), freq='M')
+    plans = active_plans(username, start, end, payment_method)
+    if not plans:
+        return pd.Series(0.0, index=months)
+    _, _, first_month, _, installments, cents = zip(*plans)
+    return pd.Series(schedule_totals(first_month, installments, cents, start, end) / 100, index=months)
+
+
+def purchases_by_month(username, start, end, payment_method=None):
+    """Valor cheio das compras parceladas por mês da compra (Series por Period)."""
+    start, end = month_index(start), month_index(end)
+    sql = ("SELECT first_month, SUM(amount_cents) FROM installment_plans "
+           "WHERE username = ? AND first_month BETWEEN ? AND ?")
+    params = [username, start, end]
+    if payment_method is not None:
+        sql += " AND payment_method = ?"
+        params.append(payment_method)
+    with storage.connection() as conn:
+        rows = conn.execute(sql + " GROUP BY first_month", params).fetchall()
+    months = pd.period_range(month_label(start), month_label(end), freq='M')
+    series = pd.Series(0.0, index=months)
+    for month, total in rows:
+        series[pd.Period(month_label(month), freq='M')] = total / 100
+    return series
+
+
+def spread_adjustment(username, start, end):
+    """Quanto somar às despesas de cada mês para trocar o valor cheio das compras pelas parcelas."""
+    return monthly_obligations(username, start, end) - purchases_by_month(username, start, end)
+
+
+def outstanding(username, after):
+    """Soma das parcelas que vencem depois do mês `after`, ou seja, ainda não pagas."""
+    after = month_index(after)
+    _, last = schedule_bounds(username)
+    if last is None or last <= after:
+        return 0.0
+    return float(monthly_obligations(username, after + 1, last).sum())
+
+
+def schedule_bounds(username):
+    """(primeiro, último) mês com parcelas do usuário, em índices; (None, None) sem planos."""
+    with storage.connection() as conn:
+        return conn.execute("SELECT MIN(first_month), MAX(last_month) FROM installment_plans WHERE username = ?",
+                            (username,)).fetchone()
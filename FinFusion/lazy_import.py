@@ -0,0 +1,42 @@
+import importlib
+import threading
+
+# Importação adiada para os pontos de entrada do Streamlit. `pd = module('pandas')`
+# devolve um substituto que só importa o módulo de verdade no primeiro acesso a
+# um atributo (pd.DataFrame), então a tela de login não paga por bibliotecas que
+# só as outras páginas usam. O import em si passa pelo lock de importação do
+# Python, então sessões simultâneas não carregam o módulo duas vezes.
+
+
+class LazyModule:
+    """Substituto de um módulo, importado no primeiro acesso a um atributo."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+                module = self._module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __repr__(self):
+        state = 'carregado' if self._module is not None else 'não carregado'
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def module(name):
+    """Módulo `name` importado sob demanda."""
+    return LazyModule(name)
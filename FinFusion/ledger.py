@@ -0,0 +1,142 @@
+import itertools
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import storage
+
+# Lançamentos em colunas tipadas, no lugar de listas de tuplas de 8 campos.
+# Ids em int64, datas em datetime64[D], quantias em centavos (int64), parcelas em
+# int16 e os textos repetitivos (tipo, método, necessidade e a própria
+# descrição) como códigos de pd.Categorical. Com 1M de linhas ocupa algumas
+# dezenas de MB em vez de centenas.
+#
+# O SQLite já devolve a data como número de dias e a quantia em centavos
+# (amount_cents); o cursor é consumido em blocos de CHUNK_ROWS direto para
+# arrays (np.fromiter), sem montar a lista de tuplas, e cada bloco de texto
+# vira códigos antes do próximo, então o pico de memória também fica limitado
+# a um bloco.
+#
+# Uma data que o SQLite não reconhece (julianday NULL) vira NO_DAY na consulta e
+# a linha fica de fora do ledger; a migração 14 converte as que têm formato conhecido.
+
+CHUNK_ROWS = 65_536
+NO_DAY = np.iinfo(np.int32).min
+
+FIELDS = ('id', 'date', 'description', 'amount', 'type', 'payment_method', 'installments', 'necessity')
+# Nomes das colunas exibidas nas páginas
+LABELS = {
+    'id': 'id', 'date': 'Data', 'description': 'Descrição', 'amount': 'Quantia', 'type': 'Tipo',
+    'payment_method': 'Método de Pagamento', 'installments': 'Parcelas', 'necessity': 'Necessidade',
+}
+CATEGORICAL = ('description', 'type', 'payment_method', 'necessity')
+
+SELECT_LEDGER = (f"SELECT id, COALESCE(CAST(julianday(date) - 2440587.5 AS INTEGER), {NO_DAY}), amount_cents, "
+                 "COALESCE(installments, 0), description, type, payment_method, necessity FROM financial_data")
+
+_ROW = np.dtype([
+    ('id', 'i8'), ('day', 'i4'), ('cents', 'i8'), ('installments', 'i2'),
+    ('description', 'O'), ('type', 'O'), ('payment_method', 'O'), ('necessity', 'O'),
+])
+
+
+@dataclass(frozen=True)
+class Ledger:
+    """Lançamentos de um usuário (ou de uma página), um array por campo."""
+    id: np.ndarray
+    date: np.ndarray
+    cents: np.ndarray
+    installments: np.ndarray
+    description: pd.Categorical
+    type: pd.Categorical
+    payment_method: pd.Categorical
+    necessity: pd.Categorical
+
+    def __len__(self):
+        return len(self.id)
+
+    @property
+    def amount(self):
+        """Quantias em reais (float64)."""
+        return self.cents / 100
+
+    @property
+    def nbytes(self):
+        total = self.id.nbytes + self.date.nbytes + self.cents.nbytes + self.installments.nbytes
+        for name in CATEGORICAL:
+            column = getattr(self, name)
+            total += column.codes.nbytes + column.categories.memory_usage(deep=True)
+        return total
+
+    def take(self, indexer):
+        """Sub-ledger com as linhas de `indexer` (máscara booleana, posições ou fatia)."""
+        return Ledger(self.id[indexer], self.date[indexer], self.cents[indexer], self.installments[indexer],
+                      *(getattr(self, name)[indexer] for name in CATEGORICAL))
+
+    def to_frame(self, fields=FIELDS, labels=LABELS, dates_as_text=False):
+        """DataFrame com os campos pedidos (para exibir ou agrupar com pandas).
+
+        Com `dates_as_text`, a data sai no formato gravado (AAAA-MM-DD).
+        """
+        columns = {}
+        for field in fields:
+            if field == 'date':
+                value = np.datetime_as_string(self.date, unit='D') if dates_as_text else self.date
+            elif field == 'amount':
+                value = self.amount
+            elif field == 'installments':
+                value = pd.array(self.installments, dtype='Int16')
+                value[self.installments == 0] = pd.NA
+            else:
+                value = getattr(self, field)
+            columns[labels.get(field, field)] = value
+        return pd.DataFrame(columns)
+
+
+def _codes(values, vocabulary):
+    """Códigos globais (vocabulário crescente entre blocos) de um bloco de textos; None vira -1."""
+    local, uniques = pd.factorize(values)
+    mapping = np.array([vocabulary.setdefault(value, len(vocabulary)) for value in uniques] + [-1], dtype=np.int32)
+    return mapping[local]
+
+
+def from_cursor(cursor):
+    """Monta o Ledger a partir de um cursor sobre SELECT_LEDGER (mesma ordem de colunas)."""
+    numeric = {name: [] for name in ('id', 'day', 'cents', 'installments')}
+    codes = {name: [] for name in CATEGORICAL}
+    vocabularies = {name: {} for name in CATEGORICAL}
+    while True:
+        block = np.fromiter(itertools.islice(cursor, CHUNK_ROWS), dtype=_ROW)
+        for name, parts in numeric.items():
+            parts.append(block[name].copy())
+        for name in CATEGORICAL:
+            codes[name].append(_codes(block[name], vocabularies[name]))
+        if len(block) < CHUNK_ROWS:
+            break
+
+    def categorical(name):
+        return pd.Categorical.from_codes(np.concatenate(codes[name]), categories=list(vocabularies[name]))
+
+    days = np.concatenate(numeric['day'])
+    entries = Ledger(
+        np.concatenate(numeric['id']),
+        days.astype('datetime64[D]'),
+        np.concatenate(numeric['cents']),
+        np.concatenate(numeric['installments']),
+        *(categorical(name) for name in CATEGORICAL),
+    )
+    dated = days != NO_DAY
+    return entries if dated.all() else entries.take(dated)
+
+
+def load(username, conn=None):
+    """Ledger do usuário em ordem de data (e id)."""
+    if conn is None:
+        with storage.connection() as conn:
+            return load(username, conn)
+    return from_cursor(conn.execute(f"{SELECT_LEDGER} WHERE username = ? ORDER BY date, id", (username,)))
+
+
+def empty():
+    return from_cursor(iter(()))
@@ -0,0 +1,279 @@
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import fetch_scheduler
+import storage
+
+# Cache em disco das cotações (OHLCV diário). Cada símbolo guarda o intervalo
+# já baixado e o horário da última atualização; ao atualizar, só os pregões
+# posteriores ao último já salvo são buscados no provedor.
+#
+# Cada gravação anota, por símbolo, o primeiro pregão cujo fechamento entrou ou
+# mudou (o último pregão rebuscado pode ter sido gravado ainda em aberto); quem
+# materializa valores a partir dos fechamentos consome as anotações com take_changes.
+
+MARKET_DB_PATH = os.environ.get('FINFUSION_MARKET_DB', 'market_data.db')
+DEFAULT_TTL = timedelta(seconds=int(os.environ.get('FINFUSION_MARKET_TTL', 3600)))
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+# Dias úteis seguidos que ainda podem ser feriado na bolsa (o Carnaval fecha
+# segunda e terça); um intervalo com mais dias úteis que isso tem pregão.
+MAX_HOLIDAY_WEEKDAYS = 2
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _expects_bars(start, end):
+    """Se o intervalo [start, end) tem dias úteis demais para não ter nenhum pregão."""
+    return int(np.busday_count(_as_date(start), _as_date(end))) > MAX_HOLIDAY_WEEKDAYS
+
+
+def _clean(bars):
+    return bars.reindex(columns=BAR_COLUMNS).dropna(subset=['Close'])
+
+
+def yfinance_fetcher(symbol, start, end):
+    """Baixa os pregões [start, end) do Yahoo Finance.
+
+    O yfinance não levanta erro quando a requisição falha, só devolve um
+    DataFrame vazio; sem nenhum fechamento num intervalo que deveria ter pregão,
+    levanta fetch_scheduler.EmptyResponse para with_retry tentar de novo. Na
+    busca de pregões antigos, MarketDataStore.refresh trata o erro e segue
+    servindo o cache.
+    """
+    import yfinance as yf
+
+    data = yf.download(symbol, start=start, end=end, progress=False, auto_adjust=False)
+    if isinstance(data.columns, pd.MultiIndex):
+        # Versões recentes do yfinance retornam (campo, símbolo) mesmo para um único símbolo
+        data.columns = data.columns.get_level_values(0)
+    data = data.reindex(columns=BAR_COLUMNS)
+    if _clean(data).empty and _expects_bars(start, end):
+        raise fetch_scheduler.EmptyResponse(f"{symbol}: nenhum pregão entre {start} e {end}")
+    return data
+
+
+class MarketDataStore:
+    """Histórico de cotações persistido em SQLite com atualização incremental.
+
+    `fetcher(symbol, start, end)` deve devolver um DataFrame indexado por data
+    com as colunas de BAR_COLUMNS; por padrão é o Yahoo Finance, mas qualquer
+    provedor (inclusive um falso, local) pode ser usado.
+    """
+
+    def __init__(self, path=MARKET_DB_PATH, fetcher=yfinance_fetcher, ttl=DEFAULT_TTL, clock=datetime.now):
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.clock = clock
+        self.pool = storage.ConnectionPool(path)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._changes = {}
+        self._failed_backfills = {}  # símbolo -> (start, quando falhou); mexido só sob o lock do símbolo
+        with self.pool.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS market_bars (
+                    symbol TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    open REAL,
+                    high REAL,
+                    low REAL,
+                    close REAL,
+                    volume REAL,
+                    PRIMARY KEY (symbol, date)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS market_symbols (
+                    symbol TEXT PRIMARY KEY,
+                    first_date TEXT NOT NULL,
+                    last_date TEXT,
+                    fetched_at TEXT NOT NULL
+                )
+            ''')
+
+    def _symbol_lock(self, symbol):
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _coverage(self, symbol):
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT first_date, last_date, fetched_at FROM market_symbols WHERE symbol=?",
+                               (symbol,)).fetchone()
+        if row is None:
+            return None
+        first_date, last_date, fetched_at = row
+        return (date.fromisoformat(first_date), last_date and date.fromisoformat(last_date),
+                datetime.fromisoformat(fetched_at))
+
+    def _save(self, symbol, bars, first_date, fetched_at):
+        bars = _clean(bars)
+        rows = [(symbol, _as_date(index).isoformat(), *(None if pd.isna(v) else float(v) for v in values))
+                for index, *values in bars.itertuples()]
+        with self.pool.transaction() as conn:
+            if rows:
+                days = [row[1] for row in rows]
+                stored = dict(conn.execute("SELECT date, close FROM market_bars "
+                                           "WHERE symbol = ? AND date BETWEEN ? AND ?",
+                                           (symbol, min(days), max(days))).fetchall())
+                changed = [row[1] for row in rows if stored.get(row[1]) != row[5]]
+                if changed:
+                    self._note_change(symbol, date.fromisoformat(min(changed)))
+            conn.executemany("INSERT OR REPLACE INTO market_bars VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.execute('''
+                INSERT INTO market_symbols (symbol, first_date, last_date, fetched_at)
+                VALUES (?, ?, (SELECT MAX(date) FROM market_bars WHERE symbol = ?), ?)
+                ON CONFLICT(symbol) DO UPDATE SET
+                    first_date = MIN(first_date, excluded.first_date),
+                    last_date = excluded.last_date,
+                    fetched_at = excluded.fetched_at
+            ''', (symbol, first_date.isoformat(), symbol, fetched_at.isoformat()))
+
+    def _note_change(self, symbol, day):
+        with self._locks_guard:
+            previous = self._changes.get(symbol)
+            self._changes[symbol] = day if previous is None else min(previous, day)
+
+    def take_changes(self):
+        """{símbolo: primeiro pregão com fechamento novo ou alterado} desde a última chamada."""
+        with self._locks_guard:
+            changes, self._changes = self._changes, {}
+        return changes
+
+    def _earliest_bar(self, symbol):
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT MIN(date) FROM market_bars WHERE symbol = ?", (symbol,)).fetchone()
+        return row[0] and date.fromisoformat(row[0])
+
+    def _backfill_failed_recently(self, symbol, start, now):
+        failed = self._failed_backfills.get(symbol)
+        return failed is not None and failed[0] <= start and now - failed[1] < self.ttl
+
+    def is_fresh(self, symbol, start):
+        coverage = self._coverage(symbol)
+        if coverage is None:
+            return False
+        first_date, _, fetched_at = coverage
+        return first_date <= _as_date(start) and self.clock() - fetched_at < self.ttl
+
+    def refresh(self, symbol, start, force=False):
+        """Garante o histórico desde `start`, buscando apenas o que falta no cache."""
+        start = _as_date(start)
+        with self._symbol_lock(symbol):
+            if not force and self.is_fresh(symbol, start):
+                return
+            now = self.clock()
+            tomorrow = now.date() + timedelta(days=1)
+            coverage = self._coverage(symbol)
+            if coverage is None or coverage[1] is None:
+                self._save(symbol, self.fetcher(symbol, start, tomorrow), start, now)
+                return
+
+            first_date, last_date, fetched_at = coverage
+            earliest = self._earliest_bar(symbol)
+            if start < first_date and _expects_bars(first_date, earliest):
+                # Uma busca que já cobriu first_date veio sem pregões até o primeiro fechamento,
+                # num trecho que deveria ter algum: o ativo ainda não era negociado e antes
+                # disso também não há o que buscar
+                self._save(symbol, pd.DataFrame(columns=BAR_COLUMNS), start, fetched_at)
+            elif start < first_date and not self._backfill_failed_recently(symbol, start, now):
+                # Uma falha (inclusive o EmptyResponse de um intervalo sem nenhum pregão) não
+                # impede servir o que já está em cache: first_date não muda e o intervalo só é
+                # tentado de novo depois do TTL
+                try:
+                    bars = self.fetcher(symbol, start, first_date)
+                except fetch_scheduler.RETRYABLE_ERRORS:
+                    bars = None
+                if bars is not None and (not _clean(bars).empty or not _expects_bars(start, first_date)):
+                    self._save(symbol, bars, start, fetched_at)
+                    self._failed_backfills.pop(symbol, None)
+                else:
+                    self._failed_backfills[symbol] = (start, now)
+            if force or now - fetched_at >= self.ttl:
+                # O último pregão salvo é buscado de novo porque pode ter sido gravado ainda em aberto
+                self._save(symbol, self.fetcher(symbol, last_date, tomorrow), first_date, now)
+
+    def history(self, symbol, start, end=None):
+        """DataFrame OHLCV de `symbol` entre `start` e `end` (inclusive), servido do cache."""
+        self.refresh(symbol, start)
+        end = _as_date(end) if end is not None else self.clock().date()
+        with self.pool.connection() as conn:
+            rows = conn.execute("SELECT date, open, high, low, close, volume FROM market_bars "
+                                "WHERE symbol = ? AND date BETWEEN ? AND ? ORDER BY date",
+                                (symbol, _as_date(start).isoformat(), end.isoformat())).fetchall()
+        frame = pd.DataFrame(rows, columns=['Date', *BAR_COLUMNS])
+        frame['Date'] = pd.to_datetime(frame['Date'])
+        return frame.set_index('Date')
+
+    def closes(self, symbols, start, end=None):
+        """Fechamentos já em cache (sem consultar o provedor) em uma matriz datas x símbolos."""
+        symbols = list(dict.fromkeys(symbols))
+        end = _as_date(end) if end is not None else self.clock().date()
+        with self.pool.connection() as conn:
+            rows = conn.execute(f"SELECT date, symbol, close FROM market_bars "
+                                f"WHERE symbol IN ({', '.join('?' * len(symbols))}) AND date BETWEEN ? AND ?",
+                                (*symbols, _as_date(start).isoformat(), end.isoformat())).fetchall()
+        frame = pd.DataFrame(rows, columns=['Date', 'symbol', 'close'])
+        frame['Date'] = pd.to_datetime(frame['Date'])
+        return frame.pivot(index='Date', columns='symbol', values='close').reindex(columns=symbols).sort_index()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Cache de cotações compartilhado pelo processo."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MarketDataStore(fetcher=fetch_scheduler.with_retry(yfinance_fetcher, 'yahoo'))
+    return _store
+
+
+def set_store(store):
+    """Substitui o cache do processo (por exemplo, por um com provedor falso)."""
+    global _store
+    with _store_lock:
+        _store = store
+    return store
+
+
+def history(symbol, start, end=None):
+    return get_store().history(symbol, start, end)
+
+
+def closes(symbols, start, end=None):
+    return get_store().closes(symbols, start, end)
+
+
+def take_changes():
+    return get_store().take_changes()
+
+
+_scheduler = None
+
+
+def get_scheduler():
+    """Agendador de buscas concorrentes compartilhado pelas sessões."""
+    global _scheduler
+    if _scheduler is None:
+        with _store_lock:
+            if _scheduler is None:
+                _scheduler = fetch_scheduler.FetchScheduler(history)
+    return _scheduler
+
+
+def fetch_many(symbols, start, end=None):
+    """Histórico de vários símbolos buscados em paralelo: {símbolo: DataFrame}."""
+    return get_scheduler().fetch_many(symbols, start, end)
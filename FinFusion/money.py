@@ -0,0 +1,111 @@
+import math
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+# Valores monetários em centavos inteiros. financial_data grava amount_cents
+# (INTEGER) e expõe `amount` em reais como coluna gerada; somas e saldos são
+# feitos em centavos e só viram reais na exibição, sem o acúmulo de erro de
+# somar REAL linha a linha.
+#
+# A formatação pt-BR (R$1.234,56) tem uma versão escalar e uma vetorizada, que
+# formata a coluna inteira de uma vez com operações de string do numpy. numpy só
+# é importado pelas funções vetorizadas, então este módulo pode ser carregado
+# na tela de login.
+
+SYMBOL = 'R$'
+
+_HUNDRED = Decimal(100)
+
+
+def to_cents(value):
+    """Centavos (int) de um valor em reais: int, float, Decimal ou texto com ponto decimal.
+
+    Texto e Decimal são convertidos exatamente (meio centavo arredonda para longe
+    do zero); floats vão para o centavo mais próximo, como cents_array.
+    """
+    if not isinstance(value, (int, str, Decimal)):
+        value = float(value)
+        if not math.isfinite(value):
+            raise ValueError(f"valor inválido: {value!r}")
+        return int(math.copysign(math.floor(abs(value) * 100 + 0.5), value))
+    try:
+        cents = (Decimal(value) * _HUNDRED).to_integral_value(ROUND_HALF_UP)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"valor inválido: {value!r}") from None
+    if not cents.is_finite():
+        raise ValueError(f"valor inválido: {value!r}")
+    return int(cents)
+
+
+def to_reais(cents):
+    """Reais (float) de um total em centavos, para exibição e gráficos."""
+    return cents / 100
+
+
+def cents_array(amounts):
+    """Centavos (int64) de uma coluna de valores em reais; NaN não é aceito."""
+    import numpy as np
+    amounts = np.asarray(amounts, dtype=np.float64)
+    return (np.sign(amounts) * np.floor(np.abs(amounts) * 100 + 0.5)).astype(np.int64)
+
+
+def format_cents(cents, symbol=SYMBOL):
+    """Formata centavos como moeda brasileira: 123456 -> 'R$1.234,56'."""
+    units, fraction = divmod(abs(cents), 100)
+    sign = '-' if cents < 0 else ''
+    return f"{symbol}{sign}{units:_},{fraction:02d}".replace('_', '.')
+
+
+def format_currency(value, symbol=SYMBOL):
+    """Formata um valor em reais como moeda brasileira."""
+    if value != value:  # NaN
+        return ''
+    return format_cents(to_cents(value), symbol)
+
+
+_tables = None
+
+
+def _lookup_tables():
+    # Textos de cada grupo de milhar ("7", ".007") e dos centavos (",07"), indexados pelo valor
+    global _tables
+    if _tables is None:
+        import numpy as np
+        _tables = (np.array([str(i) for i in range(1000)]), np.array([f'.{i:03d}' for i in range(1000)]),
+                   np.array([f',{i:02d}' for i in range(100)]))
+    return _tables
+
+
+def format_cents_column(cents, symbol=SYMBOL):
+    """Versão vetorizada de format_cents: array de textos montado grupo a grupo.
+
+    Cada grupo de milhar vem de uma tabela (sem converter número em texto por
+    linha), então o custo é algumas concatenações de array por grupo.
+    """
+    import numpy as np
+    plain, dotted, fractions = _lookup_tables()
+    cents = np.asarray(cents, dtype=np.int64)
+    units, fraction = np.divmod(np.abs(cents), 100)
+
+    text = np.where(cents < 0, f'{symbol}-', symbol)
+    top = int(units.max()) if len(units) else 0
+    level = 1
+    while level * 1000 <= top:
+        level *= 1000
+    while level >= 1:
+        group = (units // level) % 1000
+        # Grupo mais alto sem zeros à esquerda; os seguintes com ponto e três dígitos
+        piece = np.where(units >= level * 1000, dotted[group], plain[group])
+        if level > 1:
+            piece = np.where(units >= level, piece, '')
+        text = np.char.add(text, piece)
+        level //= 1000
+    return np.char.add(text, fractions[fraction])
+
+
+def format_column(amounts, symbol=SYMBOL):
+    """Formata uma coluna de valores em reais (NaN vira texto vazio)."""
+    import numpy as np
+    amounts = np.asarray(amounts, dtype=np.float64)
+    missing = np.isnan(amounts)
+    text = format_cents_column(cents_array(np.where(missing, 0, amounts)), symbol)
+    return np.where(missing, '', text) if missing.any() else text
@@ -0,0 +1,229 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import storage
+
+# Senhas com scrypt (sal aleatório por usuário, custo configurável). Hashes
+# antigos (SHA-256 sem sal) e hashes com parâmetros desatualizados continuam
+# aceitos e são regravados no formato atual no primeiro login bem-sucedido.
+#
+# Como cada verificação custa CPU e memória de propósito, o cálculo roda em um
+# pool pequeno de threads (fora da thread de script do Streamlit) e os logins
+# passam por um limite de tentativas por usuário e por IP.
+
+SCRYPT_N = int(os.environ.get('FINFUSION_SCRYPT_N', 2 ** 14))
+SCRYPT_R = int(os.environ.get('FINFUSION_SCRYPT_R', 8))
+SCRYPT_P = int(os.environ.get('FINFUSION_SCRYPT_P', 1))
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# Threads dedicadas ao KDF: no máximo metade dos núcleos
+KDF_WORKERS = int(os.environ.get('FINFUSION_KDF_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+
+# Tentativas que falharam dentro da janela antes de bloquear novos logins
+FAILURE_WINDOW = 15 * 60
+MAX_USER_FAILURES = 5
+MAX_IP_FAILURES = 20
+# Verificações simultâneas aceitas de um mesmo IP
+MAX_IP_IN_FLIGHT = 2
+
+# Logins recentes bem-sucedidos, para não repetir o KDF a cada rerun da mesma sessão
+VERIFIED_TTL = 5 * 60
+VERIFIED_MAX_ENTRIES = 1024
+
+UPDATE_PASSWORD = "UPDATE users SET password=? WHERE username=? AND password=?"
+
+
+class LoginThrottled(Exception):
+    """Muitas tentativas recentes; `retry_after` em segundos."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Muitas tentativas de login. Tente novamente em {int(retry_after) + 1} s.")
+        self.retry_after = retry_after
+
+
+def _b64(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024,
+                          dklen=KEY_BYTES)
+
+
+def hash_password(password):
+    """Hash no formato scrypt$n$r$p$sal$chave (base64)."""
+    salt = secrets.token_bytes(SALT_BYTES)
+    key = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(key)}"
+
+
+def _is_legacy(stored):
+    return len(stored) == 64 and all(c in '0123456789abcdef' for c in stored)
+
+
+def check_password(password, stored):
+    """Confere a senha; devolve (confere, precisa_regravar)."""
+    if not stored:
+        return False, False
+    if _is_legacy(stored):
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored), True
+    try:
+        scheme, n, r, p, salt, key = stored.split('$')
+        n, r, p = int(n), int(r), int(p)
+        salt, key = base64.b64decode(salt), base64.b64decode(key)
+    except ValueError:
+        return False, False
+    if scheme != 'scrypt':
+        return False, False
+    ok = hmac.compare_digest(_scrypt(password, salt, n, r, p), key)
+    return ok, (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+# Hash descartável usado quando o usuário não existe, para a resposta levar o mesmo tempo
+_DUMMY_HASH = None
+
+
+def _dummy_hash():
+    global _DUMMY_HASH
+    if _DUMMY_HASH is None:
+        _DUMMY_HASH = hash_password(secrets.token_hex(8))
+    return _DUMMY_HASH
+
+
+class LoginGuard:
+    """Pool do KDF com limite de tentativas por usuário e por IP e cache de verificações."""
+
+    def __init__(self, workers=KDF_WORKERS, clock=time.monotonic):
+        self.clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='finfusion-kdf')
+        self._lock = threading.Lock()
+        self._failures = {}
+        self._in_flight = {}
+        self._verified = OrderedDict()
+        self._pepper = secrets.token_bytes(16)
+
+    # Tentativas que falharam, em janelas deslizantes por chave ('user', nome) ou ('ip', endereço)
+
+    def _recent(self, key, now):
+        failures = self._failures.get(key)
+        if failures is None:
+            return 0, 0.0
+        while failures and now - failures[0] >= FAILURE_WINDOW:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return 0, 0.0
+        return len(failures), FAILURE_WINDOW - (now - failures[0])
+
+    def _check(self, username, ip, now):
+        for key, limit in ((('user', username), MAX_USER_FAILURES), (('ip', ip), MAX_IP_FAILURES)):
+            if key[1] is None:
+                continue
+            count, retry_after = self._recent(key, now)
+            if count >= limit:
+                raise LoginThrottled(retry_after)
+        if ip is not None and self._in_flight.get(ip, 0) >= MAX_IP_IN_FLIGHT:
+            raise LoginThrottled(1.0)
+
+    def _record_failure(self, username, ip, now):
+        for key in (('user', username), ('ip', ip)):
+            if key[1] is not None:
+                self._failures.setdefault(key, deque()).append(now)
+
+    def _verified_key(self, username, password, stored):
+        return username, stored, hmac.new(self._pepper, password.encode(), 'sha256').digest()
+
+    def _run(self, fn, *args):
+        """Executa fn no pool do KDF e espera o resultado."""
+        return self._executor.submit(fn, *args).result()
+
+    def authenticate(self, username, password, ip=None):
+        """True se a senha confere; regrava hashes antigos. Levanta LoginThrottled se bloqueado."""
+        with self._lock:
+            self._check(username, ip, self.clock())
+            if ip is not None:
+                self._in_flight[ip] = self._in_flight.get(ip, 0) + 1
+        try:
+            return self._authenticate(username, password, ip)
+        finally:
+            if ip is not None:
+                with self._lock:
+                    self._in_flight[ip] -= 1
+                    if not self._in_flight[ip]:
+                        del self._in_flight[ip]
+
+    def _authenticate(self, username, password, ip):
+        now = self.clock()
+        with storage.connection() as conn:
+            row = conn.execute(storage.SELECT_PASSWORD, (username,)).fetchone()
+        stored = row[0] if row else None
+
+        if stored is not None:
+            cache_key = self._verified_key(username, password, stored)
+            with self._lock:
+                verified_at = self._verified.get(cache_key)
+                if verified_at is not None and now - verified_at < VERIFIED_TTL:
+                    self._verified.move_to_end(cache_key)
+                    return True
+
+        ok, needs_rehash = self._run(check_password, password, stored or _dummy_hash())
+        ok = ok and stored is not None
+        now = self.clock()
+        with self._lock:
+            if not ok:
+                self._record_failure(username, ip, now)
+                return False
+            self._failures.pop(('user', username), None)
+
+        if needs_rehash:
+            new_hash = self._run(hash_password, password)
+            with storage.transaction() as conn:
+                # Só regrava se ninguém trocou a senha nesse meio tempo
+                conn.execute(UPDATE_PASSWORD, (new_hash, username, stored))
+            stored = new_hash
+        with self._lock:
+            self._verified[self._verified_key(username, password, stored)] = now
+            while len(self._verified) > VERIFIED_MAX_ENTRIES:
+                self._verified.popitem(last=False)
+        return True
+
+    def hash(self, password):
+        """hash_password no pool do KDF."""
+        return self._run(hash_password, password)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_guard = None
+_guard_lock = threading.Lock()
+
+
+def get_guard():
+    """LoginGuard compartilhado pelas sessões do processo."""
+    global _guard
+    if _guard is None:
+        with _guard_lock:
+            if _guard is None:
+                _guard = LoginGuard()
+    return _guard
+
+
+def authenticate(username, password, ip=None):
+    return get_guard().authenticate(username, password, ip)
+
+
+def register(username, password):
+    """Cria o usuário com a senha já no formato atual."""
+    password_hash = get_guard().hash(password)
+    with storage.transaction() as conn:
+        conn.execute(storage.INSERT_USER, (username, password_hash))
@@ -0,0 +1,251 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import market_data
+import storage
+
+# Carteira de investimentos. As operações ficam em trades (quantidade positiva
+# para compra, negativa para venda) e o valor diário de cada carteira, marcado a
+# mercado com os fechamentos do cache de cotações, é materializado em
+# portfolio_values. Cada atualização calcula só os dias posteriores ao último
+# já gravado; uma operação retroativa descarta (trigger) os dias a partir dela, e
+# um fechamento novo ou corrigido no cache de cotações (market_data.take_changes)
+# descarta os dias a partir dele nas carteiras com o símbolo.
+#
+# O cálculo é vetorizado para todas as carteiras de uma vez: as posições
+# (usuário, símbolo) formam as linhas de uma matriz e os pregões as colunas,
+# processados em blocos de BLOCK_DAYS para limitar a memória.
+
+BLOCK_DAYS = 32
+# Quantos dias antes do primeiro pregão calculado buscar o último fechamento conhecido
+PRICE_LOOKBACK = timedelta(days=31)
+
+TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS trg_portfolio_values_insert AFTER INSERT ON trades BEGIN "
+    "DELETE FROM portfolio_values WHERE username = NEW.username AND date >= NEW.date; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_portfolio_values_delete AFTER DELETE ON trades BEGIN "
+    "DELETE FROM portfolio_values WHERE username = OLD.username AND date >= OLD.date; END",
+    "CREATE TRIGGER IF NOT EXISTS trg_portfolio_values_update AFTER UPDATE ON trades BEGIN "
+    "DELETE FROM portfolio_values WHERE username = OLD.username AND date >= OLD.date; "
+    "DELETE FROM portfolio_values WHERE username = NEW.username AND date >= NEW.date; END",
+]
+
+INSERT_TRADE = "INSERT INTO trades (username, symbol, date, quantity, price, fees) VALUES (?, ?, ?, ?, ?, ?)"
+DELETE_TRADE = "DELETE FROM trades WHERE username = ? AND id = ?"
+INSERT_VALUE = "INSERT OR REPLACE INTO portfolio_values (username, date, value, invested, pnl) VALUES (?, ?, ?, ?, ?)"
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def add_trade(username, symbol, day, quantity, price, fees=0.0):
+    """Registra uma compra (quantidade positiva) ou venda (negativa)."""
+    if quantity == 0:
+        raise ValueError("A quantidade não pode ser zero.")
+    with storage.transaction() as conn:
+        return conn.execute(INSERT_TRADE, (username, symbol.strip().upper(), _as_date(day).isoformat(),
+                                           quantity, price, fees)).lastrowid
+
+
+def remove_trade(username, trade_id):
+    with storage.transaction() as conn:
+        conn.execute(DELETE_TRADE, (username, trade_id))
+
+
+def trades_frame(username=None, conn=None):
+    """Operações (de um usuário ou de todos) ordenadas por usuário, símbolo e data.
+
+    `cash` é o dinheiro aplicado na operação: quantidade x preço mais taxas
+    (negativo nas vendas, que devolvem dinheiro).
+    """
+    if conn is None:
+        with storage.connection() as conn:
+            return trades_frame(username, conn)
+    where, params = ("WHERE username = ?", (username,)) if username is not None else ("", ())
+    rows = conn.execute(f"SELECT id, username, symbol, date, quantity, price, fees FROM trades {where} "
+                        "ORDER BY username, symbol, date, id", params).fetchall()
+    frame = pd.DataFrame(rows, columns=['id', 'username', 'symbol', 'date', 'quantity', 'price', 'fees'])
+    frame['date'] = pd.to_datetime(frame['date'])
+    frame['cash'] = frame['quantity'] * frame['price'] + frame['fees']
+    return frame
+
+
+def _valuate(trades, closes, dates):
+    """Gera, por bloco de pregões, DataFrames (username, date, value, invested) de todas as carteiras.
+
+    `trades` deve estar ordenado por usuário e símbolo; `closes` é a matriz de
+    fechamentos (datas x símbolos) incluindo pregões anteriores a `dates[0]`.
+    """
+    keys = trades.groupby(['username', 'symbol'], sort=True)
+    key_codes = keys.ngroup().to_numpy()
+    key_index = keys.size().index
+    key_users = key_index.get_level_values('username')
+    # Posições do mesmo usuário são contíguas: a soma por usuário é um reduceat
+    users, user_starts = np.unique(key_users.to_numpy(), return_index=True)
+    order = np.argsort(user_starts)
+    users, user_starts = users[order], user_starts[order]
+    n_keys = len(key_index)
+
+    prices = closes.reindex(closes.index.union(dates)).ffill().reindex(dates)
+    symbol_columns = prices.columns.get_indexer(key_index.get_level_values('symbol'))
+    prices = prices.to_numpy(dtype='float64')
+
+    trade_dates = trades['date'].to_numpy()
+    quantity = trades['quantity'].to_numpy(dtype='float64')
+    cash = trades['cash'].to_numpy(dtype='float64')
+    date_values = dates.to_numpy()
+
+    # Posição e valor aplicado acumulados antes do primeiro pregão
+    before = trade_dates < date_values[0]
+    holdings = np.bincount(key_codes[before], weights=quantity[before], minlength=n_keys)
+    invested = np.bincount(key_codes[before], weights=cash[before], minlength=n_keys)
+    # Operação entre pregões entra no pregão seguinte
+    bucket = np.searchsorted(date_values, trade_dates, side='left')
+
+    for offset in range(0, len(date_values), BLOCK_DAYS):
+        width = min(BLOCK_DAYS, len(date_values) - offset)
+        inside = ~before & (bucket >= offset) & (bucket < offset + width)
+        quantity_delta = np.zeros((n_keys, width))
+        cash_delta = np.zeros((n_keys, width))
+        np.add.at(quantity_delta, (key_codes[inside], bucket[inside] - offset), quantity[inside])
+        np.add.at(cash_delta, (key_codes[inside], bucket[inside] - offset), cash[inside])
+        block_holdings = holdings[:, None] + np.cumsum(quantity_delta, axis=1)
+        block_invested = invested[:, None] + np.cumsum(cash_delta, axis=1)
+        holdings, invested = block_holdings[:, -1], block_invested[:, -1]
+
+        block_prices = prices[offset:offset + width][:, symbol_columns].T
+        # Sem cotação conhecida a posição não entra no valor (fica só no valor aplicado)
+        values = np.nan_to_num(block_holdings * block_prices)
+        user_values = np.add.reduceat(values, user_starts, axis=0)
+        user_invested = np.add.reduceat(block_invested, user_starts, axis=0)
+
+        block_dates = dates[offset:offset + width]
+        yield pd.DataFrame({
+            'username': np.repeat(users, width),
+            'date': np.tile(block_dates.to_numpy(), len(users)),
+            'value': user_values.ravel(),
+            'invested': user_invested.ravel(),
+        })
+
+
+def _discard_repriced(changes):
+    """Apaga os valores gravados a partir do primeiro fechamento alterado de cada símbolo da carteira."""
+    with storage.transaction() as conn:
+        held = conn.execute(f"SELECT DISTINCT username, symbol FROM trades "
+                            f"WHERE symbol IN ({', '.join('?' * len(changes))})", list(changes)).fetchall()
+        since = {}
+        for user, symbol in held:
+            since[user] = min(since.get(user, changes[symbol]), changes[symbol])
+        conn.executemany("DELETE FROM portfolio_values WHERE username = ? AND date >= ?",
+                         [(user, day.isoformat()) for user, day in since.items()])
+
+
+def update_values(username=None, until=None):
+    """Calcula e grava os dias que faltam em portfolio_values (de um usuário ou de todos).
+
+    Devolve o número de linhas gravadas; em dia normal, uma por carteira.
+    """
+    until = _as_date(until) if until is not None else date.today()
+    changes = market_data.take_changes()
+    if changes:
+        _discard_repriced(changes)
+    with storage.connection() as conn:
+        trades = trades_frame(username, conn)
+        where, params = ("WHERE username = ?", (username,)) if username is not None else ("", ())
+        last = dict(conn.execute(f"SELECT username, MAX(date) FROM portfolio_values {where} GROUP BY username",
+                                 params).fetchall())
+    if trades.empty:
+        return 0
+
+    # Primeiro dia a calcular de cada carteira: o seguinte ao último gravado, ou o da primeira operação
+    starts = trades.groupby('username')['date'].min()
+    stored = pd.to_datetime(pd.Series(last, dtype='object')).reindex(starts.index)
+    starts = starts.where(stored.isna(), stored + pd.Timedelta(days=1))
+    starts = starts[starts <= pd.Timestamp(until)]
+    if starts.empty:
+        return 0
+    trades = trades[trades['username'].isin(starts.index)]
+
+    first_day = starts.min()
+    closes = market_data.closes(trades['symbol'].unique(), (first_day - PRICE_LOOKBACK).date(), until)
+    dates = closes.index[closes.index >= first_day]
+    if dates.empty:
+        return 0
+
+    written = 0
+    for block in _valuate(trades, closes, dates):
+        block = block[block['date'].to_numpy() >= starts.reindex(block['username']).to_numpy()]
+        if block.empty:
+            continue
+        rows = zip(block['username'], block['date'].dt.strftime('%Y-%m-%d'), block['value'], block['invested'],
+                   block['value'] - block['invested'])
+        with storage.transaction() as conn:
+            conn.executemany(INSERT_VALUE, rows)
+        written += len(block)
+    return written
+
+
+def portfolio_series(username, start=None, end=None):
+    """Valor, valor aplicado e P&L diários da carteira (DataFrame indexado por data)."""
+    update_values(username)
+    conditions, params = ["username = ?"], [username]
+    if start is not None:
+        conditions.append("date >= ?")
+        params.append(_as_date(start).isoformat())
+    if end is not None:
+        conditions.append("date <= ?")
+        params.append(_as_date(end).isoformat())
+    with storage.connection() as conn:
+        rows = conn.execute(f"SELECT date, value, invested, pnl FROM portfolio_values "
+                            f"WHERE {' AND '.join(conditions)} ORDER BY date", params).fetchall()
+    frame = pd.DataFrame(rows, columns=['date', 'value', 'invested', 'pnl'])
+    frame['date'] = pd.to_datetime(frame['date'])
+    return frame.set_index('date')
+
+
+def _position_values(username, start=None, end=None):
+    """Valor de cada posição por pregão (datas x símbolos) da carteira do usuário."""
+    trades = trades_frame(username)
+    if trades.empty:
+        return pd.DataFrame()
+    end = _as_date(end) if end is not None else date.today()
+    first_day = trades['date'].min() if start is None else pd.Timestamp(_as_date(start))
+    closes = market_data.closes(trades['symbol'].unique(), (first_day - PRICE_LOOKBACK).date(), end)
+    dates = closes.index[closes.index >= first_day]
+    quantities = trades.pivot_table(index='date', columns='symbol', values='quantity', aggfunc='sum')
+    holdings = quantities.reindex(quantities.index.union(dates)).fillna(0).cumsum().reindex(dates)
+    prices = closes.reindex(closes.index.union(dates)).ffill().reindex(dates)[holdings.columns]
+    return holdings * prices
+
+
+def allocation_series(username, start=None, end=None):
+    """Peso de cada ativo no valor da carteira, por pregão."""
+    values = _position_values(username, start, end)
+    if values.empty:
+        return values
+    totals = values.sum(axis=1)
+    return values.div(totals.where(totals != 0), axis=0)
+
+
+def holdings(username, day=None):
+    """Posição atual (ou em `day`): quantidade, valor aplicado, preço, valor, P&L e peso por ativo."""
+    trades = trades_frame(username)
+    if day is not None:
+        trades = trades[trades['date'] <= pd.Timestamp(_as_date(day))]
+    positions = trades.groupby('symbol').agg(quantity=('quantity', 'sum'), invested=('cash', 'sum'))
+    if positions.empty:
+        return positions
+    day = _as_date(day) if day is not None else date.today()
+    closes = market_data.closes(positions.index, day - PRICE_LOOKBACK, day)
+    positions['price'] = closes.ffill().iloc[-1].reindex(positions.index) if not closes.empty else np.nan
+    positions['value'] = positions['quantity'] * positions['price']
+    positions['pnl'] = positions['value'] - positions['invested']
+    positions['weight'] = positions['value'] / positions['value'].sum()
+    return positions
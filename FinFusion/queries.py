@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+
+import search
+import storage
+
+# Consultas por faixa sobre financial_data. Cada filtro vira uma condição
+# que os índices (username, date) e (username, type, payment_method) cobrem,
+# então as páginas buscam apenas as linhas que vão exibir. A escolha do índice
+# fica com o planejador do SQLite, guiado pelas estatísticas do ANALYZE das
+# migrações (benchmarks/bench_financial_queries.py confere os planos).
+
+COLUMNS = "id, date, description, amount, type, payment_method, installments, necessity"
+
+def _as_iso(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def filter_conditions(username, start=None, end=None, type=None, payment_method=None, necessity=None, text=None):
+    """Condições (WHERE) e parâmetros dos filtros informados.
+
+    `text` busca nas descrições pelo índice FTS5 (ver search.match_expression).
+    """
+    conditions = ["username = ?"]
+    params = [username]
+    expression = search.match_expression(username, text) if text else None
+    if expression is not None:
+        conditions.append(search.MATCH_CONDITION)
+        params.append(expression)
+    if type is not None:
+        conditions.append("type = ?")
+        params.append(type)
+    if payment_method is not None:
+        conditions.append("payment_method = ?")
+        params.append(payment_method)
+    if start is not None:
+        conditions.append("date >= ?")
+        params.append(_as_iso(start))
+    if end is not None:
+        conditions.append("date <= ?")
+        params.append(_as_iso(end))
+    if necessity is not None:
+        conditions.append("necessity = ?")
+        params.append(necessity)
+    return conditions, params
+
+def build_query(username, start=None, end=None, type=None, payment_method=None, necessity=None, columns=COLUMNS):
+    """Monta o SQL e os parâmetros para os filtros informados."""
+    conditions, params = filter_conditions(username, start, end, type, payment_method, necessity)
+    sql = (f"SELECT {columns} FROM financial_data "
+           f"WHERE {' AND '.join(conditions)} ORDER BY date, id")
+    return sql, params
+
+def query_financial_data(username, start=None, end=None, type=None, payment_method=None, necessity=None):
+    """Retorna as transações do usuário que atendem aos filtros."""
+    sql, params = build_query(username, start, end, type, payment_method, necessity)
+    with storage.connection() as conn:
+        return conn.execute(sql, params).fetchall()
+
+def get_financial_data_between(username, start, end):
+    """Transações do usuário na janela de datas [start, end]."""
+    return query_financial_data(username, start=start, end=end)
+
+def get_financial_data_by_type(username, type, payment_method=None):
+    """Transações de um tipo (Receita/Despesa), opcionalmente de um método de pagamento."""
+    return query_financial_data(username, type=type, payment_method=payment_method)
+
+def get_financial_data_by_necessity(username, necessity, type='Despesa'):
+    """Transações de um tipo filtradas pela necessidade (Essencial/Não essencial)."""
+    return query_financial_data(username, type=type, necessity=necessity)
+
+# Paginação por chave (keyset): cada página continua a partir do par
+# (coluna de ordenação, id) da última linha da anterior, então buscar a página
+# 500 custa o mesmo que a primeira, sem OFFSET, e exclusões feitas entre uma
+# página e outra não fazem linhas pularem nem repetirem.
+
+# Ordenações do navegador -> coluna (a quantia ordena pelos centavos, que têm índice)
+SORT_COLUMNS = {'date': 'date', 'amount': 'amount_cents'}
+
+@dataclass(frozen=True)
+class Page:
+    # ledger.Ledger com as linhas da página
+    ledger: object
+    # Chave da última linha, para pedir a página seguinte; None quando não há mais linhas
+    next_key: tuple
+
+def fetch_page(username, filters=None, sort='date', descending=True, after=None, size=50):
+    """Uma página de transações do usuário, filtradas e ordenadas no SQLite.
+
+    `after` é a `next_key` da página anterior (None para a primeira).
+    """
+    import ledger  # puxa numpy/pandas; queries fica leve para a tela de login
+
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Ordenação inválida: {sort}")
+    sort = SORT_COLUMNS[sort]
+    conditions, params = filter_conditions(username, **(filters or {}))
+    if after is not None:
+        conditions.append(f"({sort}, id) {'<' if descending else '>'} (?, ?)")
+        params.extend(after)
+    direction = 'DESC' if descending else 'ASC'
+    sql = (f"{ledger.SELECT_LEDGER} WHERE {' AND '.join(conditions)} "
+           f"ORDER BY {sort} {direction}, id {direction} LIMIT ?")
+    with storage.connection() as conn:
+        entries = ledger.from_cursor(conn.execute(sql, params + [size + 1]))
+        next_key = None
+        if len(entries) > size:
+            entries = entries.take(slice(0, size))
+            # A chave usa o valor gravado (texto da data, centavos), não o convertido pelo ledger
+            last = int(entries.id[-1])
+            next_key = (conn.execute(f"SELECT {sort} FROM financial_data WHERE id = ?", (last,)).fetchone()[0], last)
+    return Page(entries, next_key)
+
+def count_matching(username, filters=None):
+    """Quantas transações do usuário atendem aos filtros."""
+    conditions, params = filter_conditions(username, **(filters or {}))
+    with storage.connection() as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM financial_data WHERE {' AND '.join(conditions)}",
+                            params).fetchone()[0]
+
+def delete_matching(username, filters=None):
+    """Remove, numa única transação, as transações do usuário que atendem aos filtros."""
+    conditions, params = filter_conditions(username, **(filters or {}))
+    with storage.transaction() as conn:
+        return conn.execute(f"DELETE FROM financial_data WHERE {' AND '.join(conditions)}", params).rowcount
+
+def delete_ids(username, ids):
+    """Remove as transações escolhidas, restritas às do próprio usuário."""
+    with storage.transaction() as conn:
+        return conn.executemany("DELETE FROM financial_data WHERE username = ? AND id = ?",
+                                [(username, id) for id in ids]).rowcount
@@ -0,0 +1,104 @@
+import importer
+import money
+import queries
+import storage
+
+# Camada de acesso a dados das páginas antigas (hash.py, charts.py e app.py da
+# raiz). Cada operação pega uma conexão do pool de storage só pelo tempo da
+# consulta e as escritas rodam em transações explícitas, então sessões em
+# threads diferentes nunca compartilham cursor nem conexão.
+
+EXISTS_USER = "SELECT 1 FROM users WHERE username=?"
+UPDATE_PASSWORD = "UPDATE users SET password=? WHERE username=?"
+INSERT_RECOVERY_TOKEN = "INSERT INTO password_recovery (username, token) VALUES (?, ?)"
+SELECT_RECOVERY_USER = "SELECT username FROM password_recovery WHERE token=?"
+DELETE_RECOVERY_TOKEN = "DELETE FROM password_recovery WHERE token=?"
+
+
+class Repository:
+    """Base dos repositórios: usa o pool informado ou o pool atual do processo."""
+
+    def __init__(self, pool=None):
+        self._pool = pool
+
+    @property
+    def pool(self):
+        # Resolvido a cada uso para acompanhar storage.configure()
+        return self._pool if self._pool is not None else storage.get_pool()
+
+    def connection(self):
+        return self.pool.connection()
+
+    def transaction(self):
+        return self.pool.transaction()
+
+
+class UserRepository(Repository):
+
+    def exists(self, username):
+        with self.connection() as conn:
+            return conn.execute(EXISTS_USER, (username,)).fetchone() is not None
+
+    def password(self, username):
+        """Hash gravado do usuário, ou None se ele não existe."""
+        with self.connection() as conn:
+            row = conn.execute(storage.SELECT_PASSWORD, (username,)).fetchone()
+        return row[0] if row else None
+
+    def add(self, username, password_hash):
+        with self.transaction() as conn:
+            conn.execute(storage.INSERT_USER, (username, password_hash))
+
+    def set_password(self, username, password_hash):
+        with self.transaction() as conn:
+            return conn.execute(UPDATE_PASSWORD, (password_hash, username)).rowcount > 0
+
+
+class FinancialDataRepository(Repository):
+
+    def list(self, username, type=None, payment_method=None, start=None, end=None, columns=queries.COLUMNS):
+        """Transações do usuário, em ordem de data, com os filtros informados."""
+        sql, params = queries.build_query(username, start=start, end=end, type=type,
+                                          payment_method=payment_method, columns=columns)
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def add(self, username, date, description, amount, type, payment_method=None, installments=None,
+            necessity=None, card_id=None):
+        """Grava uma transação (`amount` em reais) e devolve o id."""
+        date = importer.parse_date(date)
+        amount = money.to_cents(amount)
+        with self.transaction() as conn:
+            if card_id is None:
+                cursor = conn.execute(storage.INSERT_FINANCIAL_DATA, (username, date, description, amount, type,
+                                                                      payment_method, installments, necessity))
+            else:
+                cursor = conn.execute(storage.INSERT_FINANCIAL_DATA_WITH_CARD,
+                                      (username, date, description, amount, type, payment_method, installments,
+                                       necessity, card_id))
+            return cursor.lastrowid
+
+    def remove(self, ids):
+        with self.transaction() as conn:
+            conn.executemany(storage.DELETE_FINANCIAL_DATA, [(id,) for id in ids])
+
+
+class PasswordRecoveryRepository(Repository):
+
+    def add(self, username, token):
+        with self.transaction() as conn:
+            conn.execute(INSERT_RECOVERY_TOKEN, (username, token))
+
+    def consume(self, token):
+        """Usuário dono do token, invalidando o token; None se ele não existe."""
+        with self.transaction() as conn:
+            row = conn.execute(SELECT_RECOVERY_USER, (token,)).fetchone()
+            if row is None:
+                return None
+            conn.execute(DELETE_RECOVERY_TOKEN, (token,))
+            return row[0]
+
+
+users = UserRepository()
+financial_data = FinancialDataRepository()
+password_recovery = PasswordRecoveryRepository()
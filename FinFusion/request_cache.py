@@ -0,0 +1,44 @@
+import threading
+
+# Memoização com escopo de um rerun do Streamlit. Cada rerun roda em uma única
+# thread de script, então o armazenamento é por thread e é zerado em
+# begin_request() no início do script.
+
+_local = threading.local()
+_MISSING = object()
+
+
+def _store():
+    store = getattr(_local, 'store', None)
+    if store is None:
+        store = _local.store = {}
+    return store
+
+
+def begin_request():
+    """Inicia um novo rerun descartando os valores memorizados no anterior."""
+    _local.store = {}
+
+
+def memoize(key, factory):
+    """Retorna o valor memorizado para `key` ou o constrói com `factory()`."""
+    store = _store()
+    value = store.get(key, _MISSING)
+    if value is _MISSING:
+        value = store[key] = factory()
+    return value
+
+
+def peek(key, default=None):
+    """Valor memorizado para `key`, sem construí-lo."""
+    return _store().get(key, default)
+
+
+def invalidate(username=None):
+    """Descarta os valores de um usuário (chaves `(nome, username)`) ou todos."""
+    store = _store()
+    if username is None:
+        store.clear()
+        return
+    for key in [k for k in store if isinstance(k, tuple) and k[1:2] == (username,)]:
+        del store[key]
@@ -0,0 +1,153 @@
+"""Totais mensais materializados (monthly_summary).
+
+A tabela é mantida de forma incremental por triggers em financial_data, então
+qualquer escrita (formulário, remoção ou importação em lote) a atualiza. Os
+gráficos leem daqui em vez de agrupar o histórico inteiro a cada exibição.
+
+    python FinFusion/rollups.py verify     # compara com o histórico
+    python FinFusion/rollups.py rebuild    # recalcula a partir do histórico
+"""
+import argparse
+import sys
+
+import pandas as pd
+
+import installments
+import money
+import storage
+
+_KEY = "username, month, type, payment_method, necessity"
+
+_ADD_ROW = '''
+    INSERT INTO monthly_summary ({key}, total_cents, count)
+    VALUES ({row}.username, substr({row}.date, 1, 7), {row}.type,
+            COALESCE({row}.payment_method, ''), COALESCE({row}.necessity, ''), {row}.amount_cents, 1)
+    ON CONFLICT ({key}) DO UPDATE SET total_cents = total_cents + excluded.total_cents, count = count + 1;
+'''
+
+_REMOVE_ROW = '''
+    UPDATE monthly_summary SET total_cents = total_cents - {row}.amount_cents, count = count - 1
+    WHERE username = {row}.username AND month = substr({row}.date, 1, 7) AND type = {row}.type
+      AND payment_method = COALESCE({row}.payment_method, '') AND necessity = COALESCE({row}.necessity, '');
+    DELETE FROM monthly_summary
+    WHERE username = {row}.username AND month = substr({row}.date, 1, 7) AND type = {row}.type
+      AND payment_method = COALESCE({row}.payment_method, '') AND necessity = COALESCE({row}.necessity, '')
+      AND count <= 0;
+'''
+
+TRIGGER_NAMES = ['trg_monthly_summary_insert', 'trg_monthly_summary_delete', 'trg_monthly_summary_update']
+
+TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS trg_monthly_summary_insert AFTER INSERT ON financial_data BEGIN "
+    f"{_ADD_ROW.format(key=_KEY, row='NEW')} END",
+    f"CREATE TRIGGER IF NOT EXISTS trg_monthly_summary_delete AFTER DELETE ON financial_data BEGIN "
+    f"{_REMOVE_ROW.format(row='OLD')} END",
+    f"CREATE TRIGGER IF NOT EXISTS trg_monthly_summary_update AFTER UPDATE ON financial_data BEGIN "
+    f"{_REMOVE_ROW.format(row='OLD')} {_ADD_ROW.format(key=_KEY, row='NEW')} END",
+]
+
+_AGGREGATE_HISTORY = f'''
+    SELECT username, substr(date, 1, 7) AS month, type,
+           COALESCE(payment_method, '') AS payment_method, COALESCE(necessity, '') AS necessity,
+           SUM(amount_cents) AS total_cents, COUNT(*) AS count
+    FROM financial_data
+    {{where}}
+    GROUP BY {_KEY}
+'''
+
+
+def rebuild(username=None, conn=None):
+    """Recalcula monthly_summary a partir de financial_data (de um usuário ou de todos)."""
+    if conn is None:
+        with storage.transaction() as conn:
+            return rebuild(username, conn)
+    where, params = ("WHERE username = ?", (username,)) if username is not None else ("", ())
+    conn.execute(f"DELETE FROM monthly_summary {where}", params)
+    cursor = conn.execute(f"INSERT INTO monthly_summary ({_KEY}, total_cents, count) "
+                          f"{_AGGREGATE_HISTORY.format(where=where)}", params)
+    return cursor.rowcount
+
+
+def verify(username=None):
+    """Lista as divergências entre monthly_summary e o histórico: (chave, esperado, armazenado)."""
+    where, params = ("WHERE username = ?", (username,)) if username is not None else ("", ())
+    with storage.connection() as conn:
+        expected = {row[:5]: row[5:] for row in conn.execute(_AGGREGATE_HISTORY.format(where=where), params)}
+        stored = {row[:5]: row[5:] for row in conn.execute(
+            f"SELECT {_KEY}, total_cents, count FROM monthly_summary {where}", params)}
+    mismatches = []
+    for key in expected.keys() | stored.keys():
+        # Totais em centavos inteiros: a comparação é exata
+        want, have = expected.get(key, (0, 0)), stored.get(key, (0, 0))
+        if want != have:
+            mismatches.append((key, want, have))
+    return sorted(mismatches)
+
+
+def _spread_installments(username, frame, start_month, end_month):
+    """Troca, em Despesa, o valor cheio das compras parceladas pelas parcelas de cada mês."""
+    first, last = installments.schedule_bounds(username)
+    if first is None:
+        return frame
+    start = installments.month_index(start_month) if start_month is not None else min(
+        [first] + ([installments.month_index(frame.index.min())] if len(frame) else []))
+    end = installments.month_index(end_month) if end_month is not None else max(
+        [last] + ([installments.month_index(frame.index.max())] if len(frame) else []))
+    if end < start:
+        return frame
+    adjustment = installments.spread_adjustment(username, start, end)
+    frame = frame.reindex(adjustment.index, fill_value=0.0)
+    frame['Despesa'] = frame.get('Despesa', 0.0) + adjustment
+    return frame
+
+
+def monthly_totals(username, start_month=None, end_month=None, spread_installments=False):
+    """Totais por mês e tipo, no formato de groupby(['month', 'type']).sum().unstack().fillna(0).
+
+    Com `spread_installments`, as compras parceladas entram em Despesa mês a mês,
+    pelas parcelas, incluindo os meses futuros ainda a pagar.
+    """
+    conditions, params = ["username = ?"], [username]
+    if start_month is not None:
+        conditions.append("month >= ?")
+        params.append(str(start_month)[:7])
+    if end_month is not None:
+        conditions.append("month <= ?")
+        params.append(str(end_month)[:7])
+    with storage.connection() as conn:
+        rows = conn.execute(f"SELECT month, type, SUM(total_cents) / 100.0 FROM monthly_summary "
+                            f"WHERE {' AND '.join(conditions)} GROUP BY month, type ORDER BY month",
+                            params).fetchall()
+    frame = pd.DataFrame(rows, columns=['month', 'type', 'amount'])
+    frame['month'] = pd.PeriodIndex(frame['month'], freq='M')
+    frame = frame.pivot(index='month', columns='type', values='amount').fillna(0)
+    if spread_installments:
+        frame = _spread_installments(username, frame, start_month, end_month)
+    return frame
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manutenção da tabela monthly_summary")
+    parser.add_argument('command', choices=['rebuild', 'verify'])
+    parser.add_argument('--user', help='restringe a um usuário')
+    parser.add_argument('--db', help='arquivo do banco (padrão: FINFUSION_DB ou finfusion.db)')
+    args = parser.parse_args(argv)
+
+    if args.db:
+        storage.configure(args.db)
+    import schema
+    schema.migrate()
+
+    if args.command == 'rebuild':
+        print(f"{rebuild(args.user)} linhas recalculadas em monthly_summary")
+        return 0
+    mismatches = verify(args.user)
+    for key, want, have in mismatches:
+        print(f"{key}: esperado total={money.format_cents(want[0])} count={want[1]}, "
+              f"armazenado total={money.format_cents(have[0])} count={have[1]}")
+    print("monthly_summary consistente" if not mismatches else f"{len(mismatches)} divergências")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,342 @@
+import threading
+
+import storage
+
+# Migrações versionadas do banco. A versão aplicada fica em PRAGMA user_version,
+# então cada etapa roda uma única vez por arquivo de banco. Os módulos com os
+# triggers (e pandas/numpy) só são importados pelas migrações que os usam, então
+# abrir um banco já atualizado não carrega nenhum deles.
+
+def _columns(conn, table):
+    # table_info não lista colunas geradas (financial_data.amount)
+    return [info[1] for info in conn.execute(f"PRAGMA table_info({table})")]
+
+# Quantias gravadas em centavos; `amount` (reais) é derivada e só pode ser lida
+_CREATE_FINANCIAL_DATA = '''
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        date DATE NOT NULL,
+        description TEXT,
+        amount_cents INTEGER NOT NULL,
+        amount REAL GENERATED ALWAYS AS (amount_cents / 100.0) VIRTUAL,
+        type TEXT NOT NULL,
+        payment_method TEXT,
+        installments INTEGER,
+        necessity TEXT
+    )
+'''
+
+_TO_CENTS = "CAST(ROUND(amount * 100) AS INTEGER)"
+
+def _convert_amount_to_cents(conn):
+    """Reescreve financial_data de `amount REAL` para `amount_cents INTEGER`.
+
+    Índices e triggers da tabela são recriados com o mesmo SQL (eles leem
+    `amount`, que continua existindo como coluna gerada).
+    """
+    old = _columns(conn, 'financial_data')
+    saved = [sql for sql, in conn.execute("SELECT sql FROM sqlite_master WHERE tbl_name = 'financial_data' "
+                                          "AND type IN ('index', 'trigger') AND sql IS NOT NULL")]
+    conn.execute(_CREATE_FINANCIAL_DATA.format(name='financial_data_cents'))
+    for column, ddl in conn.execute("SELECT name, type FROM pragma_table_info('financial_data')").fetchall():
+        if column != 'amount' and column not in _columns(conn, 'financial_data_cents'):
+            conn.execute(f"ALTER TABLE financial_data_cents ADD COLUMN {column} {ddl}")
+    shared = [c for c in old if c != 'amount']
+    conn.execute(f"INSERT INTO financial_data_cents ({', '.join(shared)}, amount_cents) "
+                 f"SELECT {', '.join(shared)}, {_TO_CENTS} FROM financial_data")
+    # Sem o modo legado, o RENAME revalida triggers de outras tabelas que citam
+    # financial_data, que não existe entre o DROP e o RENAME
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    conn.execute("DROP TABLE financial_data")
+    conn.execute("ALTER TABLE financial_data_cents RENAME TO financial_data")
+    conn.execute("PRAGMA legacy_alter_table = OFF")
+    for sql in saved:
+        conn.execute(sql)
+
+def _migration_1_base_tables(conn):
+    """Cria as tabelas principais e completa colunas de bancos antigos."""
+    columns = _columns(conn, 'financial_data')
+    if columns and 'id' not in columns:
+        # Versões antigas (hash.py) criavam a tabela sem chave primária
+        conn.execute("ALTER TABLE financial_data RENAME TO financial_data_legacy")
+    conn.execute(_CREATE_FINANCIAL_DATA.format(name='financial_data'))
+    if columns and 'id' not in columns:
+        legacy = _columns(conn, 'financial_data_legacy')
+        shared = [c for c in legacy if c in _columns(conn, 'financial_data')]
+        conn.execute(f"INSERT INTO financial_data (id, {', '.join(shared)}, amount_cents) "
+                     f"SELECT rowid, {', '.join(shared)}, {_TO_CENTS} FROM financial_data_legacy "
+                     "WHERE username IS NOT NULL AND date IS NOT NULL "
+                     "AND amount IS NOT NULL AND type IS NOT NULL")
+        conn.execute("DROP TABLE financial_data_legacy")
+    else:
+        for column, ddl in (('payment_method', 'TEXT'), ('installments', 'INTEGER'), ('necessity', 'TEXT')):
+            if column not in _columns(conn, 'financial_data'):
+                conn.execute(f"ALTER TABLE financial_data ADD COLUMN {column} {ddl}")
+        if 'amount_cents' not in _columns(conn, 'financial_data'):
+            _convert_amount_to_cents(conn)
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password TEXT NOT NULL
+        )
+    ''')
+
+def _migration_2_financial_data_indexes(conn):
+    """Índices compostos para as consultas por usuário."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_financial_data_user_date "
+                 "ON financial_data (username, date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_financial_data_user_type_method "
+                 "ON financial_data (username, type, payment_method)")
+    conn.execute("ANALYZE financial_data")
+
+def _migration_3_monthly_summary(conn):
+    """Tabela de totais mensais mantida por triggers em financial_data."""
+    import rollups
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS monthly_summary (
+            username TEXT NOT NULL,
+            month TEXT NOT NULL,
+            type TEXT NOT NULL,
+            payment_method TEXT NOT NULL DEFAULT '',
+            necessity TEXT NOT NULL DEFAULT '',
+            total_cents INTEGER NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (username, month, type, payment_method, necessity)
+        ) WITHOUT ROWID
+    ''')
+    for trigger in rollups.TRIGGERS:
+        conn.execute(trigger)
+    rollups.rebuild(conn=conn)
+
+def _migration_4_balance_checkpoints(conn):
+    """Checkpoints de saldo corrente, invalidados a partir da data alterada."""
+    import balance_ledger
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS balance_checkpoints (
+            username TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            balance_cents INTEGER NOT NULL,
+            PRIMARY KEY (username, seq)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_balance_checkpoints_user_date "
+                 "ON balance_checkpoints (username, date)")
+    for trigger in balance_ledger.TRIGGERS:
+        conn.execute(trigger)
+    balance_ledger.rebuild(conn=conn)
+
+def _migration_5_installment_plans(conn):
+    """Planos de parcelamento (um por compra parcelada), mantidos por triggers."""
+    import installments
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS installment_plans (
+            id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            payment_method TEXT NOT NULL,
+            first_month INTEGER NOT NULL,
+            last_month INTEGER NOT NULL,
+            installments INTEGER NOT NULL,
+            amount_cents INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_installment_plans_user_months "
+                 "ON installment_plans (username, last_month, first_month)")
+    for trigger in installments.TRIGGERS:
+        conn.execute(trigger)
+    installments.rebuild(conn=conn)
+
+def _migration_6_credit_cards(conn):
+    """Cartões de crédito por usuário, cartão de cada lançamento e revisão dos dados (cache das faturas)."""
+    import statements
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS credit_cards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            name TEXT NOT NULL,
+            credit_limit_cents INTEGER NOT NULL,
+            closing_day INTEGER NOT NULL CHECK (closing_day BETWEEN 1 AND 31),
+            due_day INTEGER NOT NULL CHECK (due_day BETWEEN 1 AND 31),
+            UNIQUE (username, name)
+        )
+    ''')
+    if 'card_id' not in _columns(conn, 'financial_data'):
+        conn.execute("ALTER TABLE financial_data ADD COLUMN card_id INTEGER")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS data_revisions (
+            username TEXT PRIMARY KEY,
+            revision INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    for trigger in statements.TRIGGERS:
+        conn.execute(trigger)
+
+def _migration_7_watchlist(conn):
+    """Lista de acompanhamento de cotações por usuário."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS watchlist (
+            username TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            label TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (username, symbol)
+        ) WITHOUT ROWID
+    ''')
+
+def _migration_8_portfolio(conn):
+    """Operações da carteira e valor diário marcado a mercado."""
+    import portfolio
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS trades (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            date TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            price REAL NOT NULL,
+            fees REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_trades_user_symbol_date ON trades (username, symbol, date)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS portfolio_values (
+            username TEXT NOT NULL,
+            date TEXT NOT NULL,
+            value REAL NOT NULL,
+            invested REAL NOT NULL,
+            pnl REAL NOT NULL,
+            PRIMARY KEY (username, date)
+        ) WITHOUT ROWID
+    ''')
+    for trigger in portfolio.TRIGGERS:
+        conn.execute(trigger)
+
+def _migration_9_password_recovery(conn):
+    """Tokens de recuperação de senha (antes criados pelo hash.py na importação)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS password_recovery (
+            username TEXT NOT NULL,
+            token TEXT NOT NULL
+        )
+    ''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_password_recovery_token ON password_recovery (token)")
+
+def _migration_10_amount_index(conn):
+    """Índice para a ordenação por quantia no navegador de transações."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_financial_data_user_amount "
+                 "ON financial_data (username, amount_cents)")
+
+def _migration_11_amount_cents(conn):
+    """Quantias em centavos inteiros: financial_data, monthly_summary e balance_checkpoints."""
+    import rollups
+    if 'amount_cents' not in _columns(conn, 'financial_data'):
+        _convert_amount_to_cents(conn)
+        conn.execute("DROP INDEX IF EXISTS idx_financial_data_user_amount")
+        _migration_10_amount_index(conn)
+    # As tabelas derivadas são recriadas no formato novo e recalculadas do histórico
+    if 'total_cents' not in _columns(conn, 'monthly_summary'):
+        for name in rollups.TRIGGER_NAMES:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute("DROP TABLE monthly_summary")
+        _migration_3_monthly_summary(conn)
+    if 'balance_cents' not in _columns(conn, 'balance_checkpoints'):
+        conn.execute("DROP TABLE balance_checkpoints")
+        _migration_4_balance_checkpoints(conn)
+    conn.execute("ANALYZE financial_data")
+
+def _migration_12_description_search(conn):
+    """Índice FTS5 das descrições, mantido por triggers."""
+    import search
+    conn.execute(search.CREATE_TABLE)
+    for trigger in search.TRIGGERS:
+        conn.execute(trigger)
+    search.rebuild(conn=conn)
+
+def _migration_13_watchlist_customized(conn):
+    """Marca quem já alterou a lista de acompanhamento (uma lista vazia deixa de voltar à padrão)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS watchlist_customized (
+            username TEXT PRIMARY KEY
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("INSERT OR IGNORE INTO watchlist_customized (username) SELECT DISTINCT username FROM watchlist")
+
+def _migration_14_iso_dates(conn):
+    """Reescreve em AAAA-MM-DD as datas gravadas em outros formatos (ex.: 02/01/2024)."""
+    import importer
+    fixed = []
+    for id, value in conn.execute("SELECT id, date FROM financial_data WHERE julianday(date) IS NULL").fetchall():
+        try:
+            fixed.append((importer.parse_date(value), id))
+        except ValueError:
+            continue  # irrecuperável: ledger.from_cursor deixa a linha de fora
+    conn.executemany("UPDATE financial_data SET date = ? WHERE id = ?", fixed)
+
+def _migration_15_plan_and_limit_cents(conn):
+    """Centavos inteiros também em installment_plans e no limite dos cartões."""
+    import installments
+    # installment_plans é derivada de financial_data: recriada e recalculada
+    if 'amount_cents' not in _columns(conn, 'installment_plans'):
+        for name in installments.TRIGGER_NAMES:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute("DROP TABLE installment_plans")
+        _migration_5_installment_plans(conn)
+    if 'credit_limit_cents' not in _columns(conn, 'credit_cards'):
+        conn.execute("ALTER TABLE credit_cards ADD COLUMN credit_limit_cents INTEGER NOT NULL DEFAULT 0")
+        conn.execute("UPDATE credit_cards SET credit_limit_cents = CAST(ROUND(credit_limit * 100) AS INTEGER)")
+        conn.execute("ALTER TABLE credit_cards DROP COLUMN credit_limit")
+
+MIGRATIONS = [
+    (1, _migration_1_base_tables),
+    (2, _migration_2_financial_data_indexes),
+    (3, _migration_3_monthly_summary),
+    (4, _migration_4_balance_checkpoints),
+    (5, _migration_5_installment_plans),
+    (6, _migration_6_credit_cards),
+    (7, _migration_7_watchlist),
+    (8, _migration_8_portfolio),
+    (9, _migration_9_password_recovery),
+    (10, _migration_10_amount_index),
+    (11, _migration_11_amount_cents),
+    (12, _migration_12_description_search),
+    (13, _migration_13_watchlist_customized),
+    (14, _migration_14_iso_dates),
+    (15, _migration_15_plan_and_limit_cents),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(target=SCHEMA_VERSION):
+    """Aplica, em ordem, as migrações pendentes até a versão `target`."""
+    with storage.transaction() as conn:
+        version = current_version(conn)
+        for number, migration in MIGRATIONS:
+            if version < number <= target:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+                version = number
+    return version
+
+# Bancos já migrados neste processo (caminho do arquivo)
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+def ensure_migrated():
+    """Migra o banco atual uma única vez por processo.
+
+    Os pontos de entrada chamam isto a cada rerun; depois da primeira vez não há
+    nem consulta ao SQLite.
+    """
+    path = storage.get_pool().path
+    if path in _migrated:
+        return
+    with _migrate_lock:
+        if path not in _migrated:
+            migrate()
+            _migrated.add(path)
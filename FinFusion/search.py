@@ -0,0 +1,113 @@
+"""Busca textual nas descrições das transações (SQLite FTS5).
+
+financial_data_fts indexa description e username de financial_data (tabela de
+conteúdo externo: o texto não é duplicado, só o índice) e é mantida por
+triggers, então formulário, remoção e importação em lote já a atualizam.
+
+O tokenizador unicode61 com remove_diacritics ignora maiúsculas e acentos
+("salario" encontra "Salário" e "Sálario"; "dizimo" encontra "Dízimo"), e cada
+palavra buscada vale como prefixo ("merc" encontra "Mercado"). O usuário entra
+na própria expressão MATCH, então o FTS cruza a lista do termo com a do usuário
+em vez de devolver as ocorrências de todos os usuários.
+
+    python FinFusion/search.py rebuild    # recria o índice a partir do histórico
+"""
+import argparse
+import re
+import sys
+
+import storage
+
+CREATE_TABLE = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS financial_data_fts USING fts5(
+        description, username,
+        content='financial_data', content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2", prefix='2 3'
+    )
+'''
+
+_ADD_ROW = "INSERT INTO financial_data_fts (rowid, description, username) VALUES ({row}.id, {row}.description, {row}.username);"
+_REMOVE_ROW = ("INSERT INTO financial_data_fts (financial_data_fts, rowid, description, username) "
+               "VALUES ('delete', {row}.id, {row}.description, {row}.username);")
+
+TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS trg_financial_data_fts_insert AFTER INSERT ON financial_data BEGIN "
+    f"{_ADD_ROW.format(row='NEW')} END",
+    "CREATE TRIGGER IF NOT EXISTS trg_financial_data_fts_delete AFTER DELETE ON financial_data BEGIN "
+    f"{_REMOVE_ROW.format(row='OLD')} END",
+    # Só mudanças no texto indexado reescrevem o índice (card_id, por exemplo, não)
+    "CREATE TRIGGER IF NOT EXISTS trg_financial_data_fts_update AFTER UPDATE OF description, username "
+    f"ON financial_data BEGIN {_REMOVE_ROW.format(row='OLD')} {_ADD_ROW.format(row='NEW')} END",
+]
+
+# Condição para filter_conditions: ids das transações cuja descrição casa com a busca
+MATCH_CONDITION = "id IN (SELECT rowid FROM financial_data_fts WHERE financial_data_fts MATCH ?)"
+
+RESULT_LIMIT = 50
+
+_WORD = re.compile(r'\w+')
+
+
+def _phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def match_expression(username, text):
+    """Expressão MATCH do FTS5 para a busca `text` do usuário; None se não há palavras.
+
+    O texto digitado nunca vira sintaxe do FTS: cada palavra entra entre aspas,
+    como prefixo, e todas precisam aparecer na descrição.
+    """
+    words = _WORD.findall(text or '')
+    if not words:
+        return None
+    terms = [f"description : {_phrase(word)}*" for word in words]
+    if _WORD.search(username):
+        terms.insert(0, f"username : {_phrase(username)}")
+    return ' AND '.join(terms)
+
+
+def search(username, text, start=None, end=None, type=None, payment_method=None, necessity=None,
+           limit=RESULT_LIMIT):
+    """Transações do usuário cuja descrição casa com `text`, das mais recentes para as mais antigas.
+
+    Devolve um ledger.Ledger com no máximo `limit` linhas; os filtros são os de
+    queries.filter_conditions.
+    """
+    import ledger  # puxa numpy/pandas
+    import queries
+
+    if match_expression(username, text) is None:
+        return ledger.empty()
+    conditions, params = queries.filter_conditions(username, start, end, type, payment_method, necessity, text)
+    sql = f"{ledger.SELECT_LEDGER} WHERE {' AND '.join(conditions)} ORDER BY date DESC, id DESC LIMIT ?"
+    with storage.connection() as conn:
+        return ledger.from_cursor(conn.execute(sql, params + [limit]))
+
+
+def rebuild(conn=None):
+    """Recria o índice inteiro a partir de financial_data."""
+    if conn is None:
+        with storage.transaction() as conn:
+            return rebuild(conn)
+    conn.execute("INSERT INTO financial_data_fts (financial_data_fts) VALUES ('rebuild')")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manutenção do índice de busca financial_data_fts")
+    parser.add_argument('command', choices=['rebuild'])
+    parser.add_argument('--db', help='arquivo do banco (padrão: FINFUSION_DB ou finfusion.db)')
+    args = parser.parse_args(argv)
+
+    if args.db:
+        storage.configure(args.db)
+    import schema
+    schema.migrate()
+
+    rebuild()
+    print("financial_data_fts recriada")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Cache de processo compartilhado pelas sessões do Streamlit. Diferente do
+# request_cache (que vale só para um rerun), as entradas daqui sobrevivem entre
+# reruns e sessões, com três limites: TTL, número máximo de entradas (LRU) e uma
+# etiqueta opcional (por exemplo a revisão dos dados do usuário) que invalida a
+# entrada quando muda.
+#
+# Dados de usuário sempre entram com `user`: a chave completa é (user, key), então
+# uma sessão nunca recebe o valor montado para outro usuário, e invalidate_user()
+# descarta de uma vez tudo o que é de um usuário em todos os caches.
+
+_MISSING = object()
+
+
+class SharedCache:
+    """Cache LRU com TTL e contadores de acerto/falta."""
+
+    def __init__(self, name, max_entries=256, ttl=None, clock=time.monotonic):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, factory, user=None, tag=None):
+        """Valor de `key` (do usuário `user`); chama `factory()` se faltar, venceu ou a etiqueta mudou."""
+        full_key = (user, key)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(full_key, _MISSING)
+            if entry is not _MISSING:
+                stored_at, stored_tag, value = entry
+                if stored_tag == tag and (self.ttl is None or now - stored_at < self.ttl):
+                    self._entries.move_to_end(full_key)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+        # Fora do lock: falhas de sessões diferentes podem calcular em paralelo
+        value = factory()
+        with self._lock:
+            self._entries[full_key] = (now, tag, value)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, user=_MISSING, key=_MISSING):
+        """Descarta as entradas de um usuário, uma chave específica ou (sem argumentos) todas."""
+        with self._lock:
+            if user is _MISSING and key is _MISSING:
+                self._entries.clear()
+                return
+            for full_key in [k for k in self._entries
+                             if (user is _MISSING or k[0] == user) and (key is _MISSING or k[1] == key)]:
+                del self._entries[full_key]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions}
+
+
+_caches = {}
+_registry_lock = threading.Lock()
+
+
+def cache(name, max_entries=256, ttl=None):
+    """Cache `name` do processo, criado na primeira chamada com os limites informados."""
+    shared = _caches.get(name)
+    if shared is None:
+        with _registry_lock:
+            shared = _caches.get(name)
+            if shared is None:
+                shared = _caches[name] = SharedCache(name, max_entries, ttl)
+    return shared
+
+
+def invalidate_user(username):
+    """Descarta as entradas do usuário em todos os caches."""
+    for shared in list(_caches.values()):
+        shared.invalidate(user=username)
+
+
+def clear_all():
+    for shared in list(_caches.values()):
+        shared.invalidate()
+
+
+def stats():
+    """{nome: {entries, hits, misses, evictions}} de todos os caches."""
+    return {name: shared.stats() for name, shared in list(_caches.items())}
@@ -0,0 +1,244 @@
+import calendar
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+import installments
+import money
+import storage
+
+# Faturas de cartão de crédito. Cada usuário cadastra seus cartões (limite, dia
+# de fechamento e dia de vencimento); a fatura de um ciclo é a soma das compras à
+# vista feitas entre dois fechamentos mais as parcelas que caem naquele ciclo.
+# O ciclo é identificado pelo mês do fechamento (índice de installments.month_index).
+#
+# Os totais ficam em cache por (usuário, cartão, ciclo) junto com a revisão dos
+# dados do usuário; qualquer escrita em financial_data ou credit_cards incrementa
+# a revisão (trigger) e invalida as entradas antigas.
+
+CREDIT_CARD = 'Cartão de Crédito'
+PROJECTION_MONTHS = 12
+MAX_CACHED = 4096
+
+_BUMP_REVISION = '''
+    INSERT INTO data_revisions (username, revision) VALUES ({row}.username, 1)
+    ON CONFLICT (username) DO UPDATE SET revision = revision + 1;
+'''
+
+TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS trg_data_revisions_{table}_{event} AFTER {event.upper()} ON {table} BEGIN "
+    f"{_BUMP_REVISION.format(row=row)} END"
+    for table in ('financial_data', 'credit_cards')
+    for event, row in (('insert', 'NEW'), ('delete', 'OLD'), ('update', 'NEW'))
+]
+
+INSERT_CARD = ("INSERT INTO credit_cards (username, name, credit_limit_cents, closing_day, due_day) "
+               "VALUES (?, ?, ?, ?, ?)")
+SELECT_CARDS = ("SELECT id, name, credit_limit_cents, closing_day, due_day FROM credit_cards "
+                "WHERE username = ? ORDER BY id")
+DELETE_CARD = "DELETE FROM credit_cards WHERE username = ? AND id = ?"
+SELECT_REVISION = "SELECT revision FROM data_revisions WHERE username = ?"
+
+
+def _day_in_month(month, day):
+    year, month0 = divmod(month, 12)
+    return date(year, month0 + 1, min(day, calendar.monthrange(year, month0 + 1)[1]))
+
+
+@dataclass(frozen=True)
+class Card:
+    id: int
+    name: str
+    credit_limit_cents: int
+    closing_day: int
+    due_day: int
+    default: bool = False  # recebe as compras no cartão sem card_id
+
+    @property
+    def credit_limit(self):
+        """Limite em reais."""
+        return money.to_reais(self.credit_limit_cents)
+
+    def closing_date(self, cycle):
+        return _day_in_month(cycle, self.closing_day)
+
+    def due_date(self, cycle):
+        # Vencimento depois do fechamento no mesmo mês, ou no mês seguinte
+        return _day_in_month(cycle if self.due_day > self.closing_day else cycle + 1, self.due_day)
+
+    def cycle_of(self, day):
+        """Ciclo (mês de fechamento) da fatura em que cai uma compra feita em `day`."""
+        month = installments.month_index(day)
+        day = day.date() if isinstance(day, datetime) else day
+        return month if day < self.closing_date(month) else month + 1
+
+    def cycles_of(self, dates):
+        """cycle_of vetorizado para uma Series de datas."""
+        dates = pd.to_datetime(dates)
+        months = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy()
+        closing = np.minimum(self.closing_day, dates.dt.days_in_month.to_numpy())
+        return months + (dates.dt.day.to_numpy() >= closing)
+
+
+@dataclass(frozen=True)
+class CardOutlook:
+    card: Card
+    open_cycle: int
+    statements: pd.Series  # total por ciclo, do aberto em diante
+
+    @property
+    def open_total(self):
+        return float(self.statements.iloc[0])
+
+    @property
+    def next_total(self):
+        return float(self.statements.iloc[1]) if len(self.statements) > 1 else 0.0
+
+    @property
+    def committed(self):
+        """Quanto do limite está comprometido: fatura aberta mais as parcelas futuras projetadas."""
+        return float(self.statements.sum())
+
+    @property
+    def available(self):
+        return self.card.credit_limit - self.committed
+
+
+# Cartão implícito de quem não cadastrou nenhum: recebe todas as compras no
+# crédito, com o limite de 1000 que o alerta usava antes dos cartões cadastrados
+DEFAULT_CARD = Card(None, 'padrão', 100_000, closing_day=1, due_day=10, default=True)
+
+
+def list_cards(username):
+    with storage.connection() as conn:
+        rows = conn.execute(SELECT_CARDS, (username,)).fetchall()
+    return [Card(*row, default=(position == 0)) for position, row in enumerate(rows)]
+
+
+def add_card(username, name, credit_limit, closing_day, due_day):
+    """Cadastra um cartão (`credit_limit` em reais) e devolve o id."""
+    if not 1 <= closing_day <= 31 or not 1 <= due_day <= 31:
+        raise ValueError("Dia de fechamento e de vencimento devem estar entre 1 e 31.")
+    with storage.transaction() as conn:
+        return conn.execute(INSERT_CARD, (username, name, money.to_cents(credit_limit), closing_day,
+                                          due_day)).lastrowid
+
+
+def remove_card(username, card_id):
+    with storage.transaction() as conn:
+        conn.execute("UPDATE financial_data SET card_id = NULL WHERE username = ? AND card_id = ?",
+                     (username, card_id))
+        conn.execute(DELETE_CARD, (username, card_id))
+
+
+def revision(username):
+    """Revisão atual dos dados do usuário (0 se ele nunca escreveu nada)."""
+    with storage.connection() as conn:
+        row = conn.execute(SELECT_REVISION, (username,)).fetchone()
+    return row[0] if row else 0
+
+
+def _card_filter(card, alias=''):
+    column = f"{alias}card_id"
+    if card.default:
+        return f"({column} = ? OR {column} IS NULL)", [card.id]
+    return f"{column} = ?", [card.id]
+
+
+def _compute_statements(conn, username, card, start, end):
+    """Totais (em centavos) dos ciclos `start`..`end` do cartão, a partir de duas consultas por faixa."""
+    totals = np.zeros(end - start + 1, dtype=np.int64)
+
+    # Compras à vista: faixa de datas entre o fechamento anterior a `start` e o de `end`
+    card_sql, card_params = _card_filter(card)
+    rows = conn.execute(
+        "SELECT date, amount_cents FROM financial_data "
+        "WHERE username = ? AND date >= ? AND date < ? AND type = 'Despesa' AND payment_method = ? "
+        f"AND COALESCE(installments, 1) <= 1 AND {card_sql}",
+        [username, card.closing_date(start - 1).isoformat(), card.closing_date(end).isoformat(), CREDIT_CARD,
+         *card_params]).fetchall()
+    if rows:
+        dates, cents = zip(*rows)
+        cycles = card.cycles_of(pd.Series(dates)) - start
+        np.add.at(totals, cycles, np.asarray(cents, dtype=np.int64))
+
+    # Parcelas: planos ativos na janela (a primeira parcela cai no mês da compra ou no seguinte)
+    card_sql, card_params = _card_filter(card, 'f.')
+    rows = conn.execute(
+        "SELECT f.date, p.installments, p.amount_cents FROM installment_plans p JOIN financial_data f ON f.id = p.id "
+        f"WHERE p.username = ? AND p.payment_method = ? AND p.last_month >= ? AND p.first_month <= ? AND {card_sql}",
+        [username, CREDIT_CARD, start - 1, end, *card_params]).fetchall()
+    if rows:
+        dates, counts, amounts = zip(*rows)
+        totals += installments.schedule_totals(card.cycles_of(pd.Series(dates)), counts, amounts, start, end)
+    return totals
+
+
+class StatementCache:
+    """Totais de fatura por (usuário, cartão, ciclo), válidos enquanto a revisão do usuário não muda."""
+
+    def __init__(self, max_entries=MAX_CACHED):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def statements(self, username, card, start, end):
+        with storage.connection() as conn:
+            row = conn.execute(SELECT_REVISION, (username,)).fetchone()
+            revision = row[0] if row else 0
+            keys = [(username, card.id, cycle) for cycle in range(start, end + 1)]
+            with self._lock:
+                cached = [self._entries.get(key) for key in keys]
+                if all(entry is not None and entry[0] == revision for entry in cached):
+                    self.hits += len(keys)
+                    for key in keys:
+                        self._entries.move_to_end(key)
+                    return np.array([entry[1] for entry in cached], dtype=np.int64)
+                self.misses += len(keys)
+            totals = _compute_statements(conn, username, card, start, end)
+        with self._lock:
+            for key, total in zip(keys, totals):
+                self._entries[key] = (revision, int(total))
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return totals
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = StatementCache()
+
+
+def statement_totals(username, card, start, end):
+    """Total de cada fatura do cartão entre os ciclos `start` e `end` (Series por mês de fechamento)."""
+    start, end = installments.month_index(start), installments.month_index(end)
+    totals = _cache.statements(username, card, start, end)
+    months = pd.period_range(installments.month_label(start), installments.month_label(end), freq='M')
+    return pd.Series(totals / 100, index=months)
+
+
+def outlook(username, card, today=None, months=PROJECTION_MONTHS):
+    """Fatura aberta, próxima fatura e projeção dos próximos `months` ciclos do cartão."""
+    open_cycle = card.cycle_of(today or date.today())
+    return CardOutlook(card, open_cycle, statement_totals(username, card, open_cycle, open_cycle + months - 1))
+
+
+def outlooks(username, today=None, months=PROJECTION_MONTHS):
+    """Outlook de cada cartão cadastrado, ou do DEFAULT_CARD se o usuário não tem nenhum."""
+    return [outlook(username, card, today, months) for card in list_cards(username) or [DEFAULT_CARD]]
+
+
+def cache_stats():
+    return {'entries': len(_cache), 'hits': _cache.hits, 'misses': _cache.misses}
@@ -0,0 +1,133 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Caminho padrão do banco de dados (pode ser sobrescrito por variável de ambiente)
+DB_PATH = os.environ.get('FINFUSION_DB', 'finfusion.db')
+
+# Ajustes aplicados em cada conexão nova
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+    "PRAGMA foreign_keys=ON",
+)
+
+# Consultas usadas pelas páginas. Manter o texto idêntico faz o sqlite3
+# reaproveitar o statement já preparado no cache de cada conexão.
+SELECT_FINANCIAL_DATA = ("SELECT id, date, description, amount, type, payment_method, installments, necessity "
+                         "FROM financial_data WHERE username=?")
+# As inserções recebem a quantia em centavos (money.to_cents)
+INSERT_FINANCIAL_DATA = ("INSERT INTO financial_data (username, date, description, amount_cents, type, payment_method, installments, necessity) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+INSERT_FINANCIAL_DATA_WITH_CARD = ("INSERT INTO financial_data (username, date, description, amount_cents, type, payment_method, installments, necessity, card_id) "
+                                   "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+DELETE_FINANCIAL_DATA = "DELETE FROM financial_data WHERE id=?"
+INSERT_USER = "INSERT INTO users (username, password) VALUES (?, ?)"
+SELECT_PASSWORD = "SELECT password FROM users WHERE username=?"
+
+
+class ConnectionPool:
+    """Mantém conexões SQLite abertas e as empresta a uma thread por vez."""
+
+    def __init__(self, path=DB_PATH, size=8, cached_statements=256):
+        self.path = path
+        self.size = size
+        self.cached_statements = cached_statements
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._local = threading.local()
+
+    def _connect(self):
+        # isolation_level=None: leituras não abrem transação implícita e as
+        # escritas usam BEGIN/COMMIT explícitos em transaction().
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None,
+                               check_same_thread=False, cached_statements=self.cached_statements)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Empresta uma conexão do pool; chamadas aninhadas na mesma thread reutilizam a mesma."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Executa o bloco dentro de uma transação de escrita (BEGIN IMMEDIATE)."""
+        with self.connection() as conn:
+            if conn.in_transaction:
+                # Já existe uma transação aberta nesta thread: participa dela
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def close_all(self):
+        """Fecha as conexões ociosas do pool."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Retorna o pool do processo, criando-o na primeira chamada."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+def configure(path, size=8):
+    """Aponta o pool do processo para outro arquivo de banco de dados."""
+    global _pool, DB_PATH
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        DB_PATH = path
+        _pool = ConnectionPool(path, size=size)
+    return _pool
+
+
+def connection():
+    return get_pool().connection()
+
+
+def transaction():
+    return get_pool().transaction()
@@ -2,50 +2,44 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 from datetime import datetime
+import io
 import math
-import hashlib
-import sqlite3
 import openpyxl
 import secrets
 import smtplib
+import os
+import sys
 from email.mime.text import MIMEText
 
-# Create a SQLite database connection
-conn = sqlite3.connect('finfusion.db')
-c = conn.cursor()
+# Senhas, esquema e acesso a dados compartilhados com o app principal
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', '..'))
+import passwords
+import repository
+import schema
 
-# Create tables if they don't exist
-c.execute('''CREATE TABLE IF NOT EXISTS users
-             (username TEXT PRIMARY KEY, password TEXT)''')
-c.execute('''CREATE TABLE IF NOT EXISTS financial_data
-             (username TEXT, date DATE, description TEXT, amount REAL, type TEXT)''')
-c.execute('''CREATE TABLE IF NOT EXISTS password_recovery
-             (username TEXT, token TEXT)''')
-conn.commit()
+# Cria/atualiza as tabelas. As consultas abaixo usam conexões do pool de storage,
+# uma por vez em cada thread, em vez de um cursor global compartilhado pelas sessões.
+schema.ensure_migrated()
 
-# Function to hash passwords
+# Function to hash passwords (scrypt com sal, no pool do KDF)
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+    return passwords.get_guard().hash(password)
 
 # Function to check if user exists
 def user_exists(username):
-    c.execute("SELECT 1 FROM users WHERE username=?", (username,))
-    return c.fetchone() is not None
+    return repository.users.exists(username)
 
-# Function to authenticate user
-def authenticate_user(username, password):
-    c.execute("SELECT 1 FROM users WHERE username=? AND password=?", (username, hash_password(password)))
-    return c.fetchone() is not None
+# Function to authenticate user (hashes antigos são regravados no primeiro login)
+def authenticate_user(username, password, ip=None):
+    return passwords.authenticate(username, password, ip)
 
 # Function to add new user
 def add_user(username, password):
-    c.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, hash_password(password)))
-    conn.commit()
+    repository.users.add(username, hash_password(password))
 
 # Function to add financial data
 def add_financial_data(username, date, description, amount, type):
-    c.execute("INSERT INTO financial_data (username, date, description, amount, type) VALUES (?, ?, ?, ?, ?)", (username, date, description, amount, type))
-    conn.commit()
+    repository.financial_data.add(username, date, description, amount, type)
 
 # Function to generate a random token
 def generate_token():
@@ -74,8 +68,7 @@ def request_password_recovery(username):
     if user_exists(username):
         # Gerar token e armazenar na tabela
         token = generate_token()
-        c.execute("INSERT INTO password_recovery (username, token) VALUES (?, ?)", (username, token))
-        conn.commit()
+        repository.password_recovery.add(username, token)
         
         # Enviar e-mail com o token
         send_recovery_email(username, token)
@@ -85,43 +78,38 @@ def request_password_recovery(username):
 
 # Função para exportar dados financeiros para Excel
 def export_to_excel(financial_data):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    
+    # Modo write_only: as linhas são gravadas em sequência, sem endereçar célula por célula
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+
     # Cabeçalho
-    ws['A1'] = 'Data'
-    ws['B1'] = 'Descrição'
-    ws['C1'] = 'Quantia'
-    ws['D1'] = 'Tipo'
-    
+    ws.append(['Data', 'Descrição', 'Quantia', 'Tipo'])
+
     # Dados
-    for i, row in enumerate(financial_data):
-        ws[f'A{i+2}'] = row[1]
-        ws[f'B{i+2}'] = row[2]
-        ws[f'C{i+2}'] = row[3]
-        ws[f'D{i+2}'] = row[4]
-    
-    # Salvar arquivo
-    wb.save('financial_data.xlsx')
+    for row in financial_data:
+        ws.append(row[1:5])
+
+    # Gera o arquivo em memória (para st.download_button), sem nome fixo compartilhado no servidor
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
 
 # Função para importar dados financeiros de Excel
 def import_from_excel(file):
-    wb = openpyxl.load_workbook(file)
+    # Leitura em modo streaming: as linhas são geradas uma a uma, sem montar a planilha em memória
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
     ws = wb.active
-    
+
     # Dados
-    financial_data = []
-    for row in ws.iter_rows(min_row=2):
-        financial_data.append((row[0].value, row[1].value, row[2].value, row[3].value))
-    
-    return financial_data
+    try:
+        for row in ws.iter_rows(min_row=2, max_col=4, values_only=True):
+            yield row
+    finally:
+        wb.close()
 
 # Função para obter dados financeiros do usuário
 def get_financial_data(username, filter=None):
-    if filter:
-        c.execute("SELECT * FROM financial_data WHERE username=? AND type=?", (username, filter))
-    else:
-        c.execute("SELECT * FROM financial_data WHERE username=?", (username,))
-    return c.fetchall()
+    # Linhas (id, data, descrição, quantia, tipo, ...): export_to_excel usa row[1:5]
+    return repository.financial_data.list(username, type=filter or None)
 
 # Login form
\ No newline at end of file
@@ -0,0 +1,67 @@
+import storage
+
+# Lista de acompanhamento (ações, índices e criptomoedas) de cada usuário.
+# Quem ainda não montou a sua vê a lista padrão, com os símbolos que antes
+# estavam fixos nas páginas. A primeira alteração copia a padrão e marca o
+# usuário em watchlist_customized; dali em diante vale só o que ele gravou,
+# inclusive uma lista vazia.
+
+DEFAULT_WATCHLIST = [
+    ('ITUB4.SA', 'Itaú'),
+    ('BTC-USD', 'Bitcoin'),
+    ('ETH-USD', 'Ethereum'),
+    ('^BVSP', 'IBOVESPA'),
+    ('^IXIC', 'NASDAQ'),
+]
+
+SELECT_WATCHLIST = "SELECT symbol, label FROM watchlist WHERE username = ? ORDER BY position, symbol"
+INSERT_WATCHLIST = '''
+    INSERT INTO watchlist (username, symbol, label, position)
+    VALUES (?, ?, ?, (SELECT COALESCE(MAX(position), 0) + 1 FROM watchlist WHERE username = ?))
+    ON CONFLICT (username, symbol) DO UPDATE SET label = excluded.label
+'''
+DELETE_WATCHLIST = "DELETE FROM watchlist WHERE username = ? AND symbol = ?"
+SELECT_CUSTOMIZED = "SELECT 1 FROM watchlist_customized WHERE username = ?"
+
+
+def normalize_symbol(symbol):
+    return symbol.strip().upper()
+
+
+def get_watchlist(username):
+    """[(símbolo, nome)] do usuário, na ordem em que foram adicionados (a padrão se nunca alterou)."""
+    if username is None:
+        return list(DEFAULT_WATCHLIST)
+    with storage.connection() as conn:
+        if conn.execute(SELECT_CUSTOMIZED, (username,)).fetchone() is None:
+            return list(DEFAULT_WATCHLIST)
+        rows = conn.execute(SELECT_WATCHLIST, (username,)).fetchall()
+    return [tuple(row) for row in rows]
+
+
+def symbols(username):
+    return [symbol for symbol, _ in get_watchlist(username)]
+
+
+def _copy_default(conn, username):
+    """Na primeira alteração, grava a lista padrão que o usuário estava vendo e marca a personalização."""
+    if conn.execute(SELECT_CUSTOMIZED, (username,)).fetchone() is None:
+        conn.execute("INSERT INTO watchlist_customized (username) VALUES (?)", (username,))
+        conn.executemany("INSERT INTO watchlist (username, symbol, label, position) VALUES (?, ?, ?, ?)",
+                         [(username, symbol, label, position)
+                          for position, (symbol, label) in enumerate(DEFAULT_WATCHLIST, start=1)])
+
+
+def add_symbol(username, symbol, label=None):
+    symbol = normalize_symbol(symbol)
+    if not symbol:
+        raise ValueError("Informe o símbolo.")
+    with storage.transaction() as conn:
+        _copy_default(conn, username)
+        conn.execute(INSERT_WATCHLIST, (username, symbol, label or symbol, username))
+
+
+def remove_symbol(username, symbol):
+    with storage.transaction() as conn:
+        _copy_default(conn, username)
+        conn.execute(DELETE_WATCHLIST, (username, normalize_symbol(symbol)))
@@ -0,0 +1,246 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+
+# Tarefas em segundo plano, fora da thread de script do Streamlit. Cada tarefa
+# tem uma chave; enquanto uma execução está na fila ou rodando, novos pedidos
+# com a mesma chave são ignorados. As páginas leem o último resultado concluído
+# sem esperar (latest) e mostram quando ele foi calculado.
+#
+# Os resultados ficam em um LRU: passam de MAX_RESULTS ou ficam RESULT_IDLE sem
+# ser lidos e são descartados junto com o estado da tarefa (o próximo pedido
+# recalcula). discard() esquece as chaves de um usuário ao sair.
+#
+# Quem pede uma tarefa pode se identificar (`owner`, o usuário da sessão); a
+# mesma chave pode ter vários donos (cotações compartilhadas) e jobs(owner) lista
+# só as tarefas daquele dono.
+
+MAX_PENDING = 32
+MAX_RESULTS = 256
+RESULT_IDLE = timedelta(minutes=30)
+
+QUEUED = 'na fila'
+RUNNING = 'executando'
+DONE = 'concluída'
+FAILED = 'falhou'
+
+
+@dataclass(frozen=True)
+class Job:
+    key: tuple
+    status: str
+    submitted_at: datetime
+    started_at: datetime = None
+    finished_at: datetime = None
+    error: str = None
+
+
+@dataclass(frozen=True)
+class Result:
+    key: tuple
+    value: object
+    completed_at: datetime
+    tag: object = None  # versão dos dados usada no cálculo (ex.: revisão do usuário)
+
+    def age(self, now=None):
+        return (now or datetime.now()) - self.completed_at
+
+
+class BackgroundWorker:
+    """Pool de threads com fila limitada e estado de cada tarefa consultável."""
+
+    def __init__(self, max_workers=2, max_pending=MAX_PENDING, clock=datetime.now,
+                 max_results=MAX_RESULTS, idle=RESULT_IDLE):
+        self.max_pending = max_pending
+        self.clock = clock
+        self.max_results = max_results
+        self.idle = idle
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='finfusion-worker')
+        self._jobs = {}
+        self._results = OrderedDict()  # do menos para o mais recentemente usado
+        self._used = {}
+        self._lock = threading.Lock()
+        self._periodic = {}
+        self._owners = {}
+        self._stop = threading.Event()
+        self._ticker = None
+
+    def _pending(self):
+        return sum(1 for job in self._jobs.values() if job.status in (QUEUED, RUNNING))
+
+    def _touch(self, key, now):
+        self._results.move_to_end(key)
+        self._used[key] = now
+
+    def _evict(self, now):
+        # Sob self._lock. Resultados além do limite ou ociosos saem pela ponta menos usada
+        while self._results:
+            key = next(iter(self._results))
+            if len(self._results) <= self.max_results and now - self._used[key] < self.idle:
+                break
+            self._forget(key)
+        for key, job in list(self._jobs.items()):
+            if (key not in self._results and job.status in (DONE, FAILED)
+                    and now - job.finished_at >= self.idle):
+                del self._jobs[key]
+                self._release_owners(key)
+
+    def _forget(self, key):
+        self._results.pop(key, None)
+        self._used.pop(key, None)
+        job = self._jobs.get(key)
+        if job is not None and job.status in (DONE, FAILED):
+            del self._jobs[key]
+        self._release_owners(key)
+
+    def _own(self, key, owner):
+        if owner is not None:
+            self._owners.setdefault(key, set()).add(owner)
+
+    def _release_owners(self, key):
+        # Os donos saem junto com o último vestígio da chave
+        if key not in self._jobs and key not in self._results and key not in self._periodic:
+            self._owners.pop(key, None)
+
+    def submit(self, key, fn, *args, tag=None, owner=None):
+        """Agenda fn(*args); devolve o Job, ou None se a fila estiver cheia."""
+        with self._lock:
+            self._own(key, owner)
+            job = self._jobs.get(key)
+            if job is not None and job.status in (QUEUED, RUNNING):
+                return job
+            if self._pending() >= self.max_pending:
+                self._release_owners(key)
+                return None
+            job = self._jobs[key] = Job(key, QUEUED, self.clock())
+        self._executor.submit(self._run, key, fn, args, tag)
+        return job
+
+    def _run(self, key, fn, args, tag):
+        with self._lock:
+            self._jobs[key] = replace(self._jobs[key], status=RUNNING, started_at=self.clock())
+        try:
+            value = fn(*args)
+        except Exception as e:
+            with self._lock:
+                self._jobs[key] = replace(self._jobs[key], status=FAILED, finished_at=self.clock(),
+                                          error=f"{type(e).__name__}: {e}")
+            return
+        now = self.clock()
+        with self._lock:
+            self._results[key] = Result(key, value, now, tag)
+            self._touch(key, now)
+            self._jobs[key] = replace(self._jobs[key], status=DONE, finished_at=now, error=None)
+            self._evict(now)
+
+    def latest(self, key):
+        """Último resultado concluído da chave (ou None), sem bloquear."""
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._touch(key, self.clock())
+            return result
+
+    def discard(self, match):
+        """Esquece resultados, tarefas concluídas e tarefas periódicas das chaves com match(key)."""
+        with self._lock:
+            for key in [key for key in self._results if match(key)]:
+                self._forget(key)
+            for key in [key for key in self._jobs if match(key)]:
+                self._forget(key)
+            for key in [key for key in self._periodic if match(key)]:
+                del self._periodic[key]
+                self._release_owners(key)
+
+    def disown(self, owner):
+        """Tira `owner` de todas as chaves (as tarefas continuam para os demais donos)."""
+        with self._lock:
+            for owners in self._owners.values():
+                owners.discard(owner)
+
+    def ensure(self, key, fn, *args, max_age=None, tag=None, owner=None):
+        """Devolve o último resultado e agenda um novo cálculo se não houver, se for
+        mais velho que `max_age` ou se foi calculado com outro `tag`."""
+        result = self.latest(key)
+        if (result is None or (max_age is not None and result.age(self.clock()) >= max_age)
+                or (tag is not None and result.tag != tag)):
+            self.submit(key, fn, *args, tag=tag, owner=owner)
+        elif owner is not None:
+            with self._lock:
+                self._own(key, owner)
+        return result
+
+    def job(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def jobs(self, owner=None):
+        """Estado das tarefas conhecidas (só as de `owner`, se informado), das mais recentes para as mais antigas."""
+        with self._lock:
+            jobs = [job for key, job in self._jobs.items()
+                    if owner is None or owner in self._owners.get(key, ())]
+        return sorted(jobs, key=lambda job: job.submitted_at, reverse=True)
+
+    def every(self, key, interval, fn, *args, idle=None, owner=None):
+        """Reexecuta fn(*args) a cada `interval` (timedelta).
+
+        Sem `idle`, até cancel(); com `idle`, para se every não for chamado de novo
+        com a mesma chave nesse prazo (quem pediu deixou de precisar).
+        """
+        expires = self.clock() + idle if idle is not None else None
+        with self._lock:
+            self._own(key, owner)
+            self._periodic[key] = (interval.total_seconds(), fn, args, expires)
+            if self._ticker is None:
+                self._ticker = threading.Thread(target=self._tick, name='finfusion-worker-ticker', daemon=True)
+                self._ticker.start()
+
+    def cancel(self, key):
+        """Para de reexecutar a tarefa periódica (o último resultado continua disponível)."""
+        with self._lock:
+            self._periodic.pop(key, None)
+            self._release_owners(key)
+
+    def _tick(self):
+        while not self._stop.wait(1.0):
+            now = self.clock()
+            with self._lock:
+                due = []
+                for key, (seconds, fn, args, expires) in list(self._periodic.items()):
+                    if expires is not None and now >= expires:
+                        del self._periodic[key]
+                        self._release_owners(key)
+                        continue
+                    job = self._jobs.get(key)
+                    if job is None or (job.status not in (QUEUED, RUNNING)
+                                       and (now - (job.finished_at or job.submitted_at)).total_seconds() >= seconds):
+                        due.append((key, fn, args))
+            for key, fn, args in due:
+                self.submit(key, fn, *args)
+
+    def shutdown(self, wait=True):
+        self._stop.set()
+        self._executor.shutdown(wait=wait)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker():
+    """Worker compartilhado pelas sessões do processo."""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = BackgroundWorker()
+    return _worker
+
+
+def set_worker(worker):
+    global _worker
+    with _worker_lock:
+        _worker = worker
+    return worker
@@ -1,109 +1,53 @@
+import os
+import sys
 import streamlit as st
-import pandas as pd
 import sqlite3
-import matplotlib.pyplot as plt
-import yfinance as yf
 
-# Função para atualizar o esquema do banco de dados
+# Módulos compartilhados com o app principal
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'FinFusion'))
+import lazy_import
+import money
+import repository
+import schema
+import shared_cache
+import watchlist
+
+# pandas e os painéis só carregam quando uma página logada precisa deles
+pd = lazy_import.module('pandas')
+aggregation = lazy_import.module('aggregation')
+dashboard = lazy_import.module('dashboard')
+ledger = lazy_import.module('ledger')
+statements = lazy_import.module('statements')
+
+# Função para atualizar o esquema do banco de dados (uma vez por processo, não a cada rerun)
 def update_database_schema():
-    conn = sqlite3.connect('finfusion.db')
-    c = conn.cursor()
-
     try:
-        c.execute("PRAGMA table_info(financial_data)")
-        columns = [info[1] for info in c.fetchall()]
-
-        if 'payment_method' not in columns:
-            c.execute("ALTER TABLE financial_data ADD COLUMN payment_method TEXT")
-            print("Added payment_method column")
-
-        if 'installments' not in columns:
-            c.execute("ALTER TABLE financial_data ADD COLUMN installments INTEGER")
-            print("Added installments column")
-
-        conn.commit()
-        print("Database schema updated successfully")
+        schema.ensure_migrated()
     except sqlite3.Error as e:
         print(f"Error updating database schema: {e}")
-    finally:
-        conn.close()
 
 # Atualizar o esquema do banco de dados
 update_database_schema()
 
 # Função para recuperar dados financeiros de um usuário
+# (cache de processo por usuário, invalidado pela revisão dos dados a cada escrita)
 def get_financial_data(username):
-    with sqlite3.connect('finfusion.db') as conn:
-        c = conn.cursor()
-        c.execute("SELECT date, description, amount, type, payment_method, installments FROM financial_data WHERE username=?", (username,))
-        data = c.fetchall()
-    return data
+    cache = shared_cache.cache('root_financial_data', max_entries=512, ttl=600)
+    return cache.get('ledger', lambda: ledger.load(username), user=username, tag=statements.revision(username))
 
 # Função para adicionar despesa ou receita
 def add_financial_data(username, date, description, amount, type, payment_method, installments):
-    with sqlite3.connect('finfusion.db') as conn:
-        c = conn.cursor()
-        c.execute("INSERT INTO financial_data (username, date, description, amount, type, payment_method, installments) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (username, date, description, amount, type, payment_method, installments))
-        conn.commit()
-
-# Função para formatar números em moeda
-def format_currency(value):
-    return f"{value:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
-
-# Função para calcular o valor líquido
-def calculate_net_value(financial_data):
-    net_value = 0
-    for row in financial_data:
-        if row[3] == 'Receita':
-            net_value += row[2]
-        elif row[3] == 'Despesa':
-            net_value -= row[2]
-    return net_value
-
-# Função para calcular as despesas
-def calculate_expenses(financial_data):
-    expenses = 0
-    for row in financial_data:
-        if row[3] == 'Despesa':
-            expenses += row[2]
-    return expenses
+    repository.financial_data.add(username, date, description, amount, type, payment_method, installments)
 
 # Função para calcular o alerta de cheque especial
 def calculate_special_check_alert(net_value, previous_month_net_value):
     if net_value < 0:
-        return f"Alerta de cheque especial! Seu saldo é de {format_currency(net_value)} e você está usando {format_currency(-net_value)} do seu cheque especial."
+        return f"Alerta de cheque especial! Seu saldo é de {money.format_currency(net_value)} e você está usando {money.format_currency(-net_value)} do seu cheque especial."
     elif net_value < previous_month_net_value * 0.92:  # 8% interest rate
-        return f"Alerta de cheque especial! Seu saldo é de {format_currency(net_value)} e você está próximo de usar seu cheque especial."
+        return f"Alerta de cheque especial! Seu saldo é de {money.format_currency(net_value)} e você está próximo de usar seu cheque especial."
     else:
         return ""
 
-# Função para calcular o saldo
-def calculate_balance(financial_data):
-    balance = 0
-    for row in financial_data:
-        if row[3] == 'Receita':
-            balance += row[2]
-        elif row[3] == 'Despesa':
-            balance -= row[2]
-    return balance
-
-# Função para calcular despesas à vista
-def calculate_cash_expenses(financial_data):
-    expenses = 0
-    for row in financial_data:
-        if row[3] == 'Despesa' and row[4] == 'À Vista':
-            expenses += row[2]
-    return expenses
-
-# Função para calcular despesas de cartão de crédito
-def calculate_credit_card_expenses(financial_data):
-    expenses = 0
-    for row in financial_data:
-        if row[3] == 'Despesa' and row[4] == 'Cartão de Crédito':
-            expenses += row[2]
-    return expenses
-
 # Função para a página inicial
 def home():
     st.title('FinFusion - Controle Financeiro')
@@ -116,19 +60,18 @@ def home():
         financial_data = get_financial_data(username)
 
         # Calcular o saldo, despesas à vista e despesas de cartão de crédito
-        balance = calculate_balance(financial_data)
-        cash_expenses = calculate_cash_expenses(financial_data)
-        credit_card_expenses = calculate_credit_card_expenses(financial_data)
+        summary = aggregation.summarize(username)
+        balance = summary.balance
 
         # Exibir informações financeiras
         st.subheader('Resumo Financeiro')
-        st.metric('Saldo', format_currency(balance))
-        st.metric('Despesas à Vista', format_currency(cash_expenses))
-        st.metric('Despesas no Cartão de Crédito', format_currency(credit_card_expenses))
+        st.metric('Saldo', money.format_currency(balance))
+        st.metric('Despesas à Vista', money.format_currency(summary.cash_expenses))
+        st.metric('Despesas no Cartão de Crédito', money.format_currency(summary.credit_card_expenses))
 
         # Alerta de saldo negativo
         if balance < 0:
-            st.error(f'Alerta: Seu saldo está negativo! {format_currency(balance)}')
+            st.error(f'Alerta: Seu saldo está negativo! {money.format_currency(balance)}')
 
         # Formulário para adicionar dados financeiros
         with st.form(key='finance_form'):
@@ -146,8 +89,9 @@ def home():
 
         # Exibir os dados financeiros do usuário
         st.subheader('Seus Dados Financeiros')
-        if financial_data:
-            df = pd.DataFrame(financial_data, columns=['date', 'description', 'amount', 'type', 'payment_method', 'installments'])
+        if len(financial_data):
+            df = financial_data.to_frame(('date', 'description', 'amount', 'type', 'payment_method', 'installments'),
+                                         labels={}, dates_as_text=True)
             st.dataframe(df)
         else:
             st.info('Nenhum dado financeiro encontrado.')
@@ -185,65 +129,37 @@ def financial_analysis():
     if 'username' in st.session_state:
         username = st.session_state['username']
 
-        # Recuperar dados financeiros
-        financial_data = get_financial_data(username)
-        if financial_data:
-            df = pd.DataFrame(financial_data, columns=['date', 'description', 'amount', 'type', 'payment_method', 'installments'])
-            df['date'] = pd.to_datetime(df['date'])
-
-            # Gráfico de barras de renda e despesas por mês
-            df['month'] = df['date'].dt.to_period('M')
-            monthly_summary = df.groupby(['month', 'type'])['amount'].sum().unstack().fillna(0)
+        # Painel pré-calculado em segundo plano (gráficos de renda/despesas e saldo); a página
+        # mostra o último pronto e o worker recalcula quando os dados do usuário mudam
+        board = dashboard.request_dashboard(username)
+        if board is None:
+            st.info('Preparando o painel em segundo plano...')
+            st.button('Atualizar')
+        elif board.value.monthly_chart is not None:
+            st.caption(dashboard.freshness(board))
 
             st.subheader('Gráfico de Renda e Despesas por Mês')
-            fig, ax = plt.subplots()
-            monthly_summary.plot(kind='bar', ax=ax)
-            ax.set_xlabel('Mês')
-            ax.set_ylabel('Quantia')
-            ax.set_title('Renda e Despesas por Mês')
-            st.pyplot(fig)
+            st.image(board.value.monthly_chart)
 
-            # Gráfico de linha de saldo líquido ao longo do tempo
-            df['net_balance'] = df['amount'].cumsum()
             st.subheader('Gráfico de Saldo Líquido ao Longo do Tempo')
-            fig, ax = plt.subplots()
-            df.plot(x='date', y='net_balance', kind='line', ax=ax)
-            ax.set_xlabel('Data')
-            ax.set_ylabel('Saldo Líquido')
-            ax.set_title('Saldo Líquido ao Longo do Tempo')
-            st.pyplot(fig)
+            st.image(board.value.balance_chart)
 
             # Define o título do aplicativo
-            st.title("Consulta de Ações - Itaú, Bitcoin e Etherium")
-
-            # Carrega os dados das ações do Itaú
-            itau = yf.Ticker("ITUB4.SA")
-            itau_hist = itau.history(period="1y")
-
-            # Carrega os dados do Bitcoin
-            bitcoin = yf.Ticker("BTC-USD")
-            bitcoin_hist = bitcoin.history(period="1y")
-
-            # Carrega os dados do Etherium
-            etherium = yf.Ticker("ETH-USD")
-            etherium_hist = etherium.history(period="1y")
-
-            # Carrega os dados do Ibovespa
-            ibovespa = yf.Ticker("^BVSP")
-            ibovespa_hist = ibovespa.history(period="1y")
-
-            # Gráficos de ações
-            st.subheader("Evolução dos Preços das Ações do Itaú")
-            st.line_chart(itau_hist["Close"])
-
-            st.subheader("Evolução dos Preços do Bitcoin")
-            st.line_chart(bitcoin_hist["Close"])
-
-            st.subheader("Evolução dos Preços do Etherium")
-            st.line_chart(etherium_hist["Close"])
-
-            st.subheader("Evolução do IBOVESPA")
-            st.line_chart(ibovespa_hist["Close"])
+            st.title("Consulta de Ações - Lista de Acompanhamento")
+
+            # Cotações do último ano dos símbolos da lista do usuário, atualizadas pelo worker
+            entries = watchlist.get_watchlist(username)
+            market = dashboard.request_market([symbol for symbol, _ in entries], owner=username)
+            if market is None:
+                st.info('Carregando cotações em segundo plano...')
+            else:
+                st.caption(dashboard.freshness(market))
+                for symbol, label in entries:
+                    history = market.value[symbol]
+                    if history.empty:
+                        continue
+                    st.subheader(f"Evolução de {label}")
+                    st.line_chart(history["Close"])
 
 # Barra lateral para navegação
 st.sidebar.title("Navegação")
@@ -0,0 +1,142 @@
+"""Sessões simultâneas lendo e gravando transações: cursor global x repositório.
+
+Cada thread faz o papel de uma sessão do Streamlit: repete `--ops` operações
+(consulta do histórico de um usuário e, em `--write-ratio` delas, um
+lançamento novo) para usuários sorteados. Três formas de acesso são medidas
+com 1, 2, 4... até `--threads` sessões:
+
+- cursor global: a conexão aberta na importação, como o hash.py fazia; fora
+  da thread que a criou o sqlite3 recusa o uso (check_same_thread);
+- conexão global com lock: o mesmo cursor liberado entre threads, mas com as
+  sessões enfileiradas num lock;
+- repositório: repository.py, com conexões do pool e transações explícitas.
+
+No fim confere que nenhum lançamento se perdeu.
+
+    python benchmarks/bench_concurrency.py [--users 200] [--months 12] [--threads 8] [--ops 300]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'FinFusion'))
+
+import money  # noqa: E402
+import queries  # noqa: E402
+import repository  # noqa: E402
+import schema  # noqa: E402
+import storage  # noqa: E402
+import synthetic  # noqa: E402
+
+
+class GlobalCursor:
+    """Conexão e cursor únicos do processo, criados na thread principal."""
+
+    def __init__(self, path, check_same_thread=True, lock=None):
+        self.conn = sqlite3.connect(path, check_same_thread=check_same_thread)
+        self.c = self.conn.cursor()
+        self.lock = lock
+
+    def list(self, username):
+        sql, params = queries.build_query(username)
+        with self.lock or _nullcontext():
+            self.c.execute(sql, params)
+            return self.c.fetchall()
+
+    def add(self, username, date, description, amount, type):
+        with self.lock or _nullcontext():
+            self.c.execute(storage.INSERT_FINANCIAL_DATA,
+                           (username, date, description, money.to_cents(amount), type, None, None, None))
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class _nullcontext:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def session(backend, users, ops, write_ratio, seed, counters):
+    rng = random.Random(seed)
+    for i in range(ops):
+        name = synthetic.username(rng.randrange(users))
+        try:
+            if rng.random() < write_ratio:
+                backend.add(name, '2024-01-15', f'Carga {seed}-{i}', 10.0, 'Despesa')
+                counters['writes'] += 1
+            else:
+                backend.list(name)
+                counters['reads'] += 1
+        except sqlite3.Error:
+            counters['errors'] += 1
+
+
+def run(label, backend, threads, users, ops, write_ratio):
+    counters = [{'reads': 0, 'writes': 0, 'errors': 0} for _ in range(threads)]
+    workers = [threading.Thread(target=session, args=(backend, users, ops, write_ratio, 1000 * threads + t, counters[t]))
+               for t in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    done = sum(c['reads'] + c['writes'] for c in counters)
+    errors = sum(c['errors'] for c in counters)
+    print(f'{label:<28} {threads:>3} sessões  {done / elapsed:9.0f} ops/s  erros={errors}')
+    return sum(c['writes'] for c in counters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=300, help='operações por sessão')
+    parser.add_argument('--write-ratio', type=float, default=0.1)
+    args = parser.parse_args()
+
+    thread_counts = [n for n in (1, 2, 4, 8, 16, 32) if n < args.threads] + [args.threads]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        storage.configure(path, size=max(8, args.threads))
+        schema.migrate()
+        rows = synthetic.populate(synthetic.generate_rows(args.users, args.months))
+        print(f'{rows} linhas, {args.users} usuários, {args.ops} operações por sessão '
+              f'({args.write_ratio:.0%} gravações)\n')
+
+        expected = rows
+        backends = [
+            ('cursor global', lambda: GlobalCursor(path)),
+            ('conexão global com lock', lambda: GlobalCursor(path, check_same_thread=False, lock=threading.Lock())),
+        ]
+        for label, make in backends:
+            for threads in thread_counts:
+                backend = make()
+                expected += run(label, backend, threads, args.users, args.ops, args.write_ratio)
+                backend.close()
+            print()
+        for threads in thread_counts:
+            expected += run('repositório', repository.financial_data, threads, args.users, args.ops,
+                            args.write_ratio)
+
+        with storage.connection() as conn:
+            stored = conn.execute("SELECT COUNT(*) FROM financial_data").fetchone()[0]
+        print(f'\nlinhas gravadas: {stored} (esperado {expected})')
+        assert stored == expected
+        storage.get_pool().close_all()
+
+
+if __name__ == '__main__':
+    main()
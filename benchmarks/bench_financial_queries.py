@@ -0,0 +1,136 @@
+"""Latência de get_financial_data antes e depois dos índices de financial_data.
+
+Gera 1M de linhas distribuídas entre 10k usuários num banco temporário,
+mede consultas por usuário com o esquema base (versão 1, sem índices),
+aplica a migração 2 e mede de novo. Depois da migração confere, com
+EXPLAIN QUERY PLAN, que o planejador escolhe um dos índices por usuário para
+cada consulta de queries.build_query (nenhuma varre a tabela inteira).
+
+    python benchmarks/bench_financial_queries.py [--rows 1000000] [--users 10000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'FinFusion'))
+
+import queries  # noqa: E402
+import schema  # noqa: E402
+import storage  # noqa: E402
+
+METHODS = ['Dinheiro', 'Cartão de Crédito', 'Cartão de Débito', 'Transferência']
+
+
+def populate(rows, users, seed=42):
+    rng = random.Random(seed)
+    batch = []
+    with storage.transaction() as conn:
+        for i in range(rows):
+            batch.append((
+                f'user{rng.randrange(users)}',
+                f'{rng.randint(2019, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+                f'Transação {i}',
+                round(rng.uniform(1, 5000) * 100),  # centavos
+                'Receita' if rng.random() < 0.3 else 'Despesa',
+                rng.choice(METHODS),
+                rng.randint(1, 12),
+                rng.choice(['Essencial', 'Não essencial']),
+            ))
+            if len(batch) == 50_000:
+                conn.executemany(storage.INSERT_FINANCIAL_DATA, batch)
+                batch.clear()
+        conn.executemany(storage.INSERT_FINANCIAL_DATA, batch)
+
+
+def measure(label, users, lookups, fn):
+    rng = random.Random(7)
+    names = [f'user{rng.randrange(users)}' for _ in range(lookups)]
+    timings = []
+    for name in names:
+        started = time.perf_counter()
+        fn(name)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p95 = timings[int(len(timings) * 0.95)] * 1000
+    print(f'{label:<45} p50={p50:8.3f} ms  p95={p95:8.3f} ms')
+
+
+PLAN_CASES = {
+    'histórico completo': {},
+    'janela de datas': {'start': '2024-01-01', 'end': '2024-12-31'},
+    'tipo + método': {'type': 'Despesa', 'payment_method': 'Cartão de Crédito'},
+    'tipo + necessidade': {'type': 'Despesa', 'necessity': 'Essencial'},
+    'janela + tipo': {'start': '2024-01-01', 'end': '2024-03-31', 'type': 'Receita'},
+}
+
+
+def check_plans():
+    """Imprime o plano de cada consulta e falha se alguma não usar um índice por usuário."""
+    with storage.connection() as conn:
+        for label, filters in PLAN_CASES.items():
+            sql, params = queries.build_query('user0', **filters)
+            plan = ' / '.join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+            print(f'{label:<22} {plan}')
+            assert 'USING INDEX idx_financial_data_user' in plan or \
+                'USING COVERING INDEX idx_financial_data_user' in plan, f'{label}: {plan}'
+
+
+def run_cases(users, lookups, indexed):
+    def full_history(name):
+        with storage.connection() as conn:
+            conn.execute(storage.SELECT_FINANCIAL_DATA, (name,)).fetchall()
+
+    measure('get_financial_data', users, lookups, full_history)
+    if indexed:
+        measure('janela de datas (2024)', users, lookups,
+                lambda name: queries.get_financial_data_between(name, '2024-01-01', '2024-12-31'))
+        measure('Despesa + Cartão de Crédito', users, lookups,
+                lambda name: queries.get_financial_data_by_type(name, 'Despesa', 'Cartão de Crédito'))
+    else:
+        def filtered(sql, extra):
+            def run(name):
+                with storage.connection() as conn:
+                    conn.execute(sql, (name, *extra)).fetchall()
+            return run
+        measure('janela de datas (2024)', users, lookups,
+                filtered(storage.SELECT_FINANCIAL_DATA + " AND date BETWEEN ? AND ?", ('2024-01-01', '2024-12-31')))
+        measure('Despesa + Cartão de Crédito', users, lookups,
+                filtered(storage.SELECT_FINANCIAL_DATA + " AND type=? AND payment_method=?", ('Despesa', 'Cartão de Crédito')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.configure(os.path.join(tmp, 'bench.db'))
+        schema.migrate(target=1)
+        started = time.perf_counter()
+        populate(args.rows, args.users)
+        print(f'{args.rows} linhas / {args.users} usuários geradas em {time.perf_counter() - started:.1f} s\n')
+
+        print('Antes (esquema v1, sem índices):')
+        run_cases(args.users, args.lookups, indexed=False)
+
+        started = time.perf_counter()
+        schema.migrate()
+        print(f'\nMigração para v{schema.SCHEMA_VERSION} em {time.perf_counter() - started:.1f} s\n')
+
+        print('Planos:')
+        check_plans()
+        print()
+
+        print('Depois (índices compostos):')
+        run_cases(args.users, args.lookups, indexed=True)
+        storage.get_pool().close_all()
+
+
+if __name__ == '__main__':
+    main()
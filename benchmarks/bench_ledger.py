@@ -0,0 +1,84 @@
+"""Memória e tempo de carga do histórico de um usuário: tuplas, DataFrame e ledger.
+
+Grava um único usuário com cerca de --rows transações num banco temporário e
+carrega o histórico completo de três formas, medindo com tracemalloc a memória
+retida depois da carga e o pico durante ela:
+
+- lista de tuplas (fetchall, como get_financial_data fazia);
+- DataFrame montado a partir das tuplas (como get_financial_frame fazia),
+  medido junto com a consulta;
+- ledger.Ledger lido direto do cursor.
+
+Confere também que o ledger traz os mesmos ids, datas e quantias das tuplas.
+
+    python benchmarks/bench_ledger.py [--rows 1000000]
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'FinFusion'))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import ledger  # noqa: E402
+import schema  # noqa: E402
+import storage  # noqa: E402
+import synthetic  # noqa: E402
+
+SELECT_TUPLES = "SELECT id, date, description, amount, type, payment_method, installments, necessity FROM financial_data " \
+                "WHERE username = ? ORDER BY date, id"
+LABELS = list(ledger.LABELS.values())
+
+
+def measure(label, load, rows):
+    """Carrega com `load()`; imprime tempo, memória retida e pico. Devolve o resultado."""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:<22} {elapsed:7.2f} s  retido {retained / 2**20:8.1f} MB  pico {peak / 2**20:8.1f} MB  '
+          f'({retained / rows:6.1f} B/linha)')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000, help='transações aproximadas do usuário')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.configure(os.path.join(tmp, 'bench.db'))
+        schema.migrate()
+        # Cerca de 20 transações por mês no gerador sintético
+        rows = synthetic.populate(synthetic.generate_rows(1, max(1, args.rows // 20)))
+        name = synthetic.username(0)
+        print(f'{rows} transações do usuário {name}\n')
+
+        with storage.connection() as conn:
+            measure('DataFrame', lambda: pd.DataFrame(conn.execute(SELECT_TUPLES, (name,)).fetchall(),
+                                                      columns=LABELS), rows)
+            tuples = measure('tuplas', lambda: conn.execute(SELECT_TUPLES, (name,)).fetchall(), rows)
+        entries = measure('ledger', lambda: ledger.load(name), rows)
+        print(f'\nledger.nbytes: {entries.nbytes / 2**20:.1f} MB')
+
+        assert entries.id.tolist() == [row[0] for row in tuples]
+        assert np.datetime_as_string(entries.date, unit='D').tolist() == [row[1] for row in tuples]
+        assert np.allclose(entries.amount, [row[3] for row in tuples])
+        assert list(entries.type) == [row[4] for row in tuples]
+        print('conferência: ok (ids, datas, quantias e tipos iguais aos das tuplas)')
+
+        storage.get_pool().close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Marcação a mercado das carteiras: carga inicial e atualização de um pregão.
+
+Gera `--users` carteiras com `--positions` ativos cada (sorteados entre
+`--symbols` símbolos com cotações do provedor falso), calcula o valor diário
+de todas nos últimos `--days` pregões e mede a atualização incremental
+quando chega um pregão novo (uma linha por carteira).
+
+    python benchmarks/bench_portfolio.py [--users 10000] [--positions 50] [--days 60]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'FinFusion'))
+
+import pandas as pd  # noqa: E402
+
+import market_data  # noqa: E402
+import portfolio  # noqa: E402
+import schema  # noqa: E402
+import storage  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def populate_trades(users, positions, symbols, first_day, days, seed=42):
+    rng = random.Random(seed)
+    batch = []
+    with storage.transaction() as conn:
+        for u in range(users):
+            name = synthetic.username(u)
+            for symbol in rng.sample(symbols, positions):
+                day = first_day + timedelta(days=rng.randrange(days))
+                batch.append((name, symbol, day.isoformat(), rng.randint(1, 100), round(rng.uniform(10, 200), 2), 0.0))
+                if rng.random() < 0.2:
+                    # Venda parcial depois da compra
+                    later = day + timedelta(days=rng.randrange(1, 30))
+                    batch.append((name, symbol, later.isoformat(), -1, round(rng.uniform(10, 200), 2), 0.0))
+            if len(batch) >= 50_000:
+                conn.executemany(portfolio.INSERT_TRADE, batch)
+                batch.clear()
+        conn.executemany(portfolio.INSERT_TRADE, batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--positions', type=int, default=50)
+    parser.add_argument('--symbols', type=int, default=500)
+    parser.add_argument('--days', type=int, default=60, help='pregões calculados na carga inicial')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.configure(os.path.join(tmp, 'bench.db'))
+        schema.migrate()
+        store = market_data.set_store(market_data.MarketDataStore(os.path.join(tmp, 'market.db'),
+                                                                  fetcher=synthetic.fake_market_fetcher))
+
+        # Cotações até "hoje" (último pregão do provedor falso); o último fica para a atualização incremental
+        symbols = [f'SYM{i:03d}' for i in range(args.symbols)]
+        started = time.perf_counter()
+        first_day = date.today() - timedelta(days=args.days * 7 // 5 + 45)
+        for symbol in symbols:
+            store.refresh(symbol, first_day)
+        trading_days = store.closes(symbols[:1], first_day).index
+        last_day, previous_day = trading_days[-1].date(), trading_days[-2].date()
+        print(f'{args.symbols} símbolos x {len(trading_days)} pregões em cache em {time.perf_counter() - started:.1f} s')
+
+        started = time.perf_counter()
+        trades_start = trading_days[-args.days].date()
+        populate_trades(args.users, args.positions, symbols, trades_start - timedelta(days=30), 30)
+        with storage.connection() as conn:
+            trades = conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+        print(f'{trades} operações ({args.users} carteiras x {args.positions} posições) '
+              f'em {time.perf_counter() - started:.1f} s\n')
+
+        started = time.perf_counter()
+        rows = portfolio.update_values(until=previous_day)
+        print(f'Carga inicial: {rows} linhas em {time.perf_counter() - started:.2f} s')
+
+        started = time.perf_counter()
+        rows = portfolio.update_values(until=last_day)
+        print(f'Pregão novo ({last_day}): {rows} linhas em {time.perf_counter() - started:.2f} s')
+
+        started = time.perf_counter()
+        series = portfolio.portfolio_series(synthetic.username(0))
+        print(f'portfolio_series de um usuário ({len(series)} dias): '
+              f'{(time.perf_counter() - started) * 1000:.1f} ms')
+        started = time.perf_counter()
+        weights = portfolio.allocation_series(synthetic.username(0))
+        print(f'allocation_series de um usuário ({weights.shape[1]} ativos): '
+              f'{(time.perf_counter() - started) * 1000:.1f} ms')
+        assert not pd.isna(series['value'].iloc[-1])
+
+        storage.get_pool().close_all()
+        store.pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Latência da busca nas descrições (search.search e o navegador com filtro de texto).
+
+Grava --users usuários sintéticos num banco temporário (o índice FTS5 é
+mantido pelos triggers durante a carga) e mede, para usuários sorteados,
+buscas por palavra inteira, prefixo e sem acento, com e sem filtros de data e
+tipo, além da primeira página e da contagem do navegador filtrado por texto.
+O vocabulário do gerador é pequeno, então cada termo aparece para quase todos
+os usuários: é o pior caso para o cruzamento termo x usuário no FTS.
+
+    python benchmarks/bench_search.py [--users 10000] [--months 10] [--lookups 200]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'FinFusion'))
+
+import queries  # noqa: E402
+import schema  # noqa: E402
+import search  # noqa: E402
+import storage  # noqa: E402
+import synthetic  # noqa: E402
+
+QUERIES = {
+    'palavra inteira': ('Mercado', {}),
+    'prefixo': ('farm', {}),
+    'sem acento': ('salario', {}),
+    'duas palavras': ('conta luz', {}),
+    'prefixo + data + tipo': ('rest', {'start': date(2023, 3, 1), 'end': date(2023, 6, 30), 'type': 'Despesa'}),
+    'sem resultado': ('xyzzy', {}),
+}
+
+
+def measure(label, users, lookups, fn):
+    rng = random.Random(7)
+    names = [synthetic.username(rng.randrange(users)) for _ in range(lookups)]
+    fn(names[0])
+    timings = []
+    for name in names:
+        started = time.perf_counter()
+        fn(name)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    p50 = timings[len(timings) // 2] * 1000
+    p95 = timings[int(len(timings) * 0.95)] * 1000
+    print(f'{label:<34} p50={p50:7.2f} ms  p95={p95:7.2f} ms')
+    return p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--months', type=int, default=10)
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.configure(os.path.join(tmp, 'bench.db'))
+        schema.migrate()
+        started = time.perf_counter()
+        rows = synthetic.populate(synthetic.generate_rows(args.users, args.months))
+        print(f'{rows} linhas ({args.users} usuários) gravadas em {time.perf_counter() - started:.1f} s\n')
+
+        worst = 0.0
+        for label, (text, filters) in QUERIES.items():
+            worst = max(worst, measure(f'search: {label}', args.users, args.lookups,
+                                       lambda name: search.search(name, text, **filters)))
+        measure('navegador: 1ª página (texto)', args.users, args.lookups,
+                lambda name: queries.fetch_page(name, {'text': 'merc'}))
+        measure('navegador: contagem (texto)', args.users, args.lookups,
+                lambda name: queries.count_matching(name, {'text': 'merc'}))
+        print(f'\npior p95 de search.search: {worst:.2f} ms')
+
+        storage.get_pool().close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Cache de processo do histórico: latência de sessões simultâneas e acertos.
+
+Várias threads fazem o papel de sessões do Streamlit e pedem, a cada "rerun",
+o histórico de usuários sorteados por app.get_financial_data. Mede a latência
+com o cache vazio e já aquecido e mostra os contadores de acerto/falta. O
+isolamento entre usuários é conferido em tests/test_shared_cache.py.
+
+    python benchmarks/bench_shared_cache.py [--users 200] [--months 12] [--threads 8] [--reruns 200]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'FinFusion'))
+
+import schema  # noqa: E402
+import shared_cache  # noqa: E402
+import storage  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def sessions(app, request_cache, users, threads, reruns):
+    """Sessões concorrentes; devolve as latências das leituras."""
+    names = [synthetic.username(u) for u in range(users)]
+    timings = []
+    lock = threading.Lock()
+
+    def session(seed):
+        rng = random.Random(seed)
+        local_timings = []
+        for _ in range(reruns):
+            name = rng.choice(names)
+            request_cache.begin_request()
+            started = time.perf_counter()
+            app.get_financial_data(name)
+            local_timings.append(time.perf_counter() - started)
+        with lock:
+            timings.extend(local_timings)
+
+    workers = [threading.Thread(target=session, args=(seed,)) for seed in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return timings
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p50 = timings[len(timings) // 2] * 1000
+    p95 = timings[int(len(timings) * 0.95)] * 1000
+    print(f'{label:<32} p50={p50:7.3f} ms  p95={p95:7.3f} ms  ({len(timings)} leituras)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--reruns', type=int, default=200, help='leituras por sessão')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.configure(os.path.join(tmp, 'bench.db'), size=max(8, args.threads))
+        schema.migrate()
+        rows = synthetic.populate(synthetic.generate_rows(args.users, args.months))
+        print(f'{rows} linhas, {args.users} usuários, {args.threads} sessões\n')
+
+        import app  # FinFusion/app.py; o bloco __main__ não roda na importação
+        import request_cache
+        import streamlit.logger
+        streamlit.logger.set_log_level('error')
+
+        cache = shared_cache.cache('financial_data')
+
+        report('cache frio (primeira passada)', sessions(app, request_cache, args.users, args.threads, args.reruns))
+        report('cache aquecido', sessions(app, request_cache, args.users, args.threads, args.reruns))
+        print(f'contadores: {cache.stats()}')
+
+        storage.get_pool().close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Partida a frio do FinFusion/app.py: tempo de importação e da primeira renderização.
+
+Cada cenário roda num processo Python novo (`python -X importtime`), que
+executa o app com o AppTest do Streamlit e mede:
+
+- a primeira execução do script (primeira renderização da página) e um rerun;
+- quais bibliotecas pesadas (pandas, numpy, matplotlib, yfinance, openpyxl)
+  foram importadas até ali;
+- as importações de maior tempo acumulado, lidas do relatório -X importtime.
+
+Cenários: tela de login, página inicial logada ("Inserir Dados") e a troca
+para "Dados Financeiros". As cotações vêm de um cache pré-preenchido pelo
+provedor falso, então nada acessa a rede.
+
+    python benchmarks/bench_startup.py [--users 20] [--months 12] [--top 12]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+APP = os.path.join(ROOT, 'FinFusion', 'app.py')
+sys.path.insert(0, os.path.join(ROOT, 'FinFusion'))
+
+HEAVY = ['pandas', 'numpy', 'matplotlib', 'yfinance', 'openpyxl']
+SCENARIOS = {
+    'login': None,
+    'inicial': 'Inserir Dados',
+    'dados': 'Dados Financeiros',
+}
+
+
+def child(scenario, username):
+    """Roda dentro do subprocesso: renderiza o cenário e imprime o resultado em JSON."""
+    # Nada além do Streamlit é importado aqui, para não contaminar a lista de bibliotecas carregadas
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=120)
+    page = SCENARIOS[scenario]
+    if page is not None:
+        at.session_state['username'] = username
+        at.session_state['logged_in'] = True
+    runs = []
+    at_start = time.perf_counter()
+    at.run()
+    runs.append(('primeira renderização', time.perf_counter() - at_start))
+    if page is not None and page != 'Inserir Dados':
+        at_start = time.perf_counter()
+        at.sidebar.selectbox[0].set_value(page).run()
+        runs.append((f'troca para {page}', time.perf_counter() - at_start))
+    at_start = time.perf_counter()
+    at.run()
+    runs.append(('rerun', time.perf_counter() - at_start))
+    errors = [e.value for e in at.exception]
+    print(json.dumps({
+        'runs': runs,
+        'total': time.perf_counter() - started,
+        'loaded': [name for name in HEAVY if name in sys.modules],
+        'errors': errors,
+    }))
+
+
+def top_imports(stderr, top):
+    """Importações de primeiro nível com maior tempo acumulado, em ms."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        # "import time: self [us] | cumulative | nome", com o nome recuado conforme o aninhamento
+        _, cumulative_us, name = line.split('|', 2)
+        if name[1:].startswith(' '):
+            continue
+        entries.append((int(cumulative_us) / 1000, name.strip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def prepare(tmp, users, months):
+    """Banco com usuários sintéticos e cache de cotações da lista padrão, ainda dentro do TTL."""
+    import market_data
+    import schema
+    import storage
+    import synthetic
+    import watchlist
+
+    storage.configure(os.path.join(tmp, 'bench.db'))
+    schema.migrate()
+    synthetic.populate(synthetic.generate_rows(users, months))
+    store = market_data.MarketDataStore(os.path.join(tmp, 'market.db'), fetcher=synthetic.fake_market_fetcher)
+    for symbol, _ in watchlist.DEFAULT_WATCHLIST:
+        store.refresh(symbol, date.today() - timedelta(days=400))
+    storage.get_pool().close_all()
+    store.pool.close_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--top', type=int, default=12, help='importações listadas por cenário')
+    parser.add_argument('--child', choices=list(SCENARIOS), help=argparse.SUPPRESS)
+    parser.add_argument('--username', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.username)
+        return
+
+    import synthetic
+
+    with tempfile.TemporaryDirectory() as tmp:
+        prepare(tmp, args.users, args.months)
+        env = dict(os.environ, FINFUSION_DB=os.path.join(tmp, 'bench.db'),
+                   FINFUSION_MARKET_DB=os.path.join(tmp, 'market.db'),
+                   PYTHONPATH=os.pathsep.join([os.path.join(ROOT, 'FinFusion'), os.path.dirname(__file__)]))
+        for scenario in SCENARIOS:
+            started = time.perf_counter()
+            proc = subprocess.run([sys.executable, '-X', 'importtime', __file__, '--child', scenario,
+                                   '--username', synthetic.username(0)],
+                                  cwd=tmp, env=env, capture_output=True, text=True)
+            wall = time.perf_counter() - started
+            if proc.returncode != 0:
+                print(proc.stderr[-2000:])
+                raise SystemExit(f'cenário {scenario} falhou')
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+
+            print(f'== {scenario}: processo {wall:.2f} s (inclui o interpretador)')
+            for label, seconds in result['runs']:
+                print(f'   {label:<32} {seconds * 1000:8.0f} ms')
+            print(f"   bibliotecas pesadas carregadas: {', '.join(result['loaded']) or 'nenhuma'}")
+            if result['errors']:
+                print(f"   erros na página: {result['errors']}")
+            print('   importações mais lentas (acumulado):')
+            for ms, name in top_imports(proc.stderr, args.top):
+                print(f'     {ms:8.1f} ms  {name}')
+            print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Compara dois resultados JSON de benchmarks/run.py (mediana, antes -> depois).
+
+    python benchmarks/compare.py base.json novo.json [--threshold 1.10]
+"""
+import argparse
+import json
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=1.10,
+                        help='razão novo/base acima da qual o caso é marcado como regressão')
+    args = parser.parse_args()
+
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+
+    print(f"{'caso':<40} {base.get('commit') or 'base':>12} {new.get('commit') or 'novo':>12}  razão")
+    regressions = 0
+    for name in sorted(set(base['results']) | set(new['results'])):
+        before = base['results'].get(name, {}).get('median')
+        after = new['results'].get(name, {}).get('median')
+        if before is None or after is None:
+            print(f"{name:<40} {'-' if before is None else f'{before * 1000:.3f} ms':>12} "
+                  f"{'-' if after is None else f'{after * 1000:.3f} ms':>12}")
+            continue
+        ratio = after / before if before else float('inf')
+        flag = '  REGRESSÃO' if ratio > args.threshold else ''
+        regressions += bool(flag)
+        print(f"{name:<40} {before * 1000:9.3f} ms {after * 1000:9.3f} ms  {ratio:5.2f}x{flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
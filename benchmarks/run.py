@@ -0,0 +1,249 @@
+"""Suíte de benchmarks dos caminhos quentes do FinFusion.
+
+Monta um banco temporário com dados sintéticos (synthetic.py), usa um
+provedor de cotações falso (nada é buscado na rede) e mede cada caso,
+gravando o resultado em JSON para comparar entre commits (compare.py).
+
+    python benchmarks/run.py --users 200 --months 24 --output resultados.json
+    python benchmarks/run.py --filter import --repeat 3
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'FinFusion'))
+
+import synthetic  # noqa: E402
+
+CASES = []
+
+
+def case(name):
+    """Registra uma função `fn(ctx)` como caso de benchmark."""
+    def register(fn):
+        CASES.append((name, fn))
+        return fn
+    return register
+
+
+@case('get_financial_data')
+def bench_get_financial_data(ctx):
+    # Sessão nova com o cache de processo vazio: consulta o SQLite
+    ctx.request_cache.begin_request()
+    ctx.shared_cache.clear_all()
+    ctx.app.get_financial_data(ctx.username)
+
+
+@case('get_financial_data_shared_hit')
+def bench_get_financial_data_shared_hit(ctx):
+    # Rerun (ou outra sessão) sem escrita desde a última consulta: só confere a revisão
+    ctx.request_cache.begin_request()
+    ctx.app.get_financial_data(ctx.username)
+
+
+@case('calculate_total_balance')
+def bench_calculate_total_balance(ctx):
+    ctx.request_cache.begin_request()
+    ctx.app.calculate_total_balance(ctx.username)
+
+
+@case('alert_overdraft_and_credit')
+def bench_alert_overdraft_and_credit(ctx):
+    ctx.request_cache.begin_request()
+    ctx.app.alert_overdraft_and_credit(ctx.username)
+
+
+@case('financial_analysis_monthly_groupby')
+def bench_monthly_groupby(ctx):
+    # Mesmo processamento de financial_analysis() no app.py da raiz
+    ctx.request_cache.begin_request()
+    data = ctx.app.get_financial_data(ctx.username)
+    df = data.to_frame(('date', 'amount', 'type'), labels={})
+    df['month'] = df['date'].dt.to_period('M')
+    df.groupby(['month', 'type'])['amount'].sum().unstack().fillna(0)
+
+
+@case('monthly_totals_rollup')
+def bench_monthly_totals(ctx):
+    ctx.rollups.monthly_totals(ctx.username)
+
+
+@case('import_csv')
+def bench_import_csv(ctx):
+    with open(ctx.import_path, 'rb') as f:
+        ctx.importer.import_financial_data('bench_import', f, 'extrato.csv')
+    with ctx.storage.transaction() as conn:
+        conn.execute("DELETE FROM financial_data WHERE username = 'bench_import'")
+
+
+@case('export_xlsx')
+def bench_export_xlsx(ctx):
+    ctx.exporter.export(ctx.username, 'xlsx')
+
+
+@case('export_csv')
+def bench_export_csv(ctx):
+    ctx.exporter.export(ctx.username, 'csv')
+
+
+@case('market_data_fetch_many')
+def bench_market_data(ctx):
+    ctx.market_data.fetch_many(['BTC-USD', 'ETH-USD', '^BVSP', '^IXIC'], ctx.one_year_ago)
+
+
+@case('chart_render_line')
+def bench_chart_render(ctx):
+    ctx.chart_render._cache.invalidate()
+    history = ctx.market_data.history('BTC-USD', ctx.one_year_ago)
+    ctx.chart_render.render_line(history['Close'], 'Evolução do Bitcoin', 'Data', 'Preço de Fechamento')
+
+
+@case('indicators_4_symbols')
+def bench_indicators_4(ctx):
+    ctx.indicators.compute(ctx.prices.iloc[:, :4])
+
+
+@case('indicators_200_symbols')
+def bench_indicators_200(ctx):
+    ctx.indicators.compute(ctx.prices)
+
+
+@case('format_currency_rows')
+def bench_format_currency_rows(ctx):
+    # Uma chamada por valor, como os format_func e .map(format_currency) das páginas faziam
+    [ctx.money.format_cents(int(cents)) for cents in ctx.all_cents]
+
+
+@case('format_currency_column')
+def bench_format_currency_column(ctx):
+    ctx.money.format_cents_column(ctx.all_cents)
+
+
+class Context:
+    """Módulos do app e dados compartilhados pelos casos."""
+
+
+def setup(args, tmp):
+    import storage
+    import schema
+    import market_data
+
+    storage.configure(os.path.join(tmp, 'bench.db'))
+    schema.migrate()
+    started = time.perf_counter()
+    rows = synthetic.populate(synthetic.generate_rows(args.users, args.months, args.seed))
+    print(f'{rows} linhas ({args.users} usuários x {args.months} meses) em {time.perf_counter() - started:.1f} s')
+
+    market_data.set_store(market_data.MarketDataStore(os.path.join(tmp, 'market.db'),
+                                                      fetcher=synthetic.fake_market_fetcher))
+
+    import app  # FinFusion/app.py; o bloco __main__ não roda na importação
+    import streamlit.config
+    import streamlit.logger
+    import chart_render
+    import exporter
+    import importer
+    import indicators
+    import ledger
+    import money
+    import request_cache
+    import rollups
+    import shared_cache
+
+    # Silencia os avisos de "bare mode" do Streamlit fora do `streamlit run`
+    # (a configuração é carregada antes para não restaurar o nível depois)
+    streamlit.config.get_option('logger.level')
+    streamlit.logger.set_log_level('error')
+
+    ctx = Context()
+    ctx.app, ctx.storage, ctx.market_data, ctx.rollups = app, storage, market_data, rollups
+    ctx.chart_render, ctx.exporter, ctx.importer, ctx.request_cache = chart_render, exporter, importer, request_cache
+    ctx.username = synthetic.username(0)
+    ctx.one_year_ago = date(date.today().year - 1, date.today().month, 1)
+    ctx.indicators = indicators
+    ctx.shared_cache = shared_cache
+    ctx.money = money
+    with storage.connection() as conn:
+        ctx.all_cents = ledger.from_cursor(conn.execute(ledger.SELECT_LEDGER)).cents
+    ctx.prices = indicators.price_matrix({f'SYM{i}': synthetic.fake_market_fetcher(f'SYM{i}', ctx.one_year_ago, date.today())
+                                          for i in range(200)})
+    ctx.import_path = os.path.join(tmp, 'extrato.csv')
+    synthetic.write_csv(ctx.import_path, synthetic.generate_rows(args.import_users, args.months, args.seed + 1))
+    return ctx
+
+
+def measure(fn, ctx, repeat, warmup):
+    for _ in range(warmup):
+        fn(ctx)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(ctx)
+        timings.append(time.perf_counter() - started)
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'repeat': repeat,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--months', type=int, default=24)
+    parser.add_argument('--import-users', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--filter', default='', help='roda só os casos cujo nome contém este texto')
+    parser.add_argument('--output', help='arquivo JSON de saída')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = setup(args, tmp)
+        for name, fn in CASES:
+            if args.filter not in name:
+                continue
+            results[name] = measure(fn, ctx, args.repeat, args.warmup)
+            print(f"{name:<40} median={results[name]['median'] * 1000:10.3f} ms  "
+                  f"min={results[name]['min'] * 1000:10.3f} ms")
+        ctx.storage.get_pool().close_all()
+        ctx.market_data.get_store().pool.close_all()
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'params': {k: v for k, v in vars(args).items() if k != 'output'},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'Resultados gravados em {args.output}')
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
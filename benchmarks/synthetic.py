@@ -0,0 +1,93 @@
+"""Gerador determinístico de lançamentos financeiros para os benchmarks.
+
+Cada usuário recebe, por mês, salário, contas fixas e um número variável de
+compras em dinheiro, débito, transferência ou cartão de crédito (estas com
+parcelas). A mesma semente gera sempre o mesmo conjunto de linhas.
+"""
+import csv
+import random
+import zlib
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+SALARIES = [1500, 2500, 4000, 8000, 15000]
+BILLS = [('Aluguel', 0.30), ('Conta de Luz', 0.04), ('Conta de Água', 0.02), ('Internet', 0.03)]
+PURCHASES = ['Mercado', 'Farmácia', 'Restaurante', 'Combustível', 'Roupas', 'Eletrônicos', 'Cinema', 'Presente']
+METHODS = ['Dinheiro', 'Cartão de Débito', 'Transferência', 'Cartão de Crédito']
+METHOD_WEIGHTS = [0.15, 0.30, 0.15, 0.40]
+INSTALLMENTS = [1, 1, 1, 2, 3, 4, 6, 10, 12]
+
+
+def add_months(day, months):
+    month = day.month - 1 + months
+    return day.replace(year=day.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def username(index):
+    return f'user{index:05d}'
+
+
+def generate_rows(users=100, months=12, seed=42, start=date(2023, 1, 1)):
+    """Gera tuplas no formato de storage.INSERT_FINANCIAL_DATA, com a quantia em reais."""
+    rng = random.Random(seed)
+    for u in range(users):
+        name = username(u)
+        salary = rng.choice(SALARIES)
+        for m in range(months):
+            month_start = add_months(start, m)
+            yield (name, month_start.replace(day=5).isoformat(), 'Salário', float(salary),
+                   'Receita', 'Transferência', 1, 'Essencial')
+            for description, share in BILLS:
+                yield (name, month_start.replace(day=rng.randint(1, 28)).isoformat(), description,
+                       round(salary * share * rng.uniform(0.9, 1.1), 2), 'Despesa',
+                       rng.choice(['Transferência', 'Cartão de Débito']), 1, 'Essencial')
+            for _ in range(rng.randint(5, 25)):
+                method = rng.choices(METHODS, METHOD_WEIGHTS)[0]
+                installments = rng.choice(INSTALLMENTS) if method == 'Cartão de Crédito' else 1
+                yield (name, (month_start + timedelta(days=rng.randint(0, 27))).isoformat(),
+                       rng.choice(PURCHASES), round(rng.lognormvariate(4, 1), 2), 'Despesa',
+                       method, installments, rng.choice(['Essencial', 'Não essencial']))
+
+
+def populate(rows, batch_size=50_000):
+    """Grava as linhas no banco configurado em storage; devolve quantas foram gravadas."""
+    import money
+    import storage
+
+    total = 0
+    batch = []
+    with storage.transaction() as conn:
+        for row in rows:
+            batch.append((*row[:3], money.to_cents(row[3]), *row[4:]))
+            if len(batch) == batch_size:
+                conn.executemany(storage.INSERT_FINANCIAL_DATA, batch)
+                total += len(batch)
+                batch.clear()
+        conn.executemany(storage.INSERT_FINANCIAL_DATA, batch)
+        total += len(batch)
+    return total
+
+
+def write_csv(path, rows):
+    """Escreve um extrato CSV (cabeçalhos em português) a partir das linhas geradas."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Data', 'Descrição', 'Quantia', 'Tipo', 'Método de Pagamento', 'Parcelas', 'Necessidade'])
+        for row in rows:
+            writer.writerow(row[1:])
+
+
+def fake_market_fetcher(symbol, start, end):
+    """Provedor de cotações offline: passeio aleatório determinístico por símbolo."""
+    index = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1))
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(index))))
+    return pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.005, len(index))),
+        'High': close * 1.01,
+        'Low': close * 0.99,
+        'Close': close,
+        'Volume': rng.integers(1_000, 1_000_000, len(index)).astype(float),
+    }, index=index)
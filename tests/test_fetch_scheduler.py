@@ -0,0 +1,139 @@
+"""Testes offline de fetch_scheduler: backoff, requisições compartilhadas e limite de taxa.
+
+Nenhum teste acessa a rede: o provedor é uma função falsa e o relógio e o
+sleep do limitador são simulados.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+import types
+from datetime import date
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'FinFusion'))
+
+import fetch_scheduler  # noqa: E402
+import market_data  # noqa: E402
+
+
+class FakeClock:
+    """Relógio que só anda quando o limitador "dorme"."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class NoLimit:
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+
+
+def flaky(failures, error=fetch_scheduler.EmptyResponse):
+    """Provedor que falha `failures` vezes antes de responder; guarda as chamadas."""
+    calls = []
+
+    def fetch(symbol):
+        calls.append(symbol)
+        if len(calls) <= failures:
+            raise error(symbol)
+        return symbol.lower()
+
+    return fetch, calls
+
+
+def test_retry_backs_off_until_success():
+    fetch, calls = flaky(2)
+    sleeps = []
+    limiter = NoLimit()
+    wrapped = fetch_scheduler.with_retry(fetch, 'teste', retries=3, base_delay=0.5,
+                                         limiter=limiter, sleep=sleeps.append)
+    assert wrapped('PETR4') == 'petr4'
+    assert len(calls) == 3 and limiter.acquired == 3
+    # Jitter completo: cada espera fica entre 0 e base * 2^tentativa
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.5 and 0 <= sleeps[1] <= 1.0
+
+
+def test_retry_gives_up_after_last_attempt():
+    fetch, calls = flaky(10, ConnectionError)
+    wrapped = fetch_scheduler.with_retry(fetch, 'teste', retries=2, limiter=NoLimit(), sleep=lambda _: None)
+    with pytest.raises(ConnectionError):
+        wrapped('PETR4')
+    assert len(calls) == 3
+
+
+def test_non_retryable_error_is_raised_at_once():
+    fetch, calls = flaky(1, ValueError)
+    wrapped = fetch_scheduler.with_retry(fetch, 'teste', limiter=NoLimit(), sleep=lambda _: None)
+    with pytest.raises(ValueError):
+        wrapped('PETR4')
+    assert len(calls) == 1
+
+
+def test_backoff_delays_are_capped():
+    class Highest:
+        def uniform(self, low, high):
+            return high
+
+    assert list(fetch_scheduler.backoff_delays(6, 0.5, 4.0, Highest())) == [0.5, 1.0, 2.0, 4.0, 4.0, 4.0]
+
+
+def test_rate_limiter_allows_burst_then_waits():
+    clock = FakeClock()
+    limiter = fetch_scheduler.RateLimiter(rate=2.0, burst=3, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        limiter.acquire()
+    assert clock.sleeps == []
+    for _ in range(4):
+        limiter.acquire()
+    # Depois da rajada, uma requisição a cada 1/rate segundos
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_scheduler_shares_identical_requests():
+    release = threading.Event()
+    calls = []
+
+    def fetch(symbol, start, end):
+        calls.append((symbol, start, end))
+        release.wait(5)
+        return symbol
+
+    scheduler = fetch_scheduler.FetchScheduler(fetch, max_workers=2)
+    try:
+        first = scheduler.submit('PETR4.SA', date(2024, 1, 1))
+        second = scheduler.submit('PETR4.SA', '2024-01-01')
+        other = scheduler.submit('VALE3.SA', date(2024, 1, 1))
+        assert first is second and first is not other
+        release.set()
+        assert first.result() == 'PETR4.SA' and other.result() == 'VALE3.SA'
+        assert sorted(call[0] for call in calls) == ['PETR4.SA', 'VALE3.SA']
+        assert scheduler.fetch_many(['PETR4.SA', 'VALE3.SA'], date(2024, 1, 1)) == {
+            'PETR4.SA': 'PETR4.SA', 'VALE3.SA': 'VALE3.SA'}
+    finally:
+        scheduler.shutdown()
+    assert scheduler.in_flight() == []
+
+
+def test_yfinance_empty_download_is_retryable(monkeypatch):
+    empty = pd.DataFrame(columns=market_data.BAR_COLUMNS)
+    monkeypatch.setitem(sys.modules, 'yfinance', types.SimpleNamespace(download=lambda *args, **kwargs: empty))
+    with pytest.raises(fetch_scheduler.EmptyResponse):
+        market_data.yfinance_fetcher('PETR4.SA', date(2024, 1, 1), date(2024, 2, 1))
+    # Um fim de semana sem pregão não é falha
+    assert market_data.yfinance_fetcher('PETR4.SA', date(2024, 1, 6), date(2024, 1, 8)).empty
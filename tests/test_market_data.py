@@ -0,0 +1,97 @@
+"""Testes offline do cache de cotações (MarketDataStore.refresh) com um provedor falso.
+
+O provedor imita o yfinance_fetcher: pregões em dias úteis a partir da data de
+listagem, e fetch_scheduler.EmptyResponse quando um intervalo que deveria ter
+pregões volta vazio. Ele passa por fetch_scheduler.with_retry, como em produção.
+
+    python -m pytest tests
+"""
+import os
+import sys
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'FinFusion'))
+
+import fetch_scheduler  # noqa: E402
+import market_data  # noqa: E402
+
+NOW = datetime(2024, 6, 3, 18, 0)
+
+
+class NoLimit:
+    def acquire(self):
+        pass
+
+
+class FakeProvider:
+    """Fechamentos sintéticos nos dias úteis desde `listed`; guarda cada chamada."""
+
+    def __init__(self, listed):
+        self.listed = listed
+        self.calls = []
+        self.down = False  # fora do ar: responde vazio, como o yfinance numa falha
+
+    def __call__(self, symbol, start, end):
+        self.calls.append((start, end))
+        days = pd.bdate_range(max(start, self.listed), end - timedelta(days=1)) if not self.down else []
+        bars = pd.DataFrame({'Open': 10.0, 'High': 11.0, 'Low': 9.0, 'Close': 10.5, 'Volume': 1000.0},
+                            index=days)
+        if bars.empty and market_data._expects_bars(start, end):
+            raise fetch_scheduler.EmptyResponse(f"{symbol}: nenhum pregão entre {start} e {end}")
+        return bars
+
+
+def make_store(tmp_path, provider, clock=lambda: NOW):
+    fetcher = fetch_scheduler.with_retry(provider, 'teste', retries=2, limiter=NoLimit(), sleep=lambda _: None)
+    return market_data.MarketDataStore(str(tmp_path / 'market.db'), fetcher=fetcher, clock=clock)
+
+
+def test_window_before_listing_date_is_served_from_cache(tmp_path):
+    provider = FakeProvider(listed=NOW.date() - timedelta(days=100))
+    store = make_store(tmp_path, provider)
+
+    first = store.history('NOVO3.SA', NOW.date() - timedelta(days=180))
+    assert first.index.min().date() >= provider.listed
+    calls = len(provider.calls)
+
+    # Janela maior que a primeira: antes da listagem não há pregões, e isso não é falha
+    wider = store.history('NOVO3.SA', NOW.date() - timedelta(days=365))
+    assert wider.equals(first)
+    assert len(provider.calls) == calls
+    assert store._coverage('NOVO3.SA')[0] == NOW.date() - timedelta(days=365)
+
+
+def test_backfill_adds_older_bars(tmp_path):
+    provider = FakeProvider(listed=date(2020, 1, 1))
+    store = make_store(tmp_path, provider)
+
+    recent = store.history('PETR4.SA', NOW.date() - timedelta(days=30))
+    older = store.history('PETR4.SA', NOW.date() - timedelta(days=90))
+    assert len(older) > len(recent)
+    assert store._coverage('PETR4.SA')[0] == NOW.date() - timedelta(days=90)
+
+
+def test_failed_backfill_serves_cache_and_waits_for_ttl(tmp_path):
+    now = [NOW]
+    provider = FakeProvider(listed=date(2020, 1, 1))
+    store = make_store(tmp_path, provider, clock=lambda: now[0])
+    recent = store.history('VALE3.SA', NOW.date() - timedelta(days=30))
+
+    provider.down = True
+    calls = len(provider.calls)
+    served = store.history('VALE3.SA', NOW.date() - timedelta(days=90))
+    assert served.equals(recent)
+    assert len(provider.calls) == calls + 3  # tentativa inicial e duas novas com backoff
+    assert store._coverage('VALE3.SA')[0] == NOW.date() - timedelta(days=30)
+
+    # Dentro do TTL a falha não é repetida a cada leitura
+    store.history('VALE3.SA', NOW.date() - timedelta(days=90))
+    assert len(provider.calls) == calls + 3
+
+    provider.down = False
+    now[0] = NOW + store.ttl
+    older = store.history('VALE3.SA', NOW.date() - timedelta(days=90))
+    assert len(older) > len(recent)
+    assert store._coverage('VALE3.SA')[0] == NOW.date() - timedelta(days=90)
@@ -0,0 +1,49 @@
+"""Migração 15: parcelamentos e limites de cartão passam para centavos inteiros.
+
+O banco é levado até a versão 14 e as duas tabelas são recriadas no formato
+antigo (REAL) antes de migrar.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'FinFusion'))
+
+import installments  # noqa: E402
+import schema  # noqa: E402
+import statements  # noqa: E402
+import storage  # noqa: E402
+
+USER = 'ana'
+
+
+def test_plans_and_card_limits_move_to_cents(tmp_path):
+    storage.configure(str(tmp_path / 'test.db'))
+    try:
+        schema.migrate(target=14)
+        with storage.transaction() as conn:
+            conn.execute("DROP TABLE credit_cards")
+            conn.execute("CREATE TABLE credit_cards (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL, "
+                         "name TEXT NOT NULL, credit_limit REAL NOT NULL, closing_day INTEGER NOT NULL, "
+                         "due_day INTEGER NOT NULL, UNIQUE (username, name))")
+            conn.execute("INSERT INTO credit_cards (username, name, credit_limit, closing_day, due_day) "
+                         "VALUES (?, 'Nubank', ?, 5, 12)", (USER, 0.1 + 0.2))
+            for name in installments.TRIGGER_NAMES:
+                conn.execute(f"DROP TRIGGER {name}")
+            conn.execute("DROP TABLE installment_plans")
+            conn.execute("CREATE TABLE installment_plans (id INTEGER PRIMARY KEY, username TEXT NOT NULL, "
+                         "payment_method TEXT NOT NULL, first_month INTEGER NOT NULL, "
+                         "last_month INTEGER NOT NULL, installments INTEGER NOT NULL, amount REAL NOT NULL)")
+            conn.execute("INSERT INTO financial_data (username, date, description, amount_cents, type, "
+                         "payment_method, installments) VALUES (?, '2024-01-10', 'TV', 100000, 'Despesa', "
+                         "'Cartão de Crédito', 3)", (USER,))
+
+        assert schema.migrate() == schema.SCHEMA_VERSION
+        [card] = statements.list_cards(USER)
+        assert card.credit_limit_cents == 30 and card.credit_limit == 0.3
+        january = installments.month_index('2024-01-01')
+        # 1000,00 em 3 parcelas: o centavo que sobra vai para a primeira
+        assert installments.monthly_obligations(USER, january, january + 2).tolist() == [333.34, 333.33, 333.33]
+    finally:
+        storage.get_pool().close_all()
@@ -0,0 +1,86 @@
+"""Isolamento do cache de processo do histórico (app.get_financial_data) entre usuários.
+
+Várias threads fazem o papel de sessões do Streamlit sobre um banco temporário
+com usuários sintéticos. As medições de latência ficam em
+benchmarks/bench_shared_cache.py.
+
+    python -m pytest tests
+"""
+import os
+import random
+import sys
+import threading
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'FinFusion'))
+sys.path.insert(0, os.path.join(HERE, '..', 'benchmarks'))
+
+import schema  # noqa: E402
+import shared_cache  # noqa: E402
+import storage  # noqa: E402
+import synthetic  # noqa: E402
+
+USERS = 20
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    storage.configure(str(tmp_path_factory.mktemp('cache') / 'test.db'))
+    schema.migrate()
+    synthetic.populate(synthetic.generate_rows(USERS, 6))
+    shared_cache.clear_all()
+    import app  # FinFusion/app.py; o bloco __main__ não roda na importação
+    yield app
+    shared_cache.clear_all()
+    storage.get_pool().close_all()
+
+
+def stored_ids(username):
+    with storage.connection() as conn:
+        return [id for id, in conn.execute("SELECT id FROM financial_data WHERE username = ? ORDER BY date, id",
+                                           (username,))]
+
+
+def test_concurrent_sessions_only_get_their_own_rows(app):
+    import request_cache
+    expected = {synthetic.username(u): stored_ids(synthetic.username(u)) for u in range(USERS)}
+    names = sorted(expected)
+    mismatches = []
+
+    def session(seed):
+        rng = random.Random(seed)
+        for _ in range(50):
+            name = rng.choice(names)
+            request_cache.begin_request()
+            if app.get_financial_data(name).id.tolist() != expected[name]:
+                mismatches.append(name)
+
+    sessions = [threading.Thread(target=session, args=(seed,)) for seed in range(8)]
+    for thread in sessions:
+        thread.start()
+    for thread in sessions:
+        thread.join()
+    assert mismatches == []
+
+
+def test_write_invalidates_only_the_writer(app):
+    import request_cache
+    cache = shared_cache.cache('financial_data')
+    writer, other = synthetic.username(0), synthetic.username(1)
+    for name in (writer, other):
+        request_cache.begin_request()
+        app.get_financial_data(name)
+    before = stored_ids(writer)
+
+    request_cache.begin_request()
+    app.add_financial_data(writer, '2024-02-01', 'Nova despesa', 42.0, 'Despesa', 'Dinheiro', 1, 'Essencial')
+    misses = cache.misses
+
+    request_cache.begin_request()
+    assert len(app.get_financial_data(writer)) == len(before) + 1
+    assert cache.misses == misses + 1
+    request_cache.begin_request()
+    assert app.get_financial_data(other).id.tolist() == stored_ids(other)
+    assert cache.misses == misses + 1
@@ -0,0 +1,37 @@
+"""Testes do worker em segundo plano: tarefas listadas por dono.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'FinFusion'))
+
+import worker  # noqa: E402
+
+
+def test_jobs_lists_only_the_owner_keys():
+    background = worker.BackgroundWorker()
+    background.ensure(('dashboard', 'ana', 'default'), lambda: 1, owner='ana')
+    background.ensure(('dashboard', 'bob', 'default'), lambda: 1, owner='bob')
+    # Cotações compartilhadas: a mesma chave pertence aos dois
+    background.ensure(('market', ('PETR4.SA',), 180), lambda: 2, owner='ana')
+    background.ensure(('market', ('PETR4.SA',), 180), lambda: 2, owner='bob')
+    background.shutdown()  # espera as tarefas terminarem
+
+    assert {job.key for job in background.jobs(owner='ana')} == {
+        ('dashboard', 'ana', 'default'), ('market', ('PETR4.SA',), 180)}
+    assert {job.key for job in background.jobs(owner='bob')} == {
+        ('dashboard', 'bob', 'default'), ('market', ('PETR4.SA',), 180)}
+    assert len(background.jobs()) == 3
+
+
+def test_disown_hides_jobs_from_the_former_owner():
+    background = worker.BackgroundWorker()
+    background.ensure(('market', ('VALE3.SA',), 180), lambda: 2, owner='ana')
+    background.ensure(('market', ('VALE3.SA',), 180), lambda: 2, owner='bob')
+    background.shutdown()  # espera as tarefas terminarem
+
+    background.disown('ana')
+    assert background.jobs(owner='ana') == []
+    assert [job.key for job in background.jobs(owner='bob')] == [('market', ('VALE3.SA',), 180)]